@@ -0,0 +1,219 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+
+import orjson
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    """Token bucket per API key; the least recently seen keys are forgotten past `max_keys`.
+
+    The limit applies before authentication, so only keys `known` accepts get
+    a bucket of their own; every other key, and a missing one, shares a single
+    anonymous bucket, so made-up keys can neither evict real ones nor dodge
+    the limit.
+    """
+
+    ANONYMOUS = ""
+
+    def __init__(self, rate: float, burst: float, max_keys: int = 10000, known: Callable[[str], bool] = lambda key: False) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.known = known
+        self.limited = 0
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, api_key: str) -> float:
+        if not api_key or not self.known(api_key):
+            api_key = self.ANONYMOUS
+        bucket = self._buckets.get(api_key)
+        if bucket is None:
+            bucket = self._buckets[api_key] = TokenBucket(self.rate, self.burst)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(api_key)
+        wait = bucket.take()
+        if wait > 0:
+            self.limited += 1
+        return wait
+
+    def stats(self) -> dict:
+        return {"ratePerSecond": self.rate, "burst": self.burst, "keys": len(self._buckets), "limited": self.limited}
+
+
+class AdmissionController:
+    """Caps concurrent requests, with a short FIFO wait queue in front.
+
+    A request runs immediately while fewer than `max_in_flight` are running,
+    otherwise waits in the queue for at most `queue_timeout` seconds. When the
+    queue is full or the wait times out the request is shed, so under
+    overload clients get fast 503s instead of piling up behind Redis timeouts.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float) -> None:
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed: Dict[str, int] = {"queue_full": 0, "queue_timeout": 0}
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> Optional[str]:
+        """Take a slot; returns None when admitted, else the reason the request is shed."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return None
+        if len(self._waiters) >= self.max_queue:
+            self.shed["queue_full"] += 1
+            return "queue_full"
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # Handed a slot just as the deadline passed
+                self.admitted += 1
+                return None
+            waiter.cancel()
+            self.shed["queue_timeout"] += 1
+            return "queue_timeout"
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        self.admitted += 1
+        return None
+
+    def release(self) -> None:
+        # The slot passes straight to the oldest waiter, so in_flight stays the same
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> dict:
+        return {
+            "inFlight": self.in_flight,
+            "queued": self.queued,
+            "maxInFlight": self.max_in_flight,
+            "maxQueue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": dict(self.shed),
+        }
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying the rate limiter and admission controller.
+
+    Rate-limited requests get 429, shed requests 503; both carry `Retry-After`.
+    Paths in `exempt` (health checks, metrics) always pass.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        controller: Optional[AdmissionController] = None,
+        limiter: Optional[RateLimiter] = None,
+        retry_after: float = 1.0,
+        exempt: Iterable[str] = ("/health", "/metrics"),
+    ) -> None:
+        self.app = app
+        self.controller = controller
+        self.limiter = limiter
+        self.retry_after = retry_after
+        self.exempt = frozenset(exempt)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter is not None:
+            wait = self.limiter.check(Headers(scope=scope).get("x-api-key", ""))
+            if wait > 0:
+                await self._reject(send, 429, "Rate limit exceeded", wait)
+                return
+
+        if self.controller is None:
+            await self.app(scope, receive, send)
+            return
+        reason = await self.controller.acquire()
+        if reason is not None:
+            await self._reject(send, 503, "Server overloaded, retry later", self.retry_after)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+    @staticmethod
+    async def _reject(send: Send, status: int, detail: str, retry_after: float) -> None:
+        body = orjson.dumps({"detail": detail})
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ]
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+
+def create_admission() -> Tuple[Optional[AdmissionController], Optional[RateLimiter]]:
+    controller: Optional[AdmissionController] = None
+    max_in_flight = int(os.getenv("MAX_IN_FLIGHT", "256"))
+    if max_in_flight > 0:
+        controller = AdmissionController(
+            max_in_flight,
+            max_queue=int(os.getenv("ADMISSION_QUEUE_SIZE", "128")),
+            queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "0.5")),
+        )
+    limiter: Optional[RateLimiter] = None
+    rate = float(os.getenv("RATE_LIMIT_PER_SECOND", "0"))
+    if rate > 0:
+        limiter = RateLimiter(
+            rate,
+            float(os.getenv("RATE_LIMIT_BURST", str(max(1.0, rate)))),
+            # Read per request, like require_api_key does
+            known=lambda key: key == os.getenv("API_KEY"),
+        )
+    return controller, limiter
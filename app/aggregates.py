@@ -0,0 +1,202 @@
+import hashlib
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from app.index_builder import CONTENT_PREFIXES, fetch_documents, scan_keys, summarize
+from app.redis_client import RedisBackend
+from app.views import MaintainedView
+
+
+def _content(key: str, doc: dict) -> str:
+    """Text a node contributes to its ancestors' aggregates, as in the index builder."""
+    if key.startswith("chunk:"):
+        content = doc.get("text", doc.get("content", ""))
+    elif key.startswith(CONTENT_PREFIXES):
+        content = doc.get("content", doc.get("text", ""))
+    else:
+        return ""
+    return content if isinstance(content, str) else ""
+
+
+class AggregateIndex(MaintainedView):
+    """Materialized per-node aggregates over the content hierarchy.
+
+    For every node: number of descendants, the concatenated text of its
+    descendants (the same depth-first order and, below a paragraph, the same
+    `sp:`/`chunk:` children the index builder's summaries use, so `ssp:`
+    subtrees are left out of the text), the 400-character summary of that
+    text and a Merkle-style content hash over its own text and its children's
+    hashes. Aggregates are computed from the children's aggregates, so a
+    changed chunk recomputes only the nodes on its path to the root instead
+    of the whole tree. Loaded with SCAN plus pipelined JSON.MGET and kept
+    current from keyspace notifications (see MaintainedView).
+    """
+
+    label = "Aggregate"
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        prefixes: Iterable[str],
+        batch_size: int = 200,
+        scan_count: int = 1000,
+        refresh_interval: float = 300.0,
+        push_active: Callable[[], bool] = lambda: False,
+    ) -> None:
+        super().__init__(backend, prefixes, batch_size, scan_count, refresh_interval, push_active)
+        # key -> {"parent", "content"}
+        self.nodes: Dict[str, dict] = {}
+        self.children: Dict[str, List[str]] = {}
+        # key -> {"descendants", "pieces", "text", "summary", "hash"}
+        self.aggregates: Dict[str, dict] = {}
+        self.updates = 0
+        self.recomputed = 0
+
+    # -- aggregation -----------------------------------------------------------
+
+    def _compute(self, key: str) -> None:
+        """Aggregate of `key` from its own content and its children's aggregates."""
+        descendants = 0
+        pieces = 0
+        parts: List[str] = []
+        digest = hashlib.blake2b(digest_size=16)
+        node = self.nodes.get(key)
+        digest.update((node["content"] if node else "").encode())
+        # Below a paragraph the builder only descends into content nodes; the hash still covers every child
+        content_only = key.startswith(("p:", *CONTENT_PREFIXES))
+        for child in self.children.get(key, ()):
+            child_node = self.nodes.get(child)
+            child_aggregate = self.aggregates.get(child)
+            if child_node is None or child_aggregate is None:
+                continue
+            descendants += 1 + child_aggregate["descendants"]
+            digest.update(child_aggregate["hash"].encode())
+            if content_only and not child.startswith(CONTENT_PREFIXES):
+                continue
+            if child_node["content"]:
+                parts.append(child_node["content"])
+                pieces += 1
+            if child_aggregate["text"]:
+                parts.append(child_aggregate["text"])
+                pieces += child_aggregate["pieces"]
+        text = " ".join(parts)
+        self.aggregates[key] = {
+            "descendants": descendants,
+            "pieces": pieces,
+            "text": text,
+            "summary": summarize([text]) if text else "",
+            "hash": digest.hexdigest(),
+        }
+        self.recomputed += 1
+
+    def _path(self, key: str) -> List[str]:
+        """`key` and its ancestors, nearest first."""
+        path = [key]
+        node = self.nodes.get(key)
+        while node is not None and node["parent"] and node["parent"] not in path:
+            path.append(node["parent"])
+            node = self.nodes.get(node["parent"])
+        return path
+
+    def _recompute_paths(self, keys: Iterable[str]) -> None:
+        # Deepest nodes first, each node once, so parents see fresh children
+        order: Dict[str, int] = {}
+        for key in keys:
+            path = self._path(key)
+            for depth, node in enumerate(reversed(path)):
+                order[node] = max(order.get(node, 0), depth)
+        for key in sorted(order, key=order.get, reverse=True):
+            if key in self.nodes or key in self.children:
+                self._compute(key)
+            else:
+                self.aggregates.pop(key, None)
+
+    # -- loading -------------------------------------------------------------
+
+    async def load(self) -> None:
+        started = time.perf_counter()
+        keys = await scan_keys(self.backend, self.prefixes, self.scan_count)
+        docs = await fetch_documents(self.backend, keys, self.batch_size)
+
+        self.nodes = {key: {"parent": doc.get("parent"), "content": _content(key, doc)} for key, doc in docs.items() if doc is not None}
+        self.children = {}
+        for key in sorted(self.nodes):
+            parent = self.nodes[key]["parent"]
+            if parent:
+                self.children.setdefault(parent, []).append(key)
+        self.aggregates = {}
+        # Post-order, iteratively: the hierarchy can be deeper than the recursion limit
+        for root in [key for key in self.nodes if self.nodes[key]["parent"] not in self.nodes] + [
+            parent for parent in self.children if parent not in self.nodes
+        ]:
+            stack = [(root, False)]
+            while stack:
+                key, expanded = stack.pop()
+                if key in self.aggregates:
+                    continue
+                if expanded:
+                    self._compute(key)
+                    continue
+                stack.append((key, True))
+                stack.extend((child, False) for child in self.children.get(key, ()) if child not in self.aggregates)
+
+        self.version += 1
+        self.ready = True
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Aggregates loaded: {len(self.aggregates)} nodes in {self.load_ms}ms")
+
+    async def apply(self, keys: List[str]) -> None:
+        """Re-read `keys` and recompute only the paths from them (old and new parents) to the root."""
+        docs = await fetch_documents(self.backend, keys, self.batch_size)
+        touched: List[str] = []
+        for key, doc in docs.items():
+            old = self.nodes.pop(key, None)
+            if old is not None and old["parent"] in self.children:
+                siblings = self.children[old["parent"]]
+                if key in siblings:
+                    siblings.remove(key)
+                if not siblings:
+                    del self.children[old["parent"]]
+                touched.append(old["parent"])
+            if doc is not None:
+                node = {"parent": doc.get("parent"), "content": _content(key, doc)}
+                self.nodes[key] = node
+                if node["parent"]:
+                    siblings = self.children.setdefault(node["parent"], [])
+                    siblings.append(key)
+                    siblings.sort()
+            touched.append(key)
+        self._recompute_paths(touched)
+        self.version += 1
+        self.updates += len(keys)
+
+    # -- queries ---------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.aggregates.get(key)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "nodes": len(self.aggregates),
+            "version": self.version,
+            "loadMs": self.load_ms,
+            "updates": self.updates,
+            "recomputed": self.recomputed,
+            "pendingUpdates": len(self._dirty),
+            "lastError": self.last_error,
+        }
+
+
+def create_aggregates(backend: RedisBackend, prefixes: Iterable[str], push_active: Callable[[], bool]) -> Optional[AggregateIndex]:
+    if os.getenv("AGGREGATES_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return AggregateIndex(
+        backend,
+        prefixes,
+        batch_size=int(os.getenv("INDEX_BATCH_SIZE", "200")),
+        scan_count=int(os.getenv("HIERARCHY_SCAN_COUNT", "1000")),
+        refresh_interval=float(os.getenv("HIERARCHY_REFRESH_INTERVAL", "300")),
+        push_active=push_active,
+    )
@@ -0,0 +1,185 @@
+import os
+import time
+from collections import deque
+from typing import Any, Deque, List, Optional, Sequence, Tuple
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.redis_client import TRANSIENT_ERRORS, RedisBackend
+
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RedisConnectionError):
+    """Raised instead of calling Redis while the circuit is open."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"circuit open, Redis calls suspended for {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker(RedisBackend):
+    """Fails Redis calls fast while Redis is failing.
+
+    Outcomes of the last `window` seconds are kept; once at least `min_calls`
+    were made and `failure_ratio` of them failed with a connection error or
+    timeout, the circuit opens and every call raises `CircuitOpenError`
+    straight away instead of waiting out the socket timeout. After
+    `open_seconds` it goes half-open: up to `half_open_probes` real calls are
+    let through, and the circuit closes once that many succeed in a row or
+    opens again on the first failure. Replies that are Redis errors (wrong
+    type, unknown path) mean Redis answered and count as successes.
+
+    PINGs go straight through, so the pool health check keeps its own view.
+    """
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        failure_ratio: float = 0.5,
+        min_calls: int = 20,
+        window: float = 10.0,
+        open_seconds: float = 5.0,
+        half_open_probes: int = 3,
+    ) -> None:
+        self.backend = backend
+        self.mode = backend.mode
+        self.use_tls = backend.use_tls
+        self.failure_ratio = failure_ratio
+        self.min_calls = min_calls
+        self.window = window
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.opens = 0
+        self.rejected = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._failures = 0
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+
+    # -- state machine -----------------------------------------------------------
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_at + self.open_seconds - time.monotonic())
+
+    def _before(self) -> bool:
+        """Admit a call or raise CircuitOpenError. Returns True for half-open probes."""
+        if self.state == OPEN:
+            if self.retry_after() > 0:
+                self.rejected += 1
+                raise CircuitOpenError(self.retry_after())
+            self.state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            print("🔄 Redis circuit half-open, probing")
+        if self.state == HALF_OPEN:
+            if self._probes_in_flight >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError(0.0)
+            self._probes_in_flight += 1
+            return True
+        return False
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.opens += 1
+        self._outcomes.clear()
+        self._failures = 0
+
+    def _record(self, failed: bool, probe: bool) -> None:
+        if probe:
+            self._probes_in_flight -= 1
+            if self.state != HALF_OPEN:
+                return
+            if failed:
+                print("⚠️ Redis circuit probe failed, opening again")
+                self._open()
+            else:
+                self._probe_successes += 1
+                if self._probe_successes >= self.half_open_probes:
+                    print("✅ Redis circuit closed")
+                    self.state = CLOSED
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed))
+        self._failures += failed
+        while self._outcomes and self._outcomes[0][0] < now - self.window:
+            self._failures -= self._outcomes.popleft()[1]
+        if (
+            self.state == CLOSED
+            and len(self._outcomes) >= self.min_calls
+            and self._failures >= self.failure_ratio * len(self._outcomes)
+        ):
+            print(f"⚠️ Redis circuit opened: {self._failures}/{len(self._outcomes)} calls failed in {self.window}s")
+            self._open()
+
+    async def _call(self, method: str, *args: Any) -> Any:
+        probe = self._before()
+        try:
+            result = await getattr(self.backend, method)(*args)
+        except TRANSIENT_ERRORS:
+            self._record(True, probe)
+            raise
+        except Exception:
+            self._record(False, probe)
+            raise
+        except BaseException:
+            # Cancelled: free the probe slot without counting an outcome
+            if probe:
+                self._probes_in_flight -= 1
+            raise
+        self._record(False, probe)
+        return result
+
+    # -- RedisBackend ------------------------------------------------------------
+
+    async def execute_command(self, *args: Any) -> Any:
+        return await self._call("execute_command", *args)
+
+    async def execute_pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        return await self._call("execute_pipeline", commands)
+
+    async def ping(self) -> bool:
+        return await self.backend.ping()
+
+    def pool_stats(self) -> dict:
+        return self.backend.pool_stats()
+
+    async def warm(self, count: int) -> int:
+        return await self.backend.warm(count)
+
+    async def reset_pool(self) -> None:
+        await self.backend.reset_pool()
+
+    async def close(self) -> None:
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "retryAfter": round(self.retry_after(), 2) if self.state == OPEN else None,
+            "windowCalls": len(self._outcomes),
+            "windowFailures": self._failures,
+            "opens": self.opens,
+            "rejected": self.rejected,
+        }
+
+
+def create_circuit_breaker(backend: RedisBackend) -> Optional[CircuitBreaker]:
+    if os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return CircuitBreaker(
+        backend,
+        failure_ratio=float(os.getenv("CIRCUIT_FAILURE_RATIO", "0.5")),
+        min_calls=int(os.getenv("CIRCUIT_MIN_CALLS", "20")),
+        window=float(os.getenv("CIRCUIT_WINDOW", "10")),
+        open_seconds=float(os.getenv("CIRCUIT_OPEN_SECONDS", "5")),
+        half_open_probes=int(os.getenv("CIRCUIT_HALF_OPEN_PROBES", "3")),
+    )
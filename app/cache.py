@@ -0,0 +1,218 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from app.shared_cache import SharedCacheTier, create_shared_tier
+
+
+ROOT_PATHS = (None, ".")
+
+
+def _parse_ttls(spec: str) -> Dict[str, float]:
+    """Parse `index:=600,doc:=120` into {"index:": 600.0, "doc:": 120.0}."""
+    ttls: Dict[str, float] = {}
+    for item in spec.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        prefix, _, seconds = item.rpartition("=")
+        if not prefix:
+            raise RuntimeError(f"Invalid CACHE_TTLS entry: {item!r}")
+        ttls[prefix] = float(seconds)
+    return ttls
+
+
+class CacheEntry:
+    __slots__ = ("value", "size", "stored_at", "expires_at")
+
+    def __init__(self, value: Any, size: int, stored_at: float, expires_at: float) -> None:
+        self.value = value
+        self.size = size
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+
+class JsonCache:
+    """Bounded LRU of raw JSON.GET replies with per-prefix TTLs.
+
+    Entries are keyed by (redis key, JSON path) and accounted by the size of the
+    raw reply; the least recently used entries are evicted once `max_bytes` is
+    exceeded. All access happens on the event loop, so no locking is needed.
+
+    With a `shared` tier, local misses on shared prefixes are looked up there
+    (and rebuilt into values with `decode`) before going to Redis, and stores
+    pass the raw reply on to it.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        default_ttl: float,
+        ttls: Optional[Dict[str, float]] = None,
+        shared: Optional[SharedCacheTier] = None,
+        decode: Callable[[str], Any] = lambda raw: raw,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        # Longest prefix first so `index:schema:` can override `index:`
+        self.ttls = sorted((ttls or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        # Upper bound on entry age, applied while push invalidation is unavailable
+        self.ttl_cap: Optional[float] = None
+        # Bumped on every invalidation so reads that raced a write are not stored
+        self.generation = 0
+        self._entries: "OrderedDict[Tuple[str, Optional[Hashable]], CacheEntry]" = OrderedDict()
+        self._paths: Dict[str, set] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.shared = shared
+        self.decode = decode
+
+    def token(self) -> Tuple[int, float]:
+        """Taken before a Redis read and passed to `set`: the generation and the wall-clock start of the read."""
+        return self.generation, time.time()
+
+    def ttl_for(self, key: str) -> float:
+        for prefix, ttl in self.ttls:
+            if key.startswith(prefix):
+                return ttl
+        return self.default_ttl
+
+    @staticmethod
+    def _normalize(path: Optional[Hashable]) -> Optional[Hashable]:
+        # `JSON.GET key` and `JSON.GET key .` return the same document
+        return None if path in ROOT_PATHS else path
+
+    def get(self, key: str, path: Optional[Hashable] = None) -> Optional[CacheEntry]:
+        cache_key = (key, self._normalize(path))
+        entry = self._entries.get(cache_key)
+        if entry is not None:
+            now = time.monotonic()
+            if entry.expires_at <= now or (self.ttl_cap is not None and entry.stored_at + self.ttl_cap <= now):
+                self._remove(cache_key)
+                self.expirations += 1
+                entry = None
+        if entry is None:
+            entry = self._get_shared(key, cache_key[1])
+            if entry is None:
+                self.misses += 1
+                return None
+        self._entries.move_to_end(cache_key)
+        self.hits += 1
+        return entry
+
+    def _get_shared(self, key: str, path: Optional[Hashable]) -> Optional[CacheEntry]:
+        if self.shared is None or not self.shared.shares(key):
+            return None
+        raw = self.shared.get(key, path, self.ttl_cap)
+        if raw is None:
+            return None
+        self._store(key, path, self.decode(raw), len(raw), self.ttl_for(key))
+        return self._entries.get((key, path))
+
+    def set(
+        self,
+        key: str,
+        path: Optional[Hashable],
+        value: Any,
+        size: int,
+        token: Optional[Tuple[int, float]] = None,
+        raw: Optional[str] = None,
+    ) -> None:
+        """Store a reply. Pass the `token()` taken before fetching to drop stale results.
+
+        `raw` is the reply as text, written through to the shared tier; other
+        workers' invalidations since the read started are checked there.
+        """
+        ttl = self.ttl_for(key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        if token is not None and token[0] != self.generation:
+            return
+        path = self._normalize(path)
+        self._store(key, path, value, size, ttl)
+        if self.shared is not None and raw is not None and token is not None and self.shared.shares(key):
+            self.shared.set(key, path, raw, ttl, token[1])
+
+    def _store(self, key: str, path: Optional[Hashable], value: Any, size: int, ttl: float) -> None:
+        cache_key = (key, path)
+        if cache_key in self._entries:
+            self._remove(cache_key)
+
+        now = time.monotonic()
+        self._entries[cache_key] = CacheEntry(value, size, now, now + ttl)
+        self._paths.setdefault(key, set()).add(cache_key[1])
+        self.bytes += size
+
+        while self.bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def invalidate(self, key: str) -> int:
+        """Drop every cached path of `key`. Returns the number of entries removed."""
+        self.generation += 1
+        if self.shared is not None and self.shared.shares(key):
+            self.shared.invalidate(key)
+        paths = self._paths.get(key)
+        if not paths:
+            return 0
+        removed = 0
+        for path in list(paths):
+            self._remove((key, path))
+            removed += 1
+        self.invalidations += removed
+        return removed
+
+    def clear(self) -> None:
+        self.generation += 1
+        if self.shared is not None:
+            self.shared.clear()
+        self.invalidations += len(self._entries)
+        self._entries.clear()
+        self._paths.clear()
+        self.bytes = 0
+
+    def _remove(self, cache_key: Tuple[str, Optional[Hashable]]) -> None:
+        entry = self._entries.pop(cache_key)
+        self.bytes -= entry.size
+        paths = self._paths.get(cache_key[0])
+        if paths is not None:
+            paths.discard(cache_key[1])
+            if not paths:
+                del self._paths[cache_key[0]]
+
+    def hottest(self) -> List[Tuple[str, Any]]:
+        """(key, value) of cached whole documents, most recently used first."""
+        return [(key, entry.value) for (key, path), entry in reversed(self._entries.items()) if path is None]
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "shared": self.shared.stats() if self.shared is not None else None,
+        }
+
+
+def create_cache(decode: Callable[[str], Any] = lambda raw: raw) -> Optional[JsonCache]:
+    if os.getenv("CACHE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return JsonCache(
+        max_bytes=int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        default_ttl=float(os.getenv("CACHE_DEFAULT_TTL", "60")),
+        ttls=_parse_ttls(os.getenv("CACHE_TTLS", "index:=300")),
+        shared=create_shared_tier(),
+        decode=decode,
+    )
@@ -0,0 +1,179 @@
+import gzip
+import os
+import zlib
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # optional: `pip install brotli` to offer br
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """Pick `br` or `gzip` from an Accept-Encoding header, or None."""
+    offered = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        offered[coding.strip().lower()] = quality
+    wildcard = offered.get("*", 0.0)
+    for coding in ("br", "gzip"):
+        if coding == "br" and brotli is None:
+            continue
+        if offered.get(coding, wildcard) > 0:
+            return coding
+    return None
+
+
+class _StreamCompressor:
+    def __init__(self, coding: str, gzip_level: int, brotli_quality: int) -> None:
+        self.coding = coding
+        if coding == "br":
+            self._br = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gz = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes, final: bool) -> bytes:
+        # Flushed per chunk so streamed lines are not held back
+        if self.coding == "br":
+            out = self._br.process(data)
+            return out + (self._br.finish() if final else self._br.flush())
+        out = self._gz.compress(data)
+        return out + self._gz.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated from `Accept-Encoding`.
+
+    Buffered responses smaller than `minimum_size` are sent as-is; streamed
+    responses are compressed chunk by chunk. Compressed bodies of responses
+    with an ETag are kept in a small LRU, so a hot unchanged document is
+    compressed once.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        memo_entries: int = 64,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.memo_entries = memo_entries
+        self._memo: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Optional[Message] = None
+        compressor: Optional[_StreamCompressor] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] == 304:
+                    # The ETag is the one the client sent, already suffixed if its 200 was compressed
+                    passthrough = True
+                    MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                    await send(message)
+                elif "content-encoding" in headers or not headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            headers = MutableHeaders(raw=start["headers"])
+
+            if compressor is None and not more_body:
+                if len(body) < self.minimum_size:
+                    passthrough = True
+                    headers.add_vary_header("Accept-Encoding")
+                    await send(start)
+                    await send(message)
+                    return
+                compressed = self._compress(body, coding, headers.get("etag"))
+                self._set_headers(headers, coding)
+                headers["Content-Length"] = str(len(compressed))
+                await send(start)
+                await send({"type": "http.response.body", "body": compressed})
+                return
+
+            if compressor is None:
+                compressor = _StreamCompressor(coding, self.gzip_level, self.brotli_quality)
+                self._set_headers(headers, coding)
+                del headers["Content-Length"]
+                await send(start)
+            await send({"type": "http.response.body", "body": compressor.chunk(body, not more_body), "more_body": more_body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _set_headers(headers: MutableHeaders, coding: str) -> None:
+        # Only called for bodies that are actually compressed: each coding gets its own strong ETag
+        headers["Content-Encoding"] = coding
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if etag and etag.endswith('"'):
+            headers["ETag"] = f'{etag[:-1]}-{coding}"'
+
+    def _compress(self, body: bytes, coding: str, etag: Optional[str]) -> bytes:
+        memo_key = (etag, coding) if etag else None
+        if memo_key is not None:
+            cached = self._memo.get(memo_key)
+            if cached is not None:
+                self._memo.move_to_end(memo_key)
+                return cached
+        if coding == "br":
+            compressed = brotli.compress(body, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+        if memo_key is not None:
+            self._memo[memo_key] = compressed
+            if len(self._memo) > self.memo_entries:
+                self._memo.popitem(last=False)
+        return compressed
+
+
+def create_compression_options() -> Optional[dict]:
+    """Keyword arguments for CompressionMiddleware, or None when disabled."""
+    if os.getenv("COMPRESSION_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return {
+        "minimum_size": int(os.getenv("COMPRESSION_MIN_BYTES", "1024")),
+        "gzip_level": int(os.getenv("GZIP_LEVEL", "6")),
+        "brotli_quality": int(os.getenv("BROTLI_QUALITY", "4")),
+    }
@@ -0,0 +1,319 @@
+import hashlib
+import importlib
+import os
+import tempfile
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from app.index_builder import fetch_documents, scan_keys
+from app.redis_client import RedisBackend
+from app.search import tokenize
+from app.views import MaintainedView
+
+
+EMBED_PREFIXES = ("chunk:",)
+DEFAULT_DIM = 256
+# Age after which saved matrices of older builds are deleted
+STALE_BUILD_SECONDS = 300
+
+# Maps a batch of texts to an (n, dim) float32 array
+EmbeddingFunction = Callable[[Sequence[str]], np.ndarray]
+
+
+def hashing_embedding(dim: int = DEFAULT_DIM) -> EmbeddingFunction:
+    """Local default: signed feature hashing of word unigrams and bigrams.
+
+    No model download and deterministic across processes, so a matrix saved
+    by one worker is valid for all. Swap in a real model with
+    EMBEDDING_FUNCTION for semantic rather than lexical similarity.
+    """
+
+    def embed(texts: Sequence[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            for feature in tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]:
+                digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % dim
+                matrix[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        return matrix
+
+    return embed
+
+
+def load_embedding_function(spec: Optional[str], dim: int) -> EmbeddingFunction:
+    """`module:callable` from EMBEDDING_FUNCTION, or the hashing embedding."""
+    if not spec:
+        return hashing_embedding(dim)
+    module_name, _, attribute = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _text(doc: dict) -> str:
+    text = doc.get("text", doc.get("content", ""))
+    return text if isinstance(text, str) else ""
+
+
+def _entry(doc: dict) -> Tuple[str, Optional[str], str]:
+    text = _text(doc)
+    return hashlib.blake2b(text.encode(), digest_size=16).hexdigest(), doc.get("parent"), text
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _write_atomic(directory: str, target: str, write: Callable[[BinaryIO], Any]) -> None:
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            write(handle)
+        os.replace(tmp, target)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+class EmbeddingIndex(MaintainedView):
+    """Chunk embeddings in one contiguous, L2-normalized float32 matrix.
+
+    Row i belongs to `keys[i]`; a query is embedded once and scored against
+    every chunk with a single matrix-vector product. With a `path`, the
+    matrix is saved as `<path>-<build>.npy`, named by `<path>.json` (keys,
+    content hashes and the build id derived from them), and memory-mapped at
+    startup, so queries are served before Redis is read; the background load
+    then re-embeds only chunks whose text changed. Changed keys from keyspace
+    notifications are re-embedded in batches, as in the other views.
+    """
+
+    label = "Embedding index"
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        embed: EmbeddingFunction,
+        path: Optional[str] = None,
+        batch_size: int = 200,
+        scan_count: int = 1000,
+        refresh_interval: float = 300.0,
+        push_active: Callable[[], bool] = lambda: False,
+    ) -> None:
+        super().__init__(backend, EMBED_PREFIXES, batch_size, scan_count, refresh_interval, push_active)
+        self.embed = embed
+        self.path = path
+        self.matrix: Optional[np.ndarray] = None
+        self.keys: List[str] = []
+        self.hashes: List[str] = []
+        self.parents: List[Optional[str]] = []
+        self.rows: Dict[str, int] = {}
+        self._snapshot: Tuple[Optional[np.ndarray], List[str]] = (None, [])
+        self.mapped = False
+        self.embedded = 0
+        self.queries = 0
+
+    # -- persistence -----------------------------------------------------------
+
+    @staticmethod
+    def _build_id(keys: List[str], hashes: List[str], dim: int) -> str:
+        digest = hashlib.blake2b(digest_size=12)
+        digest.update(orjson.dumps([dim, keys, hashes]))
+        return digest.hexdigest()
+
+    def _matrix_file(self, build: str) -> str:
+        return f"{self.path}-{build}.npy"
+
+    def map_from_disk(self) -> bool:
+        """Memory-map a previously saved matrix; returns whether one was found."""
+        if not self.path or not os.path.exists(self.path + ".json"):
+            return False
+        try:
+            with open(self.path + ".json", "rb") as handle:
+                meta = orjson.loads(handle.read())
+            matrix = np.load(self._matrix_file(meta["build"]), mmap_mode="r")
+            if matrix.ndim != 2 or self._build_id(meta["keys"], meta["hashes"], matrix.shape[1]) != meta["build"]:
+                raise ValueError("matrix does not belong to the saved keys")
+            if matrix.shape[0] != len(meta["keys"]):
+                raise ValueError("row count does not match keys")
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"⚠️ Ignoring saved embeddings: {exc}")
+            return False
+        self._replace(matrix, meta["keys"], meta["hashes"], meta["parents"])
+        self.mapped = True
+        self.ready = True
+        print(f"✅ Mapped {len(self.keys)} chunk embeddings from {self._matrix_file(meta['build'])}")
+        return True
+
+    def save(self) -> None:
+        if not self.path or self.matrix is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        matrix = np.ascontiguousarray(self.matrix)
+        build = self._build_id(self.keys, self.hashes, matrix.shape[1])
+        # The matrix file is named by its build and only `<path>.json` points at it, so replacing
+        # that one file publishes a consistent pair. Each file is written under a temporary name of
+        # its own, so neither a crash nor another worker saving at the same time leaves a torn file.
+        _write_atomic(directory, self._matrix_file(build), lambda handle: np.save(handle, matrix))
+        meta = orjson.dumps({"build": build, "keys": self.keys, "hashes": self.hashes, "parents": self.parents})
+        _write_atomic(directory, self.path + ".json", lambda handle: handle.write(meta))
+        self._remove_old_builds(build)
+
+    def _remove_old_builds(self, current: str) -> None:
+        # Matrices of other builds, once old enough that no other worker is between writing one and publishing it
+        prefix = os.path.basename(self.path) + "-"
+        directory = os.path.dirname(os.path.abspath(self.path))
+        for name in os.listdir(directory):
+            if not name.startswith(prefix) or not name.endswith(".npy") or name == os.path.basename(self._matrix_file(current)):
+                continue
+            try:
+                if os.path.getmtime(os.path.join(directory, name)) < time.time() - STALE_BUILD_SECONDS:
+                    os.unlink(os.path.join(directory, name))
+            except OSError:
+                pass
+
+    # -- loading -------------------------------------------------------------
+
+    def _replace(self, matrix: np.ndarray, keys: List[str], hashes: List[str], parents: List[Optional[str]]) -> None:
+        self.matrix = matrix
+        self.keys = keys
+        self.hashes = hashes
+        self.parents = parents
+        self.rows = {key: row for row, key in enumerate(keys)}
+        # Read once per query, so a query in a worker thread never pairs rows of one matrix with keys of another
+        self._snapshot = (matrix, keys)
+        self.version += 1
+
+    def _prepare(self, entries: Dict[str, Tuple[str, Optional[str], Optional[str]]]) -> Optional[tuple]:
+        """Matrix, keys, hashes and parents for `entries` of key -> (text hash, parent, text).
+
+        Rows whose hash is unchanged are copied over; the rest are embedded in
+        one batch (text None means "keep the current row"). Returns None when
+        nothing changed. Runs in a worker thread; the caller swaps the result in.
+        """
+        keys = sorted(entries)
+        stale = [
+            i for i, key in enumerate(keys)
+            if key not in self.rows or self.hashes[self.rows[key]] != entries[key][0]
+        ]
+        parents = [entries[key][1] for key in keys]
+        if not stale and keys == self.keys and parents == self.parents:
+            return None
+
+        dim = self.matrix.shape[1] if self.matrix is not None and self.matrix.ndim == 2 else None
+        fresh = _normalize(self.embed([entries[keys[i]][2] or "" for i in stale])) if stale else None
+        if fresh is not None:
+            if dim is not None and fresh.shape[1] != dim and len(stale) < len(keys):
+                raise ValueError("embedding dimension changed; a full reload is required")
+            dim = fresh.shape[1]
+
+        matrix = np.empty((len(keys), dim or 0), dtype=np.float32)
+        stale_rows = set(stale)
+        for i, key in enumerate(keys):
+            if i not in stale_rows:
+                matrix[i] = self.matrix[self.rows[key]]
+        if stale:
+            matrix[stale] = fresh
+        self.embedded += len(stale)
+        return matrix, keys, [entries[key][0] for key in keys], parents
+
+    async def _rebuild(self, entries: Dict[str, Tuple[str, Optional[str], Optional[str]]]) -> bool:
+        prepared = await run_in_threadpool(self._prepare, entries)
+        if prepared is None:
+            return False
+        self._replace(*prepared)
+        return True
+
+    async def load(self) -> None:
+        started = time.perf_counter()
+        keys = await scan_keys(self.backend, self.prefixes, self.scan_count)
+        fetched = await fetch_documents(self.backend, keys, self.batch_size)
+        embedded = self.embedded
+        entries = {key: _entry(doc) for key, doc in fetched.items() if doc is not None}
+        try:
+            changed = await self._rebuild(entries)
+        except ValueError:
+            # The saved matrix came from another embedding function
+            self.rows, self.hashes = {}, []
+            changed = await self._rebuild(entries)
+        self.mapped = self.mapped and not changed
+        self.ready = True
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        if changed:
+            await run_in_threadpool(self.save)
+        print(f"✅ Embedding index loaded: {len(self.keys)} chunks ({self.embedded - embedded} embedded) in {self.load_ms}ms")
+
+    async def apply(self, keys: List[str]) -> None:
+        fetched = await fetch_documents(self.backend, keys, self.batch_size)
+        entries = {key: (self.hashes[row], self.parents[row], None) for key, row in self.rows.items()}
+        for key, doc in fetched.items():
+            if doc is None:
+                entries.pop(key, None)
+            else:
+                entries[key] = _entry(doc)
+        if await self._rebuild(entries):
+            self.mapped = False
+            await run_in_threadpool(self.save)
+
+    # -- queries ---------------------------------------------------------------
+
+    def similar(self, query: str, limit: int, accept: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        """Top `limit` (key, cosine) pairs for `query`; `accept` filters keys."""
+        self.queries += 1
+        matrix, keys = self._snapshot
+        if matrix is None or not keys:
+            return []
+        vector = _normalize(self.embed([query]))[0]
+        if vector.shape[0] != matrix.shape[1]:
+            return []
+        scores = matrix @ vector
+        if accept is None:
+            count = min(limit, len(scores))
+            top = np.argpartition(-scores, count - 1)[:count]
+            order = top[np.argsort(-scores[top])]
+        else:
+            order = np.argsort(-scores)
+        results: List[Tuple[str, float]] = []
+        for row in order:
+            key = keys[row]
+            if accept is None or accept(key):
+                results.append((key, round(float(scores[row]), 4)))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "chunks": len(self.keys),
+            "dimensions": int(self.matrix.shape[1]) if self.matrix is not None and self.matrix.ndim == 2 else None,
+            "mapped": self.mapped,
+            "path": self.path,
+            "version": self.version,
+            "loadMs": self.load_ms,
+            "embedded": self.embedded,
+            "queries": self.queries,
+            "pendingUpdates": len(self._dirty),
+            "lastError": self.last_error,
+        }
+
+
+def create_embedding_index(backend: RedisBackend, push_active: Callable[[], bool]) -> Optional[EmbeddingIndex]:
+    if os.getenv("SIMILAR_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    dim = int(os.getenv("EMBEDDING_DIM", str(DEFAULT_DIM)))
+    return EmbeddingIndex(
+        backend,
+        load_embedding_function(os.getenv("EMBEDDING_FUNCTION"), dim),
+        path=os.getenv("EMBEDDINGS_PATH") or None,
+        batch_size=int(os.getenv("INDEX_BATCH_SIZE", "200")),
+        scan_count=int(os.getenv("HIERARCHY_SCAN_COUNT", "1000")),
+        refresh_interval=float(os.getenv("HIERARCHY_REFRESH_INTERVAL", "300")),
+        push_active=push_active,
+    )
@@ -0,0 +1,94 @@
+import hashlib
+from typing import Iterable, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+# Appended by CompressionMiddleware so each content coding has its own strong ETag
+CODING_SUFFIXES = ("-gzip", "-br")
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def _strip_coding(tag: str) -> str:
+    for suffix in CODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[: -len(suffix) - 1] + '"'
+    return tag
+
+
+def _matching_tag(if_none_match: str, etag: str) -> Optional[str]:
+    """The tag in `if_none_match` that names `etag` in any content coding, or None."""
+    if if_none_match.strip() == "*":
+        return etag
+    tags: List[str] = [tag.strip() for tag in if_none_match.split(",")]
+    return next((tag for tag in tags if _strip_coding(tag) == _strip_coding(etag)), None)
+
+
+class ETagMiddleware:
+    """Adds strong ETags to buffered JSON responses and answers `If-None-Match` with 304.
+
+    Endpoints may set the ETag themselves (e.g. from a memoized document hash);
+    otherwise it is the BLAKE2b hash of the body. Streamed responses pass
+    through untouched. The read endpoints are POST but have no side effects, so
+    POSTs to `read_paths` are treated like GET here; other POSTs are left alone.
+
+    A 304 repeats the tag the client sent, so a compressed variant keeps the
+    `-gzip`/`-br` suffix it was served with.
+    """
+
+    def __init__(self, app: ASGIApp, methods: Iterable[str] = ("GET", "HEAD"), read_paths: Iterable[str] = ()) -> None:
+        self.app = app
+        self.methods = frozenset(methods)
+        self.read_paths = frozenset(read_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or (scope["method"] not in self.methods and not (scope["method"] == "POST" and scope["path"] in self.read_paths)):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_with_etag(message: Message) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                if message["status"] != 200 or not headers.get("content-type", "").startswith("application/json"):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+            if message["type"] != "http.response.body" or start is None:
+                await send(message)
+                return
+            if message.get("more_body", False):
+                # Streaming: the body is not known up front
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start["headers"])
+            etag = headers.get("etag") or etag_for(body)
+            headers["ETag"] = etag
+            matched = _matching_tag(if_none_match, etag) if if_none_match else None
+            if matched is not None:
+                not_modified = MutableHeaders(raw=[(k, v) for k, v in start["headers"] if k not in (b"content-length", b"content-type")])
+                not_modified["ETag"] = matched
+                await send({"type": "http.response.start", "status": 304, "headers": not_modified.raw})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            await send(start)
+            await send(message)
+
+        await self.app(scope, receive, send_with_etag)
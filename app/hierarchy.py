@@ -0,0 +1,218 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from app.index_builder import scan_keys
+from app.redis_client import RedisBackend, redis_batch_size
+from app.views import MaintainedView
+
+
+# Only the fields needed for the graph are read, never the content itself
+NODE_FIELDS = ("$.parent", "$.title", "$.position")
+
+
+def _position_order(node: dict) -> tuple:
+    position = node.get("position")
+    if isinstance(position, (int, float)) and not isinstance(position, bool):
+        return (0, position, node["key"])
+    return (1, 0, node["key"])
+
+
+def _first(values: Any) -> Any:
+    # Multi-path JSON.GET returns every JSONPath match as a list
+    if isinstance(values, list):
+        return values[0] if values else None
+    return values
+
+
+class HierarchyIndex(MaintainedView):
+    """In-memory parent/child graph of doc → ch → p → sp/ssp → chunk keys.
+
+    Built once with SCAN plus pipelined multi-path JSON.GET of the `parent`,
+    `title` and `position` fields, then kept current from keyspace
+    notifications (see MaintainedView): changed keys are re-read in batches, a
+    resubscribe triggers a full reload, and without push notifications the
+    graph is rebuilt every `refresh_interval` seconds.
+    """
+
+    label = "Hierarchy index"
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        prefixes: Iterable[str],
+        batch_size: int = 200,
+        scan_count: int = 1000,
+        refresh_interval: float = 300.0,
+        push_active: Callable[[], bool] = lambda: False,
+    ) -> None:
+        super().__init__(backend, prefixes, batch_size, scan_count, refresh_interval, push_active)
+        self.nodes: Dict[str, dict] = {}
+        self.children: Dict[str, Set[str]] = {}
+        # `version` is bumped on every change to the graph
+        self.loaded_at: Optional[float] = None
+        self.updates = 0
+
+    # -- loading -------------------------------------------------------------
+
+    async def fetch_nodes(self, keys: List[str]) -> Dict[str, Optional[dict]]:
+        """Read the graph fields of `keys`; missing or non-JSON keys map to None."""
+        chunks = [keys[i : i + self.batch_size] for i in range(0, len(keys), self.batch_size)]
+        replies = await asyncio.gather(
+            *(self.backend.execute_pipeline([("JSON.GET", key, *NODE_FIELDS) for key in chunk]) for chunk in chunks)
+        )
+        nodes: Dict[str, Optional[dict]] = {}
+        for chunk, reply in zip(chunks, replies):
+            for key, raw in zip(chunk, reply):
+                if raw is None or isinstance(raw, Exception):
+                    nodes[key] = None
+                    continue
+                fields = orjson.loads(raw)
+                nodes[key] = {
+                    "key": key,
+                    "parent": _first(fields.get("$.parent")),
+                    "title": _first(fields.get("$.title")),
+                    "position": _first(fields.get("$.position")),
+                }
+        return nodes
+
+    async def load(self) -> None:
+        started = time.perf_counter()
+        keys = await scan_keys(self.backend, self.prefixes, self.scan_count)
+        fetched = await self.fetch_nodes(keys)
+
+        nodes = {key: node for key, node in fetched.items() if node is not None}
+        children: Dict[str, Set[str]] = {}
+        for key, node in nodes.items():
+            if node["parent"]:
+                children.setdefault(node["parent"], set()).add(key)
+
+        self.nodes = nodes
+        self.children = children
+        self.version += 1
+        self.ready = True
+        self.loaded_at = time.time()
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Hierarchy index loaded: {len(nodes)} nodes in {self.load_ms}ms")
+
+    def restore(self, nodes: Iterable[dict], loaded_at: Optional[float] = None) -> None:
+        """Serve `nodes` (from a startup snapshot) until the first full load replaces them."""
+        self.nodes = {node["key"]: node for node in nodes}
+        self.children = {}
+        for key, node in self.nodes.items():
+            if node["parent"]:
+                self.children.setdefault(node["parent"], set()).add(key)
+        self.version += 1
+        self.ready = True
+        self.loaded_at = loaded_at
+        print(f"✅ Hierarchy index restored from snapshot: {len(self.nodes)} nodes")
+
+    async def apply(self, keys: List[str]) -> None:
+        """Re-read `keys` and update their place in the graph."""
+        fetched = await self.fetch_nodes(keys)
+        for key, node in fetched.items():
+            self._unlink(key)
+            if node is not None:
+                self.nodes[key] = node
+                if node["parent"]:
+                    self.children.setdefault(node["parent"], set()).add(key)
+        self.version += 1
+        self.updates += len(keys)
+
+    def _unlink(self, key: str) -> None:
+        old = self.nodes.pop(key, None)
+        if old is not None and old["parent"]:
+            siblings = self.children.get(old["parent"])
+            if siblings is not None:
+                siblings.discard(key)
+                if not siblings:
+                    del self.children[old["parent"]]
+
+    # -- queries ---------------------------------------------------------------
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.nodes.get(key)
+
+    def children_of(self, key: str) -> List[dict]:
+        nodes = [self.nodes[child] for child in self.children.get(key, ()) if child in self.nodes]
+        nodes.sort(key=_position_order)
+        return nodes
+
+    def ancestors(self, key: str) -> List[str]:
+        """Parent chain of `key`, nearest first."""
+        chain: List[str] = []
+        node = self.nodes.get(key)
+        while node is not None and node["parent"] and node["parent"] not in chain:
+            chain.append(node["parent"])
+            node = self.nodes.get(node["parent"])
+        return chain
+
+    def descendants(self, key: str, depth: Optional[int] = None, parents: Optional[Dict[str, str]] = None) -> List[List[str]]:
+        """Descendant keys level by level, each level in position order.
+
+        `parents`, when given, is filled with the parent each key was reached from.
+        """
+        levels: List[List[str]] = []
+        visited = {key}
+        frontier = [key]
+        while frontier and (depth is None or len(levels) < depth):
+            level: List[str] = []
+            for parent in frontier:
+                for child in self.children_of(parent):
+                    if child["key"] not in visited:
+                        visited.add(child["key"])
+                        level.append(child["key"])
+                        if parents is not None:
+                            parents[child["key"]] = parent
+            if not level:
+                break
+            levels.append(level)
+            frontier = level
+        return levels
+
+    def subtree(self, key: str, depth: Optional[int] = None) -> Optional[dict]:
+        """Nested {key, title, position, children} tree rooted at `key`."""
+        if key not in self.nodes and key not in self.children:
+            return None
+
+        def build(current: str, remaining: Optional[int], visited: Set[str]) -> dict:
+            node = self.nodes.get(current, {"key": current, "title": None, "position": None})
+            tree = {"key": current, "title": node.get("title"), "position": node.get("position")}
+            visited.add(current)
+            if remaining is None or remaining > 0:
+                tree["children"] = [
+                    build(child["key"], None if remaining is None else remaining - 1, visited)
+                    for child in self.children_of(current)
+                    if child["key"] not in visited
+                ]
+            return tree
+
+        return build(key, depth, set())
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "nodes": len(self.nodes),
+            "version": self.version,
+            "loadedAt": self.loaded_at,
+            "loadMs": self.load_ms,
+            "updates": self.updates,
+            "pendingUpdates": len(self._dirty),
+            "lastError": self.last_error,
+        }
+
+
+def create_hierarchy(backend: RedisBackend, prefixes: Iterable[str], push_active: Callable[[], bool]) -> Optional[HierarchyIndex]:
+    if os.getenv("HIERARCHY_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return HierarchyIndex(
+        backend,
+        prefixes,
+        batch_size=redis_batch_size(),
+        scan_count=int(os.getenv("HIERARCHY_SCAN_COUNT", "1000")),
+        refresh_interval=float(os.getenv("HIERARCHY_REFRESH_INTERVAL", "300")),
+        push_active=push_active,
+    )
@@ -0,0 +1,361 @@
+import asyncio
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+import orjson
+
+from app.redis_client import RedisBackend
+
+
+INDEX_KEY = "index:database_schema"
+INDEX_PREFIXES = ("doc:", "ch:", "p:", "sp:", "ssp:", "chunk:")
+# Nodes whose text is aggregated into paragraph summaries
+CONTENT_PREFIXES = ("sp:", "chunk:")
+SUMMARY_CHARS = 400
+# Chapter without content in the database, left out of the index
+SKIPPED_CHAPTERS = {"ch:communication_rules:001"}
+KEY_PATTERNS = {
+    "doc": "Document level - top level content containers",
+    "ch": "Chapter level - major sections within documents",
+    "p": "Paragraph level - main content blocks with summaries",
+    "sp": "Subparagraph level - detailed subsections",
+    "ssp": "Sub-subparagraph level - finest granularity",
+    "chunk": "Text chunks - small searchable pieces",
+}
+
+
+def _position(node: dict, default: Any = 0) -> Any:
+    position = node.get("position", default)
+    return position if isinstance(position, (int, float)) and not isinstance(position, bool) else default
+
+
+def _node(key: str, doc: dict) -> dict:
+    """The fields of a document the index needs; content is dropped for structural levels."""
+    node = {"parent": doc.get("parent"), "title": doc.get("title"), "position": doc.get("position")}
+    if key.startswith("doc:"):
+        node["metadata"] = doc.get("metadata") if isinstance(doc.get("metadata"), dict) else {}
+        node["total_chapters"] = doc.get("total_chapters", 0)
+    elif key.startswith("chunk:"):
+        node["content"] = doc.get("text", doc.get("content", ""))
+    elif key.startswith(CONTENT_PREFIXES):
+        node["content"] = doc.get("content", doc.get("text", ""))
+    return node
+
+
+def summarize(contents: List[str]) -> str:
+    """First 400 characters of the joined contents, with an ellipsis when cut."""
+    if not contents:
+        return ""
+    combined = " ".join(contents)
+    summary = combined[:SUMMARY_CHARS].strip()
+    if len(combined) > SUMMARY_CHARS:
+        summary += "..."
+    return summary
+
+
+async def scan_keys(backend: RedisBackend, prefixes: Iterable[str], count: int = 1000) -> List[str]:
+    """Every key under `prefixes`, listed with SCAN so Redis is never blocked."""
+    prefixes = tuple(prefixes)
+    keys: List[str] = []
+    cursor = 0
+    while True:
+        cursor, batch = await backend.execute_command("SCAN", cursor, "COUNT", count)
+        keys.extend(key for key in batch if key.startswith(prefixes))
+        if int(cursor) == 0:
+            return keys
+
+
+async def fetch_documents(
+    backend: RedisBackend, keys: List[str], batch_size: int = 200, pipeline_batches: int = 8
+) -> Dict[str, Optional[dict]]:
+    """Read `keys` with JSON.MGET, `pipeline_batches` batches per round trip.
+
+    Missing keys and values that are not JSON objects map to None.
+    """
+    batches = [keys[i : i + batch_size] for i in range(0, len(keys), batch_size)]
+    docs: Dict[str, Optional[dict]] = {}
+    for start in range(0, len(batches), pipeline_batches):
+        group = batches[start : start + pipeline_batches]
+        replies = await backend.execute_pipeline([("JSON.MGET", *batch, ".") for batch in group])
+        for batch, reply in zip(group, replies):
+            if isinstance(reply, Exception):
+                raise reply
+            for key, raw in zip(batch, reply):
+                doc = orjson.loads(raw) if raw is not None else None
+                docs[key] = doc if isinstance(doc, dict) else None
+    return docs
+
+
+class IndexBuilder:
+    """Builds `index:database_schema` (doc → ch → p with content summaries).
+
+    Keys are listed with SCAN and read with pipelined `JSON.MGET` batches, so
+    every key is read exactly once per full build. The builder keeps the
+    fields it needs in memory; `update()` re-reads only changed keys and
+    re-aggregates only the paragraphs whose subtree they belong to. In the
+    proxy it registers as a keyspace subscriber, so changed keys are tracked
+    between rebuilds; without push invalidation nothing is tracked and
+    `update()` rebuilds in full.
+    """
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        batch_size: int = 200,
+        pipeline_batches: int = 8,
+        scan_count: int = 1000,
+        prefixes: Iterable[str] = INDEX_PREFIXES,
+        push_active: Callable[[], bool] = lambda: False,
+    ) -> None:
+        self.backend = backend
+        self.batch_size = batch_size
+        self.pipeline_batches = pipeline_batches
+        self.scan_count = scan_count
+        self.prefixes = tuple(prefixes)
+        self.push_active = push_active
+        self.nodes: Dict[str, dict] = {}
+        self.children: Dict[str, List[str]] = {}
+        self.paragraphs: Dict[str, dict] = {}
+        self.built = False
+        self.total_keys = 0
+        self.last_report: Optional[dict] = None
+        self._dirty: Set[str] = set()
+        self._resync = False
+        self._lock = asyncio.Lock()
+
+    # -- keyspace subscriber interface -------------------------------------
+
+    def key_changed(self, key: str) -> None:
+        if self.built and key.startswith(self.prefixes):
+            self._dirty.add(key)
+
+    def resync(self) -> None:
+        self._resync = True
+
+    # -- reading -------------------------------------------------------------
+
+    async def scan_keys(self) -> List[str]:
+        return await scan_keys(self.backend, self.prefixes, self.scan_count)
+
+    async def fetch(self, keys: List[str]) -> Dict[str, Optional[dict]]:
+        docs = await fetch_documents(self.backend, keys, self.batch_size, self.pipeline_batches)
+        return {key: _node(key, doc) if doc is not None else None for key, doc in docs.items()}
+
+    # -- building --------------------------------------------------------------
+
+    async def build(self) -> dict:
+        """Full rebuild: SCAN every key and read each one once."""
+        async with self._lock:
+            return await self._build()
+
+    async def _build(self) -> dict:
+        timings: Dict[str, float] = {}
+        started = time.perf_counter()
+        self._dirty.clear()
+        self._resync = False
+
+        step = time.perf_counter()
+        keys = await self.scan_keys()
+        self.total_keys = int(await self.backend.execute_command("DBSIZE"))
+        timings["scan"] = _ms(step)
+
+        step = time.perf_counter()
+        fetched = await self.fetch(keys)
+        timings["read"] = _ms(step)
+
+        step = time.perf_counter()
+        self.nodes = {key: node for key, node in fetched.items() if node is not None}
+        self.children = {}
+        for key in sorted(self.nodes):
+            parent = self.nodes[key]["parent"]
+            if parent:
+                self.children.setdefault(parent, []).append(key)
+        self.paragraphs = {key: self._paragraph(key) for key in self.nodes if key.startswith("p:")}
+        timings["aggregate"] = _ms(step)
+
+        self.built = True
+        return self._report("full", len(keys), len(self.paragraphs), timings, started)
+
+    async def update(self, keys: Optional[Iterable[str]] = None) -> dict:
+        """Incremental rebuild from `keys` (default: keys changed since the last build).
+
+        Falls back to a full build before the first build, after a resync
+        (notifications may have been missed) and, when no `keys` are given,
+        while push invalidation is inactive, since changes are then not tracked.
+        """
+        async with self._lock:
+            # Checked under the lock: a resync may arrive while an earlier build or update runs
+            if not self.built or self._resync or (keys is None and not self.push_active()):
+                return await self._build()
+            timings: Dict[str, float] = {}
+            started = time.perf_counter()
+            changed = set(self._dirty if keys is None else keys)
+            self._dirty -= changed
+            changed = sorted(key for key in changed if key.startswith(self.prefixes))
+
+            step = time.perf_counter()
+            fetched = await self.fetch(changed)
+            self.total_keys = int(await self.backend.execute_command("DBSIZE"))
+            timings["read"] = _ms(step)
+
+            step = time.perf_counter()
+            affected: Set[str] = set()
+            for key, node in fetched.items():
+                affected.update(self._paragraph_of(key))
+                self._unlink(key)
+                if node is not None:
+                    self.nodes[key] = node
+                    if node["parent"]:
+                        siblings = self.children.setdefault(node["parent"], [])
+                        siblings.append(key)
+                        siblings.sort()
+                affected.update(self._paragraph_of(key))
+            for key in affected:
+                if key in self.nodes:
+                    self.paragraphs[key] = self._paragraph(key)
+                else:
+                    self.paragraphs.pop(key, None)
+            timings["aggregate"] = _ms(step)
+
+            return self._report("incremental", len(changed), len(affected), timings, started)
+
+    def _unlink(self, key: str) -> None:
+        old = self.nodes.pop(key, None)
+        if old is not None and old["parent"] in self.children:
+            siblings = self.children[old["parent"]]
+            if key in siblings:
+                siblings.remove(key)
+            if not siblings:
+                del self.children[old["parent"]]
+
+    def _paragraph_of(self, key: str) -> List[str]:
+        """The paragraph whose summary includes `key` (itself for a paragraph)."""
+        seen: Set[str] = set()
+        current: Optional[str] = key
+        while current and current not in seen:
+            if current.startswith("p:"):
+                return [current]
+            seen.add(current)
+            node = self.nodes.get(current)
+            current = node["parent"] if node is not None else None
+        return []
+
+    def _contents(self, key: str) -> List[str]:
+        contents: List[str] = []
+        visited: Set[str] = set()
+        stack = [key]
+        # Depth-first, children in key order: subparagraphs before their chunks
+        while stack:
+            current = stack.pop()
+            if current in visited:
+                continue
+            visited.add(current)
+            if current != key:
+                content = self.nodes[current].get("content")
+                if content:
+                    contents.append(content)
+            children = [child for child in self.children.get(current, ()) if child.startswith(CONTENT_PREFIXES)]
+            stack.extend(reversed(children))
+        return contents
+
+    def _paragraph(self, key: str) -> dict:
+        node = self.nodes[key]
+        contents = self._contents(key)
+        return {
+            "key": key,
+            "title": node.get("title") or "Untitled",
+            "position": _position(node),
+            "summary": summarize(contents),
+            "has_content": bool(contents),
+            "sub_elements": len(contents),
+        }
+
+    # -- output ----------------------------------------------------------------
+
+    def keys(self, prefix: str) -> List[str]:
+        return sorted(key for key in self.nodes if key.startswith(prefix))
+
+    def children_of(self, key: str, prefix: str) -> List[str]:
+        return [child for child in self.children.get(key, ()) if child.startswith(prefix)]
+
+    def index(self) -> dict:
+        """The `index:database_schema` document, assembled from the in-memory state."""
+        documents = []
+        for doc_key in self.keys("doc:"):
+            doc = self.nodes[doc_key]
+            chapters = []
+            for ch_key in self.children_of(doc_key, "ch:"):
+                if ch_key in SKIPPED_CHAPTERS:
+                    continue
+                chapter = self.nodes[ch_key]
+                paragraphs = [self.paragraphs[p_key] for p_key in self.children_of(ch_key, "p:") if p_key in self.paragraphs]
+                paragraphs.sort(key=lambda entry: entry["position"])
+                chapters.append({
+                    "key": ch_key,
+                    "title": chapter.get("title") or "Untitled",
+                    "position": _position(chapter),
+                    "paragraphs": paragraphs,
+                })
+            chapters.sort(key=lambda entry: entry["position"])
+            documents.append({
+                "key": doc_key,
+                "title": doc.get("title") or "Untitled",
+                "author": doc["metadata"].get("author", ""),
+                "created": doc["metadata"].get("created", ""),
+                "total_chapters": doc.get("total_chapters", 0),
+                "chapters": chapters,
+            })
+        return {
+            "generated_at": datetime.now().strftime("%Y-%m-%d"),
+            "version": "2.0",
+            "total_keys": self.total_keys,
+            "documents": documents,
+            "key_patterns": KEY_PATTERNS,
+        }
+
+    async def write(self, key: str = INDEX_KEY) -> dict:
+        """Store the index with JSON.SET; returns the report with write timing."""
+        started = time.perf_counter()
+        await self.backend.execute_command("JSON.SET", key, "$", orjson.dumps(self.index()).decode())
+        report = dict(self.last_report or {})
+        report["timingsMs"] = {**report.get("timingsMs", {}), "write": _ms(started)}
+        self.last_report = report
+        return report
+
+    def _report(self, mode: str, keys: int, paragraphs: int, timings: Dict[str, float], started: float) -> dict:
+        self.last_report = {
+            "mode": mode,
+            "keysRead": keys,
+            "paragraphsAggregated": paragraphs,
+            "nodes": len(self.nodes),
+            "totalKeys": self.total_keys,
+            "timingsMs": timings,
+            "totalMs": _ms(started),
+        }
+        return self.last_report
+
+    def stats(self) -> dict:
+        return {
+            "built": self.built,
+            "nodes": len(self.nodes),
+            "pendingChanges": len(self._dirty),
+            "resyncPending": self._resync,
+            "lastBuild": self.last_report,
+        }
+
+
+def _ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def create_index_builder(backend: RedisBackend, push_active: Callable[[], bool]) -> Optional[IndexBuilder]:
+    if os.getenv("INDEX_REBUILD_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    return IndexBuilder(
+        backend,
+        batch_size=int(os.getenv("INDEX_BATCH_SIZE", "200")),
+        scan_count=int(os.getenv("HIERARCHY_SCAN_COUNT", "1000")),
+        push_active=push_active,
+    )
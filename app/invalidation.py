@@ -0,0 +1,165 @@
+import asyncio
+import os
+import time
+from typing import Callable, Iterable, List, Optional
+
+import redis.asyncio as aioredis
+
+from app.cache import JsonCache
+
+
+class KeyspaceInvalidator:
+    """Evicts cached keys as soon as Redis reports a write to them.
+
+    Subscribes to `__keyspace@<db>__:<prefix>*` for every allowed prefix on a
+    background task. While the subscription is down the cache falls back to
+    TTL-only mode, with entry age capped at `fallback_ttl`; after a reconnect the
+    cache is cleared because notifications may have been missed in between.
+    Other in-memory views register as `subscribers` with `key_changed(key)` and
+    `resync()` methods and are notified the same way.
+    Requires `notify-keyspace-events` to include keyspace (K) events for generic
+    (g), string ($), expired (x) and module (d, used by JSON.SET) commands.
+    """
+
+    def __init__(
+        self,
+        cache: Optional[JsonCache],
+        client_factory: Callable[[], aioredis.Redis],
+        prefixes: Iterable[str],
+        db: int = 0,
+        fallback_ttl: float = 60.0,
+        configure: bool = False,
+        subscribers: Optional[List] = None,
+    ) -> None:
+        self.cache = cache
+        self.subscribers = list(subscribers or [])
+        self.client_factory = client_factory
+        self.channel_prefix = f"__keyspace@{db}__:"
+        self.patterns = [f"{self.channel_prefix}{prefix}*" for prefix in prefixes]
+        self.fallback_ttl = fallback_ttl
+        self.configure = configure
+        self.subscribed = False
+        self.connected_since: Optional[float] = None
+        self.events = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+        self._backoff = 1.0
+        self._was_subscribed = False
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._fallback()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"⚠️ Keyspace subscription lost, cache in TTL-only mode: {exc}")
+            await asyncio.sleep(self._backoff)
+            self._backoff = min(self._backoff * 2, 30.0)
+            self.reconnects += 1
+
+    async def _listen(self) -> None:
+        client = self.client_factory()
+        try:
+            if self.configure:
+                try:
+                    await client.config_set("notify-keyspace-events", "Kg$xd")
+                except Exception as exc:
+                    # Managed Redis usually disables CONFIG; set it in the console instead
+                    print(f"⚠️ Could not enable keyspace notifications: {exc}")
+
+            pubsub = client.pubsub()
+            await pubsub.psubscribe(*self.patterns)
+            self.connected_since = time.time()
+            self._backoff = 1.0
+            if await self._notifications_enabled(client):
+                # Anything cached before this point may have missed its notification
+                if self.cache is not None:
+                    self.cache.clear()
+                    self.cache.ttl_cap = None
+                if self._was_subscribed:
+                    # Subscribers load their initial state themselves at startup
+                    for subscriber in self.subscribers:
+                        subscriber.resync()
+                self.subscribed = True
+                self._was_subscribed = True
+                print("✅ Subscribed to keyspace notifications, cache in push-invalidation mode")
+            else:
+                print("⚠️ notify-keyspace-events has no keyspace events, cache stays in TTL-only mode")
+
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message is None:
+                    continue
+                channel = message["channel"]
+                if channel.startswith(self.channel_prefix):
+                    self.events += 1
+                    key = channel[len(self.channel_prefix) :]
+                    if self.cache is not None:
+                        self.cache.invalidate(key)
+                    for subscriber in self.subscribers:
+                        subscriber.key_changed(key)
+        finally:
+            self._fallback()
+            await client.aclose()
+
+    @staticmethod
+    async def _notifications_enabled(client: aioredis.Redis) -> bool:
+        try:
+            flags = (await client.config_get("notify-keyspace-events")).get("notify-keyspace-events", "")
+        except Exception:
+            # CONFIG is unavailable on managed Redis; trust the documented setup
+            return True
+        return "K" in flags and ("A" in flags or "d" in flags)
+
+    def _fallback(self) -> None:
+        self.subscribed = False
+        self.connected_since = None
+        if self.cache is not None:
+            self.cache.ttl_cap = self.fallback_ttl
+
+    def status(self) -> dict:
+        return {
+            "mode": "push" if self.subscribed else "ttl-only",
+            "subscribed": self.subscribed,
+            "connectedSince": self.connected_since,
+            "events": self.events,
+            "reconnects": self.reconnects,
+            "lastError": self.last_error,
+        }
+
+
+def create_invalidator(
+    cache: Optional[JsonCache],
+    client_factory: Callable[[], aioredis.Redis],
+    prefixes: Iterable[str],
+    subscribers: Optional[List] = None,
+) -> Optional[KeyspaceInvalidator]:
+    if os.getenv("CACHE_INVALIDATION", "true").lower() not in ("1", "true", "yes"):
+        return None
+    if cache is None and not subscribers:
+        return None
+    return KeyspaceInvalidator(
+        cache,
+        client_factory,
+        prefixes,
+        fallback_ttl=float(os.getenv("CACHE_FALLBACK_TTL", "60")),
+        configure=os.getenv("CACHE_NOTIFY_CONFIGURE", "false").lower() in ("1", "true", "yes"),
+        subscribers=subscribers,
+    )
@@ -1,21 +1,162 @@
-import json
+import asyncio
+import math
 import os
-from typing import List, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-import redis
-from fastapi import Body, Depends, FastAPI, Header, HTTPException, status
+import orjson
+from fastapi import Body, Depends, FastAPI, Header, HTTPException, Response, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from starlette.requests import Request
-from starlette.middleware.base import BaseHTTPMiddleware
 import time
-import uuid
 
+from app.admission import AdmissionMiddleware, create_admission
+from app.aggregates import AggregateIndex, create_aggregates
+from app.breaker import OPEN, CircuitBreaker, CircuitOpenError, create_circuit_breaker
+from app.cache import ROOT_PATHS, JsonCache, create_cache
+from app.compression import CompressionMiddleware, create_compression_options
+from app.embeddings import EmbeddingIndex, create_embedding_index
+from app.etags import ETagMiddleware
+from app.hierarchy import HierarchyIndex, create_hierarchy
+from app.index_builder import IndexBuilder, create_index_builder
+from app.invalidation import KeyspaceInvalidator, create_invalidator
+from app.metrics import REDIS_REPLY_BYTES, Gauge, MetricsMiddleware, observe_stage, registry
+from app.pool_health import PoolHealth, create_pool_health
+from app.projection import ReadPath, json_get_args, normalize_fields, project
+from app.rawjson import RawJson, RawJSONResponse, dumps, object_key, value_bytes
+from app.redis_client import TRANSIENT_ERRORS, RedisBackend, connect_backend, create_pubsub_client, redis_batch_size
+from app.replicas import ReplicaRouter, create_replica_router
+from app.request_log import RequestLoggingMiddleware, create_log_sink, log_sample_rate
+from app.search import RediSearchBackend, SearchIndex, create_search
+from app.singleflight import SingleFlight
+from app.snapshot import CorpusSnapshot, create_snapshot
+from app.stale import create_last_known_good
 
-app = FastAPI(title="FastAPI Redis Proxy", version="0.1.0")
+
+redis_client: Optional[RedisBackend] = None
+replica_router: Optional[ReplicaRouter] = None
+circuit_breaker: Optional[CircuitBreaker] = None
+json_cache: Optional[JsonCache] = None
+invalidator: Optional[KeyspaceInvalidator] = None
+hierarchy: Optional[HierarchyIndex] = None
+pool_health: Optional[PoolHealth] = None
+index_builder: Optional[IndexBuilder] = None
+search_index: Optional[SearchIndex] = None
+redisearch: Optional[RediSearchBackend] = None
+embedding_index: Optional[EmbeddingIndex] = None
+aggregates: Optional[AggregateIndex] = None
+snapshot: Optional[CorpusSnapshot] = None
+flights = SingleFlight()
+last_known_good = create_last_known_good()
+log_sink = create_log_sink()
+admission, rate_limiter = create_admission()
+
+
+def _push_active() -> bool:
+    return invalidator is not None and invalidator.subscribed
+
+
+def _snapshot_contents() -> Tuple[List[Tuple[str, RawJson]], List[dict]]:
+    documents = json_cache.hottest() if json_cache is not None else []
+    nodes = list(hierarchy.nodes.values()) if hierarchy is not None and hierarchy.ready else []
+    return [(key, doc) for key, doc in documents if isinstance(doc, RawJson)], nodes
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global redis_client, replica_router, circuit_breaker, json_cache, invalidator, hierarchy, pool_health, index_builder, search_index, redisearch, embedding_index, aggregates, snapshot
+    log_sink.start()
+    redis_client = await connect_backend()
+    primary = redis_client
+    replica_router = create_replica_router(redis_client)
+    if replica_router is not None:
+        # Reads are routed across the primary and replicas from here on
+        redis_client = replica_router
+        await replica_router.probe()
+        replica_router.start()
+    circuit_breaker = create_circuit_breaker(redis_client)
+    if circuit_breaker is not None:
+        redis_client = circuit_breaker
+    # The views re-read keys right after their keyspace notifications, which come from the
+    # primary; a replica may not have the write yet, and no second notification would follow
+    views_backend = primary if replica_router is not None else redis_client
+    pool_health = create_pool_health(redis_client)
+    await pool_health.warm()
+    pool_health.start()
+    json_cache = create_cache(decode=RawJson)
+    hierarchy = create_hierarchy(views_backend, CONTENT_KEY_PREFIXES, _push_active)
+    index_builder = create_index_builder(views_backend, _push_active)
+    aggregates = create_aggregates(views_backend, CONTENT_KEY_PREFIXES, _push_active)
+    search_index, redisearch = create_search(views_backend, _push_active, hierarchy.ancestors if hierarchy is not None else None)
+    if redisearch is not None and not await redisearch.detect():
+        print(f"⚠️ RediSearch index {redisearch.index} not found, searching in memory only")
+    embedding_index = create_embedding_index(views_backend, _push_active)
+    if embedding_index is not None:
+        embedding_index.map_from_disk()
+    snapshot = create_snapshot(views_backend, _push_active)
+    if snapshot is not None and snapshot.map_from_disk() and hierarchy is not None and snapshot.nodes:
+        # Serve the tree straight away; the first full load replaces it
+        hierarchy.restore(snapshot.nodes, snapshot.created_at)
+
+    use_tls = redis_client.use_tls
+    subscribers = [
+        view for view in (replica_router, hierarchy, index_builder, aggregates, search_index, embedding_index, snapshot) if view is not None
+    ]
+    invalidator = create_invalidator(json_cache, lambda: create_pubsub_client(use_tls), ALLOWED_KEY_PREFIXES, subscribers)
+    if invalidator is not None:
+        invalidator.start()
+    if hierarchy is not None:
+        hierarchy.start()
+    if aggregates is not None:
+        aggregates.start()
+    if search_index is not None:
+        search_index.start()
+    if embedding_index is not None:
+        embedding_index.start()
+    if snapshot is not None:
+        snapshot.start(_snapshot_contents)
+    try:
+        yield
+    finally:
+        try:
+            if snapshot is not None:
+                # Writes a final snapshot, so it needs Redis and the views still running
+                await snapshot.stop()
+            if embedding_index is not None:
+                await embedding_index.stop()
+            if search_index is not None:
+                await search_index.stop()
+            if aggregates is not None:
+                await aggregates.stop()
+            if hierarchy is not None:
+                await hierarchy.stop()
+            if invalidator is not None:
+                await invalidator.stop()
+            await pool_health.stop()
+            await redis_client.close()
+        finally:
+            redis_client = None
+            replica_router = None
+            circuit_breaker = None
+            pool_health = None
+            invalidator = None
+            hierarchy = None
+            index_builder = None
+            search_index = None
+            redisearch = None
+            embedding_index = None
+            aggregates = None
+            snapshot = None
+            log_sink.stop()
+
+
+app = FastAPI(title="FastAPI Redis Proxy", version="0.1.0", lifespan=lifespan)
 
 
 class JsonGetRequest(BaseModel):
     key: str
+    fields: Optional[List[str]] = None
 
 
 class CommandRequest(BaseModel):
@@ -23,144 +164,614 @@ class CommandRequest(BaseModel):
     args: List[str] = []
 
 
-def require_api_key(x_api_key: Optional[str] = Header(default=None, alias="X-API-Key")) -> None:
-    expected = os.getenv("API_KEY")
-    if not expected:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Server API key not configured")
-    if not x_api_key or x_api_key != expected:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing API key")
+class BatchOperation(BaseModel):
+    command: str
+    args: List[Any] = []
 
 
-def create_redis_client() -> redis.Redis:
-    import ssl
-    
-    host = os.getenv("REDIS_HOST")
-    port_str = os.getenv("REDIS_PORT", "6379")
-    password = os.getenv("REDIS_PASSWORD")
-    use_tls = os.getenv("REDIS_TLS", "false").lower() in ("1", "true", "yes")
+class BatchRequest(BaseModel):
+    ops: List[BatchOperation]
 
-    if not host or not password:
-        raise RuntimeError("Missing REDIS_HOST or REDIS_PASSWORD environment variables")
 
-    port = int(port_str)
-    
-    # SSL configuration for Redis Cloud - more permissive
-    ssl_kwargs = {}
-    if use_tls:
-        # Create SSL context with minimal verification
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        
-        ssl_kwargs = {
-            "ssl": True,
-            "ssl_context": ssl_context,
-        }
-    
-    return redis.Redis(
-        host=host, 
-        port=port, 
-        password=password, 
-        decode_responses=True,
-        socket_timeout=10,
-        socket_connect_timeout=10,
-        **ssl_kwargs
-    )
-
-
-redis_client: Optional[redis.Redis] = None
+class SubtreeRequest(BaseModel):
+    key: str
+    depth: Optional[int] = None
+    fields: Optional[List[str]] = None
 
 
-@app.on_event("startup")
-def on_startup() -> None:
-    global redis_client
-    
-    # Try TLS first, then fallback to non-TLS
+async def require_api_key(x_api_key: Optional[str] = Header(default=None, alias="X-API-Key")) -> None:
+    started = time.perf_counter_ns()
     try:
-        redis_client = create_redis_client()
-        redis_client.ping()
-        print("✅ Connected to Redis with TLS")
-    except Exception as tls_exc:
-        print(f"⚠️ TLS connection failed: {tls_exc}")
-        print("🔄 Trying without TLS...")
-        
-        try:
-            # Fallback: try without TLS
-            host = os.getenv("REDIS_HOST")
-            port = int(os.getenv("REDIS_PORT", "6379"))
-            password = os.getenv("REDIS_PASSWORD")
-            
-            redis_client = redis.Redis(
-                host=host,
-                port=port,
-                password=password,
-                ssl=False,  # No TLS
-                decode_responses=True,
-                socket_timeout=10,
-                socket_connect_timeout=10,
-            )
-            redis_client.ping()
-            print("✅ Connected to Redis without TLS")
-        except Exception as no_tls_exc:
-            print(f"❌ Both TLS and non-TLS failed")
-            print(f"TLS error: {tls_exc}")
-            print(f"Non-TLS error: {no_tls_exc}")
-            raise RuntimeError(f"Failed to connect to Redis with TLS ({tls_exc}) and without TLS ({no_tls_exc})")
-
-
-@app.on_event("shutdown")
-def on_shutdown() -> None:
-    global redis_client
-    if redis_client is not None:
-        try:
-            redis_client.close()
-        finally:
-            redis_client = None
+        expected = os.getenv("API_KEY")
+        if not expected:
+            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Server API key not configured")
+        if not x_api_key or x_api_key != expected:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or missing API key")
+    finally:
+        observe_stage("auth", started)
 
 
 @app.get("/health")
 def health() -> dict:
-    return {"status": "ok"}
+    if redis_client is None or pool_health is None:
+        return {"status": "starting"}
+    # The health check PINGs past the breaker, so an open circuit has to be reported on its own
+    circuit_open = circuit_breaker is not None and circuit_breaker.state == OPEN
+    return {
+        "status": "ok" if pool_health.healthy and not circuit_open else "degraded",
+        "redis": {"mode": redis_client.mode, "tls": redis_client.use_tls, **pool_health.status()},
+        "pool": redis_client.pool_stats(),
+        "replicas": replica_router.stats() if replica_router is not None else None,
+        "circuit": circuit_breaker.stats() if circuit_breaker is not None else None,
+        "stale": last_known_good.stats() if last_known_good is not None else None,
+        "admission": {
+            **(admission.stats() if admission is not None else {}),
+            "rateLimit": rate_limiter.stats() if rate_limiter is not None else None,
+        },
+    }
+
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def _pool_gauge() -> Dict[Tuple[str, ...], float]:
+    if redis_client is None:
+        return {}
+    pool = redis_client.pool_stats()
+    return {("in_use",): pool["inUse"], ("idle",): pool["idle"], ("max",): pool["maxConnections"]}
+
+
+def _cache_gauge() -> Dict[Tuple[str, ...], float]:
+    if json_cache is None:
+        return {}
+    stats = json_cache.stats()
+    return {(name,): stats[name] for name in ("entries", "bytes", "hits", "misses", "evictions", "invalidations")}
+
+
+def _replica_rtt_gauge() -> Dict[Tuple[str, ...], float]:
+    if replica_router is None:
+        return {}
+    return {
+        (endpoint["name"],): endpoint["rttMs"]
+        for endpoint in replica_router.stats()["endpoints"]
+        if endpoint["rttMs"] is not None
+    }
+
+
+def _shed_gauge() -> Dict[Tuple[str, ...], float]:
+    shed: Dict[Tuple[str, ...], float] = {}
+    if admission is not None:
+        shed.update({(reason,): count for reason, count in admission.shed.items()})
+    if rate_limiter is not None:
+        shed[("rate_limited",)] = rate_limiter.limited
+    return shed
+
+
+registry.register(Gauge("proxy_redis_pool_connections", "Redis pool connections by state.", _pool_gauge, ("state",)))
+registry.register(Gauge("proxy_redis_endpoint_rtt_ms", "Moving average of PING round trips per Redis endpoint.", _replica_rtt_gauge, ("endpoint",)))
+registry.register(
+    Gauge(
+        "proxy_redis_hedged_reads",
+        "Reads routed across replicas: hedges sent and won, failovers.",
+        lambda: {("hedged",): replica_router.hedged, ("won",): replica_router.hedge_wins, ("failover",): replica_router.failovers}
+        if replica_router is not None
+        else {},
+        ("outcome",),
+    )
+)
+registry.register(
+    Gauge(
+        "proxy_redis_circuit_state",
+        "Redis circuit breaker state (closed, open, half_open), 1 for the current one.",
+        lambda: {(state,): int(state == circuit_breaker.state) for state in ("closed", "open", "half_open")} if circuit_breaker is not None else {},
+        ("state",),
+    )
+)
+registry.register(
+    Gauge(
+        "proxy_stale_served",
+        "Replies served from the last known good store while Redis could not answer.",
+        lambda: {(): last_known_good.served} if last_known_good is not None else {},
+    )
+)
+registry.register(Gauge("proxy_cache", "Read-through cache statistics.", _cache_gauge, ("stat",)))
+registry.register(
+    Gauge(
+        "proxy_snapshot",
+        "Startup snapshot: documents still mapped, served from it and dropped as changed.",
+        lambda: {(name,): snapshot.stats()[name] for name in ("documents", "served", "dropped")} if snapshot is not None else {},
+        ("stat",),
+    )
+)
+registry.register(Gauge("proxy_log_records", "Request log records by outcome.", lambda: {(name,): value for name, value in log_sink.stats().items()}, ("state",)))
+registry.register(
+    Gauge(
+        "proxy_admission",
+        "Admission control: running and queued requests.",
+        lambda: {("in_flight",): admission.in_flight, ("queued",): admission.queued} if admission is not None else {},
+        ("state",),
+    )
+)
+registry.register(Gauge("proxy_shed_requests", "Requests rejected by admission control and rate limiting, by reason.", _shed_gauge, ("reason",)))
+registry.register(Gauge("proxy_singleflight_in_flight", "Distinct Redis reads currently in flight.", lambda: {(): flights.stats()["inFlight"]}))
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics() -> Response:
+    """Prometheus text exposition; unauthenticated like /health."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Metrics disabled")
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.get("/cache/stats")
+async def cache_stats(_: None = Depends(require_api_key)) -> dict:
+    stats: Dict[str, Any] = {"enabled": json_cache is not None}
+    if json_cache is not None:
+        stats.update(json_cache.stats())
+    if invalidator is not None:
+        stats["invalidation"] = invalidator.status()
+    stats["singleflight"] = flights.stats()
+    stats["snapshot"] = snapshot.stats() if snapshot is not None else None
+    return stats
+
+
+def _require_hierarchy(key: str) -> HierarchyIndex:
+    if not key.startswith(CONTENT_KEY_PREFIXES):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
+    if len(key) > MAX_KEY_LEN:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Key too long")
+    if hierarchy is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Hierarchy index disabled")
+    if not hierarchy.ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Hierarchy index is loading")
+    return hierarchy
+
+
+@app.get("/tree/{key}")
+async def tree(key: str, depth: Optional[int] = None, _: None = Depends(require_api_key)) -> dict:
+    """Subtree of titles and positions under `key`, served from the in-memory hierarchy."""
+    index = _require_hierarchy(key)
+    if depth is not None and depth < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Depth must be non-negative")
+    result = index.subtree(key, depth)
+    if result is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Key not found")
+    return {"result": result, "version": index.version}
+
+
+@app.get("/children/{key}")
+async def children(key: str, _: None = Depends(require_api_key)) -> dict:
+    index = _require_hierarchy(key)
+    node = index.get(key)
+    if node is None and not index.children_of(key):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Key not found")
+    return {
+        "key": key,
+        "parent": node["parent"] if node else None,
+        "ancestors": index.ancestors(key),
+        "children": index.children_of(key),
+        "version": index.version,
+    }
+
+
+@app.get("/summary/{key}")
+async def summary(key: str, text: bool = False, _: None = Depends(require_api_key)) -> dict:
+    """Materialized aggregates of `key`: descendant count, summary, content hash and optionally the full text."""
+    if not key.startswith(CONTENT_KEY_PREFIXES):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
+    if len(key) > MAX_KEY_LEN:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Key too long")
+    if aggregates is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Aggregates disabled")
+    if not aggregates.ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Aggregates are loading")
+    aggregate = aggregates.get(key)
+    if aggregate is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Key not found")
+    result = {
+        "key": key,
+        "descendants": aggregate["descendants"],
+        "subElements": aggregate["pieces"],
+        "summary": aggregate["summary"],
+        "contentHash": aggregate["hash"],
+    }
+    if text:
+        result["text"] = aggregate["text"]
+    return {"result": result, "version": aggregates.version}
+
+
+@app.get("/hierarchy/stats")
+async def hierarchy_stats(_: None = Depends(require_api_key)) -> dict:
+    if hierarchy is None:
+        return {"enabled": False, "aggregates": aggregates.stats() if aggregates is not None else None}
+    return {"enabled": True, **hierarchy.stats(), "aggregates": aggregates.stats() if aggregates is not None else None}
+
+
+@app.get("/search")
+async def search(
+    q: str,
+    k: int = 10,
+    under: Optional[str] = None,
+    prefix: bool = False,
+    _: None = Depends(require_api_key),
+) -> dict:
+    """Full-text search over titles and content, ranked by BM25; `under` keeps descendants of a key."""
+    if not q.strip() or len(q) > MAX_QUERY_LEN:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Query must be 1-{MAX_QUERY_LEN} characters")
+    if not 1 <= k <= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"k must be between 1 and {MAX_SEARCH_RESULTS}")
+    if under is not None:
+        if not under.startswith(CONTENT_KEY_PREFIXES):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
+        if len(under) > MAX_KEY_LEN:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Key too long")
+
+    started = time.perf_counter()
+    if search_index is not None and search_index.ready:
+        results = search_index.search(q, k, under, prefix)
+        backend, version = "memory", search_index.version
+    elif redisearch is not None and redisearch.available and under is None:
+        results = await redisearch.search(q, k, prefix)
+        backend, version = "redisearch", None
+    elif search_index is None and redisearch is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Search disabled")
+    else:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Search index is loading")
+    took_ms = round((time.perf_counter() - started) * 1000, 3)
+    return {"results": results, "backend": backend, "version": version, "tookMs": took_ms}
+
+
+@app.get("/search/stats")
+async def search_stats(_: None = Depends(require_api_key)) -> dict:
+    return {
+        "enabled": search_index is not None,
+        **(search_index.stats() if search_index is not None else {}),
+        "redisearch": {"index": redisearch.index, "available": redisearch.available} if redisearch is not None else None,
+    }
+
+
+@app.get("/similar")
+async def similar(
+    q: str,
+    k: int = 5,
+    under: Optional[str] = None,
+    _: None = Depends(require_api_key),
+) -> dict:
+    """Chunks most similar to `q` by cosine similarity of their embeddings, with their parent chains."""
+    if not q.strip() or len(q) > MAX_QUERY_LEN:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Query must be 1-{MAX_QUERY_LEN} characters")
+    if not 1 <= k <= MAX_SEARCH_RESULTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"k must be between 1 and {MAX_SEARCH_RESULTS}")
+    if under is not None:
+        if not under.startswith(CONTENT_KEY_PREFIXES):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
+        if len(under) > MAX_KEY_LEN:
+            raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Key too long")
+    if embedding_index is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Similarity search disabled")
+    if not embedding_index.ready:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Embedding index is loading")
+
+    def ancestors(key: str) -> List[str]:
+        if hierarchy is not None and hierarchy.get(key) is not None:
+            return hierarchy.ancestors(key)
+        parent = embedding_index.parents[embedding_index.rows[key]] if key in embedding_index.rows else None
+        return [parent, *(hierarchy.ancestors(parent) if hierarchy is not None else [])] if parent else []
+
+    accept = (lambda key: under in ancestors(key)) if under is not None else None
+    started = time.perf_counter()
+    # Embedding the query may be a model call, so it stays off the event loop
+    matches = await run_in_threadpool(embedding_index.similar, q, k, accept)
+    took_ms = round((time.perf_counter() - started) * 1000, 3)
+    results = [{"key": key, "score": score, "ancestors": ancestors(key)} for key, score in matches]
+    return {"results": results, "version": embedding_index.version, "tookMs": took_ms}
+
+
+class IndexRebuildRequest(BaseModel):
+    full: bool = False
+    write: bool = True
+
+
+@app.post("/index/rebuild")
+async def index_rebuild(req: Optional[IndexRebuildRequest] = None, _: None = Depends(require_api_key)) -> dict:
+    """Rebuild index:database_schema; incremental from keyspace changes unless `full`."""
+    req = req or IndexRebuildRequest()
+    if index_builder is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Index rebuild disabled")
+    report = await (index_builder.build() if req.full else index_builder.update())
+    if req.write:
+        report = await index_builder.write()
+    return {"result": report}
+
+
+@app.get("/index/stats")
+async def index_stats(_: None = Depends(require_api_key)) -> dict:
+    if index_builder is None:
+        return {"enabled": False}
+    return {"enabled": True, **index_builder.stats()}
 
 
 def _parse_maybe_json_string(value: Optional[str]):
     if value is None:
         return None
     if isinstance(value, str):
+        started = time.perf_counter_ns()
         try:
-            return json.loads(value)
+            return orjson.loads(value)
         except Exception:
             return value
+        finally:
+            observe_stage("parse", started)
     return value
 
 
 ALLOWED_COMMANDS = {"JSON.GET"}
+# Read-only introspection commands additionally allowed per operation in /redis/batch
+BATCH_READ_COMMANDS = {"JSON.TYPE", "JSON.OBJKEYS", "JSON.OBJLEN", "JSON.ARRLEN", "JSON.STRLEN", "JSON.ARRINDEX", "JSON.RESP"}
+MAX_BATCH_OPS = int(os.getenv("MAX_BATCH_OPS", "100"))
+MAX_BATCH_RESPONSE_BYTES = int(os.getenv("MAX_BATCH_RESPONSE_BYTES", str(4 * 1024 * 1024)))
 ALLOWED_KEY_PREFIXES = ("doc:", "ch:", "index:", "p:", "para:", "sp:", "ssp:", "chunk:")
+# Prefixes that form the doc → ch → p → sp/ssp → chunk hierarchy
+CONTENT_KEY_PREFIXES = tuple(prefix for prefix in ALLOWED_KEY_PREFIXES if prefix != "index:")
 MAX_KEY_LEN = 256
 MAX_ARGS_LEN = 10
+# Keys per pipelined round trip for batch reads; larger batches are split and run concurrently
+MAX_BATCH_SIZE = redis_batch_size()
+MAX_SUBTREE_NODES = int(os.getenv("MAX_SUBTREE_NODES", "5000"))
+MAX_QUERY_LEN = 512
+MAX_SEARCH_RESULTS = 100
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+# Splice RedisJSON replies into responses without parsing and re-encoding them
+JSON_PASSTHROUGH = os.getenv("JSON_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+
+
+def _cache_token() -> Optional[Tuple[int, float]]:
+    return json_cache.token() if json_cache is not None else None
+
+
+def _cache_store(key: str, path: ReadPath, raw: Optional[str], token: Optional[Tuple[int, float]]) -> Optional[RawJson]:
+    if raw is None:
+        return None
+    REDIS_REPLY_BYTES.observe(len(raw))
+    if isinstance(path, tuple):
+        started = time.perf_counter_ns()
+        raw = project(path, raw)
+        observe_stage("parse", started)
+    doc = RawJson(raw)
+    if json_cache is not None:
+        json_cache.set(key, path, doc, len(doc), token, raw=raw)
+    if last_known_good is not None:
+        last_known_good.set(key, path, doc, len(doc))
+    return doc
+
+
+def _local_get(key: str, path: ReadPath = None) -> Optional[RawJson]:
+    """The reply from the read-through cache or, for whole documents, the startup snapshot."""
+    if json_cache is not None:
+        entry = json_cache.get(key, path)
+        if entry is not None:
+            return entry.value
+    if snapshot is None or path not in ROOT_PATHS:
+        return None
+    doc = snapshot.get(key)
+    if doc is not None and snapshot.verified:
+        # Checked against Redis, so it may move up into the cache
+        if json_cache is not None:
+            json_cache.set(key, path, doc, len(doc))
+        if last_known_good is not None:
+            last_known_good.set(key, path, doc, len(doc))
+    return doc
+
+
+def _flight_key(key: str, path: ReadPath = None) -> tuple:
+    return ("JSON.GET", key, None if path in ROOT_PATHS else path)
+
+
+async def _cached_json_get(key: str, path: ReadPath = None) -> Tuple[Optional[RawJson], bool, Optional[float]]:
+    """JSON.GET through the read-through cache. Returns (reply, cache hit, stale age).
+
+    A tuple `path` is a projection of those fields, fetched with one multi-path JSON.GET.
+    When Redis fails, the circuit is open or the read is slower than
+    STALE_SERVE_AFTER, the last known good reply is returned with its age in
+    seconds, and the read carries on in the background to refresh it.
+    """
+    local = _local_get(key, path)
+    if local is not None:
+        return local, True, None
+
+    async def fetch() -> Optional[RawJson]:
+        assert redis_client is not None, "Redis client not initialized"
+        token = _cache_token()
+        raw = await redis_client.execute_command(*json_get_args(key, path))
+        return _cache_store(key, path, raw, token)
+
+    fallback = last_known_good.get(key, path) if last_known_good is not None else None
+    if fallback is None:
+        value = await flights.do(_flight_key(key, path), fetch)
+        if isinstance(value, Exception):
+            # Joined a batch read that failed for this key
+            raise value
+        return value, False, None
+
+    read = asyncio.ensure_future(flights.do(_flight_key(key, path), fetch))
+    read.add_done_callback(lambda done: done.cancelled() or done.exception())
+    try:
+        # Slow reads time out here too
+        value = await asyncio.wait_for(asyncio.shield(read), timeout=last_known_good.serve_after)
+    except TRANSIENT_ERRORS:
+        value = None
+    else:
+        if not isinstance(value, TRANSIENT_ERRORS):
+            if isinstance(value, Exception):
+                raise value
+            return value, False, None
+    last_known_good.served += 1
+    return fallback[0], False, fallback[1]
+
+
+async def _coalesced_command(*args: Any) -> Any:
+    """Execute a read command, sharing the parsed reply with identical in-flight calls."""
+
+    async def fetch() -> Any:
+        assert redis_client is not None, "Redis client not initialized"
+        return _parse_maybe_json_string(await redis_client.execute_command(*args))
+
+    try:
+        hash(args)
+    except TypeError:
+        # Non-scalar arguments cannot be used as a coalescing key
+        return await fetch()
+    return await flights.do(args, fetch)
+
+
+async def _json_get_many(keys: List[str], path: ReadPath = None) -> Tuple[Dict[str, Optional[RawJson]], int, Optional[float]]:
+    """JSON.GET every key, serving cached keys locally and pipelining the rest.
+
+    Misses go out in one round trip per chunk of MAX_BATCH_SIZE keys. Keys that
+    could not be read because Redis is failing get their last known good
+    reply; other failures map to None. Returns (replies by key, number of
+    cache hits, age in seconds of the oldest stale reply).
+    """
+    values: Dict[str, Optional[RawJson]] = {}
+    missing: List[str] = []
+    for key in keys:
+        local = _local_get(key, path)
+        if local is not None:
+            values[key] = local
+        else:
+            missing.append(key)
+    hits = len(values)
+    if not missing:
+        return values, hits, None
+
+    async def fetch(flight_keys: List[tuple]) -> List[Any]:
+        assert redis_client is not None, "Redis client not initialized"
+        token = _cache_token()
+        batch = [flight_key[1] for flight_key in flight_keys]
+        chunks = [batch[i : i + MAX_BATCH_SIZE] for i in range(0, len(batch), MAX_BATCH_SIZE)]
+        replies = await asyncio.gather(
+            *(redis_client.execute_pipeline([json_get_args(key, path) for key in chunk]) for chunk in chunks),
+            return_exceptions=True,
+        )
+
+        fetched: List[Any] = []
+        for chunk, reply in zip(chunks, replies):
+            if isinstance(reply, BaseException):
+                fetched.extend([reply] * len(chunk))
+                continue
+            for key, raw in zip(chunk, reply):
+                fetched.append(raw if isinstance(raw, Exception) else _cache_store(key, path, raw, token))
+        return fetched
+
+    results = await flights.do_many([_flight_key(key, path) for key in missing], fetch)
+    stale_age: Optional[float] = None
+    for key, value in zip(missing, results):
+        if not isinstance(value, BaseException):
+            values[key] = value
+            continue
+        fallback = last_known_good.get(key, path) if last_known_good is not None and isinstance(value, TRANSIENT_ERRORS) else None
+        values[key] = fallback[0] if fallback is not None else None
+        if fallback is not None:
+            last_known_good.served += 1
+            stale_age = max(stale_age or 0.0, fallback[1])
+    return values, hits, stale_age
+
+
+async def _iter_json_get_many(keys: List[str], path: ReadPath = None) -> AsyncIterator[Tuple[str, Optional[RawJson]]]:
+    """Like `_json_get_many`, but yields (key, value) as each pipelined chunk completes."""
+    chunks = [keys[i : i + MAX_BATCH_SIZE] for i in range(0, len(keys), MAX_BATCH_SIZE)]
+    tasks = [asyncio.ensure_future(_json_get_many(chunk, path)) for chunk in chunks]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            values, _hits, _stale_age = await next_done
+            for item in values.items():
+                yield item
+    finally:
+        # The client went away mid-stream
+        for task in tasks:
+            task.cancel()
+
+
+def _redis_error(exc: Exception) -> HTTPException:
+    if isinstance(exc, CircuitOpenError):
+        # Redis is known to be failing: tell the client when to come back instead of a bare 502
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"Redis unavailable: {exc}",
+            headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+        )
+    return HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Redis error: {exc}")
+
+
+def _cache_headers(hits: int, lookups: int, stale_age: Optional[float] = None) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    if json_cache is not None and lookups:
+        headers["X-Cache"] = "HIT" if hits == lookups else ("MISS" if not hits else "PARTIAL")
+    if stale_age is not None:
+        # Served from the last known good store while Redis could not answer
+        headers["X-Stale"] = "true"
+        headers["Age"] = str(int(stale_age))
+    return headers
+
+
+def _result_response(doc: RawJson, hit: bool, stale_age: Optional[float] = None) -> RawJSONResponse:
+    started = time.perf_counter_ns()
+    body = b'{"result":' + value_bytes(doc, JSON_PASSTHROUGH) + b"}"
+    observe_stage("encode", started)
+    headers = _cache_headers(int(hit), 1, stale_age)
+    if JSON_PASSTHROUGH:
+        # The body is a fixed wrapper around the reply text, so its hash identifies it
+        headers["ETag"] = doc.etag
+    return RawJSONResponse(body, headers=headers)
+
+
+def _ndjson_line(fields: dict, doc: Optional[RawJson]) -> bytes:
+    started = time.perf_counter_ns()
+    # `fields` is encoded normally and the document spliced in as "value"
+    line = dumps(fields)[:-1] + b',"value":' + value_bytes(doc, JSON_PASSTHROUGH) + b"}\n"
+    observe_stage("encode", started)
+    return line
+
+
+def _fields(fields: Any) -> Optional[Tuple[str, ...]]:
+    try:
+        return normalize_fields(fields, MAX_ARGS_LEN)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+
+def _wants_ndjson(accept: Optional[str]) -> bool:
+    return NDJSON_MEDIA_TYPE in (accept or "")
+
+
+def _is_cacheable_get(command: str, args: list) -> bool:
+    # Plain `JSON.GET key [path]`; formatting options bypass the cache
+    return command == "JSON.GET" and 1 <= len(args) <= 2 and all(isinstance(arg, str) for arg in args)
 
 
 @app.post("/redis/json-get")
-def json_get(req: JsonGetRequest, _: None = Depends(require_api_key)) -> dict:
+async def json_get(req: JsonGetRequest, _: None = Depends(require_api_key)) -> Response:
     if not req.key or not req.key.startswith(ALLOWED_KEY_PREFIXES):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
     if len(req.key) > MAX_KEY_LEN:
         raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Key too long")
 
-    assert redis_client is not None, "Redis client not initialized"
+    fields = _fields(req.fields)
     try:
-        result = redis_client.execute_command("JSON.GET", req.key)
+        doc, hit, stale_age = await _cached_json_get(req.key, fields)
     except Exception as exc:
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Redis error: {exc}")
+        raise _redis_error(exc)
 
-    if result is None:
+    # A stored JSON null is reported like a missing key
+    if doc is None or doc.is_null:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Key not found")
 
-    return {"result": _parse_maybe_json_string(result)}
+    return _result_response(doc, hit, stale_age)
 
 
 @app.post("/redis/command")
-def command(req: CommandRequest, _: None = Depends(require_api_key)) -> dict:
+async def command(req: CommandRequest, _: None = Depends(require_api_key)):
     command_upper = (req.command or "").upper()
     if command_upper not in ALLOWED_COMMANDS:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Command not allowed")
@@ -173,20 +784,132 @@ def command(req: CommandRequest, _: None = Depends(require_api_key)) -> dict:
         if isinstance(first, str) and not first.startswith(ALLOWED_KEY_PREFIXES):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
 
-    assert redis_client is not None, "Redis client not initialized"
+    if _is_cacheable_get(command_upper, req.args):
+        try:
+            doc, hit, stale_age = await _cached_json_get(*req.args)
+        except Exception as exc:
+            raise _redis_error(exc)
+        if doc is None:
+            return {"result": None}
+        return _result_response(doc, hit, stale_age)
+
     try:
-        result = redis_client.execute_command(command_upper, *req.args)
+        result = await _coalesced_command(command_upper, *req.args)
     except Exception as exc:
-        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Redis error: {exc}")
+        raise _redis_error(exc)
+
+    return {"result": result}
+
 
-    return {"result": _parse_maybe_json_string(result)}
+def _batch_error(op: BatchOperation) -> Optional[str]:
+    """Why `op` may not run in a batch, or None; the same rules as /redis/command."""
+    if op.command.upper() not in ALLOWED_COMMANDS | BATCH_READ_COMMANDS:
+        return "Command not allowed"
+    if not op.args:
+        return "Missing key"
+    if len(op.args) > MAX_ARGS_LEN:
+        return "Too many arguments"
+    if any(isinstance(arg, bool) or not isinstance(arg, (str, int, float)) for arg in op.args):
+        return "Arguments must be strings or numbers"
+    key = op.args[0]
+    if not isinstance(key, str) or not key.startswith(ALLOWED_KEY_PREFIXES):
+        return "Key prefix not allowed"
+    if len(key) > MAX_KEY_LEN:
+        return "Key too long"
+    return None
+
+
+def _batch_fallback(op: BatchOperation) -> Optional[Tuple[RawJson, float]]:
+    if last_known_good is None or not _is_cacheable_get(op.command.upper(), op.args):
+        return None
+    return last_known_good.get(*op.args)
+
+
+@app.post("/redis/batch")
+async def batch(req: BatchRequest, _: None = Depends(require_api_key)) -> Response:
+    """Run several read commands in one non-transactional pipeline.
+
+    Returns one `{"result": ...}` or `{"error": ...}` per operation, in request order.
+    """
+    if not req.ops:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="No operations")
+    if len(req.ops) > MAX_BATCH_OPS:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=f"At most {MAX_BATCH_OPS} operations allowed")
+
+    outcomes: List[Any] = [None] * len(req.ops)
+    pipelined: List[int] = []
+    hits = lookups = 0
+    stale_age: Optional[float] = None
+    for i, op in enumerate(req.ops):
+        error = _batch_error(op)
+        if error is not None:
+            outcomes[i] = HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+            continue
+        if _is_cacheable_get(op.command.upper(), op.args):
+            lookups += 1
+            local = _local_get(*op.args)
+            if local is not None:
+                outcomes[i] = local
+                hits += 1
+                continue
+        pipelined.append(i)
+
+    if pipelined:
+        assert redis_client is not None, "Redis client not initialized"
+        token = _cache_token()
+        try:
+            replies = await redis_client.execute_pipeline([(req.ops[i].command.upper(), *req.ops[i].args) for i in pipelined])
+        except Exception as exc:
+            fallbacks = [_batch_fallback(req.ops[i]) for i in pipelined] if isinstance(exc, TRANSIENT_ERRORS) else [None] * len(pipelined)
+            if not hits and not any(fallbacks):
+                # Nothing could be answered at all
+                raise _redis_error(exc)
+            # Keep the local hits and answer what the last known good store holds; the rest carry the error
+            for i, fallback in zip(pipelined, fallbacks):
+                outcomes[i] = fallback[0] if fallback is not None else exc
+                if fallback is not None:
+                    last_known_good.served += 1
+                    stale_age = max(stale_age or 0.0, fallback[1])
+            replies = []
+        for i, reply in zip(pipelined, replies):
+            op = req.ops[i]
+            if isinstance(reply, Exception):
+                outcomes[i] = reply
+            elif _is_cacheable_get(op.command.upper(), op.args):
+                outcomes[i] = _cache_store(op.args[0], op.args[1] if len(op.args) > 1 else None, reply, token)
+            else:
+                outcomes[i] = _parse_maybe_json_string(reply)
+
+    started = time.perf_counter_ns()
+    entries: List[bytes] = []
+    size = 0
+    truncated = False
+    for outcome in outcomes:
+        if isinstance(outcome, HTTPException):
+            entry = b'{"error":' + dumps(outcome.detail) + b"}"
+        elif isinstance(outcome, Exception):
+            entry = b'{"error":' + dumps(f"Redis error: {outcome}") + b"}"
+        elif isinstance(outcome, RawJson) or outcome is None:
+            entry = b'{"result":' + value_bytes(outcome, JSON_PASSTHROUGH) + b"}"
+        else:
+            entry = b'{"result":' + dumps(outcome) + b"}"
+        if size + len(entry) > MAX_BATCH_RESPONSE_BYTES:
+            # Keep the response bounded; later results are replaced, not dropped, so indexes still line up
+            entry = b'{"error":"Response size limit exceeded"}'
+            truncated = True
+        size += len(entry)
+        entries.append(entry)
+    body = b'{"results":[' + b",".join(entries) + b'],"truncated":' + (b"true" if truncated else b"false") + b"}"
+    observe_stage("encode", started)
+    return RawJSONResponse(body, headers=_cache_headers(hits, lookups, stale_age))
 
 
 @app.post("/redis/query")
-def universal_query(
+async def universal_query(
     request: dict = Body(...),
+    accept: Optional[str] = Header(default=None),
     _: None = Depends(require_api_key)
-) -> dict:
+):
     """Universal endpoint that handles flexible query formats for Redis JSON."""
     
     # Scenario 1: Single key retrieval
@@ -196,17 +919,19 @@ def universal_query(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
         
         path = request.get("path", ".")  # JSON path, default root
+        fields = _fields(request.get("fields"))
+        if fields is not None:
+            path = fields
         
-        assert redis_client is not None, "Redis client not initialized"
         try:
-            result = redis_client.execute_command("JSON.GET", key, path)
+            doc, hit, stale_age = await _cached_json_get(key, path)
         except Exception as exc:
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Redis error: {exc}")
+            raise _redis_error(exc)
         
-        if result is None:
+        if doc is None or doc.is_null:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Key not found")
         
-        return {"result": _parse_maybe_json_string(result)}
+        return _result_response(doc, hit, stale_age)
     
     # Scenario 2: Direct JSON command
     elif "command" in request:
@@ -224,13 +949,21 @@ def universal_query(
         if args and isinstance(args[0], str) and not args[0].startswith(ALLOWED_KEY_PREFIXES):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Key prefix not allowed")
         
-        assert redis_client is not None, "Redis client not initialized"
+        if _is_cacheable_get(command, args):
+            try:
+                doc, hit, stale_age = await _cached_json_get(*args)
+            except Exception as exc:
+                raise _redis_error(exc)
+            if doc is None:
+                return {"result": None}
+            return _result_response(doc, hit, stale_age)
+        
         try:
-            result = redis_client.execute_command(command, *args)
+            result = await _coalesced_command(command, *args)
         except Exception as exc:
-            raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=f"Redis error: {exc}")
+            raise _redis_error(exc)
         
-        return {"result": _parse_maybe_json_string(result)}
+        return {"result": result}
     
     # Scenario 3: Multiple keys retrieval
     elif "keys" in request:
@@ -238,63 +971,99 @@ def universal_query(
         if not isinstance(keys, list):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Keys must be a list")
         
-        results = {}
-        assert redis_client is not None, "Redis client not initialized"
+        fields = _fields(request.get("fields"))
         
-        for key in keys:
-            if not isinstance(key, str) or not key.startswith(ALLOWED_KEY_PREFIXES):
-                results[key] = None
-                continue
+        # Disallowed prefixes and per-key errors stay null
+        results = dict.fromkeys(keys)
+        valid_keys = [key for key in results if isinstance(key, str) and key.startswith(ALLOWED_KEY_PREFIXES)]
+        
+        if _wants_ndjson(accept):
+            # One line per key, written as soon as its pipeline chunk arrives
+            async def stream():
+                valid = set(valid_keys)
+                for key in results:
+                    if key not in valid:
+                        yield _ndjson_line({"key": key}, None)
+                async for key, doc in _iter_json_get_many(valid_keys, fields):
+                    yield _ndjson_line({"key": key}, doc)
             
-            try:
-                result = redis_client.execute_command("JSON.GET", key)
-                results[key] = _parse_maybe_json_string(result)
-            except Exception:
-                results[key] = None
+            return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
+        
+        values, hits, stale_age = await _json_get_many(valid_keys, fields)
+        results.update(values)
         
-        return {"results": results}
+        started = time.perf_counter_ns()
+        entries = b",".join(object_key(key) + b":" + value_bytes(doc, JSON_PASSTHROUGH) for key, doc in results.items())
+        observe_stage("encode", started)
+        return RawJSONResponse(b'{"results":{' + entries + b"}}", headers=_cache_headers(hits, len(valid_keys), stale_age))
     
     else:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid query format. Must include 'key', 'command', or 'keys'")
 
 
-class RequestLoggingMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        started = time.time()
-        req_id = request.headers.get("X-Request-ID") or str(uuid.uuid4())
-        try:
-            response = await call_next(request)
-            duration_ms = int((time.time() - started) * 1000)
-            print(
-                json.dumps(
-                    {
-                        "event": "request",
-                        "requestId": req_id,
-                        "method": request.method,
-                        "path": request.url.path,
-                        "status": response.status_code,
-                        "durationMs": duration_ms,
-                    }
-                )
-            )
-            response.headers["X-Request-ID"] = req_id
-            return response
-        except Exception as exc:
-            duration_ms = int((time.time() - started) * 1000)
-            print(
-                json.dumps(
-                    {
-                        "event": "error",
-                        "requestId": req_id,
-                        "method": request.method,
-                        "path": request.url.path,
-                        "error": str(exc),
-                        "durationMs": duration_ms,
-                    }
-                )
-            )
-            raise
-
-
-app.add_middleware(RequestLoggingMiddleware)
+@app.post("/redis/subtree")
+async def subtree(
+    req: SubtreeRequest,
+    accept: Optional[str] = Header(default=None),
+    _: None = Depends(require_api_key),
+):
+    """A key with all its descendants' documents, nested in position order.
+
+    With `Accept: application/x-ndjson` the nodes are streamed one per line,
+    level by level, as each level's reads complete.
+    """
+    index = _require_hierarchy(req.key)
+    if req.depth is not None and req.depth < 0:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Depth must be non-negative")
+    if index.get(req.key) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Key not found")
+    fields = _fields(req.fields)
+
+    # Recorded with the levels, not looked up later: the index may change while the documents are read
+    parents: Dict[str, str] = {}
+    levels = [[req.key]] + index.descendants(req.key, req.depth, parents)
+    total = sum(len(level) for level in levels)
+    if total > MAX_SUBTREE_NODES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="Subtree too large")
+
+    if _wants_ndjson(accept):
+        async def stream():
+            for depth, level in enumerate(levels):
+                async for key, doc in _iter_json_get_many(level, fields):
+                    yield _ndjson_line({"key": key, "parent": parents.get(key), "depth": depth}, doc)
+
+        return StreamingResponse(stream(), media_type=NDJSON_MEDIA_TYPE)
+
+    # The keys are known up front, so the whole subtree is fetched in one batch
+    all_keys = [key for level in levels for key in level]
+    values, hits, stale_age = await _json_get_many(all_keys, fields)
+
+    children: Dict[str, List[str]] = {key: [] for key in all_keys}
+    for level in levels[1:]:
+        for key in level:
+            children[parents[key]].append(key)
+
+    def render(key: str) -> bytes:
+        nested = b",".join(render(child) for child in children[key])
+        return b'{"key":' + dumps(key) + b',"value":' + value_bytes(values.get(key), JSON_PASSTHROUGH) + b',"children":[' + nested + b"]}"
+
+    started = time.perf_counter_ns()
+    body = b'{"result":' + render(req.key) + b',"nodes":' + dumps(total) + b"}"
+    observe_stage("encode", started)
+    return RawJSONResponse(body, headers=_cache_headers(hits, len(all_keys), stale_age))
+
+
+ETAGS_ENABLED = os.getenv("ETAGS_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_OPTIONS = create_compression_options()
+
+# Added innermost first: ETags are computed on the uncompressed body
+if ETAGS_ENABLED:
+    app.add_middleware(ETagMiddleware, read_paths=("/redis/json-get", "/redis/command", "/redis/batch", "/redis/query", "/redis/subtree"))
+if COMPRESSION_OPTIONS is not None:
+    app.add_middleware(CompressionMiddleware, **COMPRESSION_OPTIONS)
+if admission is not None or rate_limiter is not None:
+    app.add_middleware(AdmissionMiddleware, controller=admission, limiter=rate_limiter, retry_after=float(os.getenv("ADMISSION_RETRY_AFTER", "1")))
+app.add_middleware(RequestLoggingMiddleware, sink=log_sink, sample_rate=log_sample_rate())
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
@@ -0,0 +1,110 @@
+import asyncio
+import os
+import time
+from typing import Optional
+
+from app.redis_client import RedisBackend
+
+
+class PoolHealth:
+    """Keeps the Redis pool warm and notices when it goes bad.
+
+    `warm()` opens `warmup` pooled connections up front, so the TLS
+    handshakes happen at startup rather than on the first user requests. A
+    background task then PINGs every `interval` seconds; after
+    `max_failures` failed checks in a row the pool is closed so dead sockets
+    are replaced, and it is warmed again once Redis answers.
+    """
+
+    def __init__(self, backend: RedisBackend, warmup: int = 4, interval: float = 15.0, max_failures: int = 2) -> None:
+        self.backend = backend
+        self.warmup = warmup
+        self.interval = interval
+        self.max_failures = max_failures
+        self.healthy = True
+        self.last_check: Optional[float] = None
+        self.last_ping_ms: Optional[float] = None
+        self.failures = 0
+        self.rebuilds = 0
+        self.last_error: Optional[str] = None
+        self._needs_warmup = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def warm(self) -> int:
+        """Open up to `warmup` connections. Returns how many were opened."""
+        if self.warmup <= 0:
+            return 0
+        started = time.perf_counter()
+        try:
+            opened = await self.backend.warm(self.warmup)
+        except Exception as exc:
+            print(f"⚠️ Redis pool warmup failed: {exc}")
+            return 0
+        print(f"✅ Warmed {opened}/{self.warmup} Redis connections in {round((time.perf_counter() - started) * 1000, 1)}ms")
+        return opened
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    async def check(self) -> bool:
+        started = time.perf_counter()
+        self.last_check = time.time()
+        try:
+            await asyncio.wait_for(self.backend.ping(), timeout=max(self.interval, 1.0))
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            self.failures += 1
+            self.last_error = str(exc) or type(exc).__name__
+            print(f"⚠️ Redis health check failed ({self.failures}): {self.last_error}")
+            if self.failures >= self.max_failures and self.healthy:
+                self.healthy = False
+                self._needs_warmup = True
+                self.rebuilds += 1
+                await self.backend.reset_pool()
+            return False
+
+        self.last_ping_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.failures = 0
+        if not self.healthy:
+            print("✅ Redis reachable again")
+            self.healthy = True
+        if self._needs_warmup:
+            self._needs_warmup = False
+            await self.warm()
+        return True
+
+    def status(self) -> dict:
+        return {
+            "healthy": self.healthy,
+            "lastCheck": self.last_check,
+            "lastPingMs": self.last_ping_ms,
+            "consecutiveFailures": self.failures,
+            "rebuilds": self.rebuilds,
+            "lastError": self.last_error,
+        }
+
+
+def create_pool_health(backend: RedisBackend) -> PoolHealth:
+    max_connections = int(os.getenv("REDIS_MAX_CONNECTIONS", "64"))
+    return PoolHealth(
+        backend,
+        warmup=min(int(os.getenv("REDIS_POOL_WARMUP", "4")), max_connections),
+        interval=float(os.getenv("REDIS_PING_INTERVAL", "15")),
+        max_failures=int(os.getenv("REDIS_HEALTH_MAX_FAILURES", "2")),
+    )
@@ -0,0 +1,71 @@
+import re
+from typing import Any, List, Optional, Tuple, Union
+
+import orjson
+
+
+# A read is either a whole document (None), one legacy/JSONPath `path`, or a
+# projection: the tuple of requested field names
+ReadPath = Union[None, str, Tuple[str, ...]]
+
+FIELD_RE = re.compile(r"^[$A-Za-z0-9_.\[\]*'\"\- ]+$")
+MAX_FIELD_LEN = 256
+# Tokens that can make a JSONPath match more than one value
+INDEFINITE_TOKENS = ("*", "..", "?", ":", ",")
+
+
+def normalize_fields(fields: Any, max_fields: int) -> Optional[Tuple[str, ...]]:
+    """Validate a `fields` parameter; returns the unique fields in request order.
+
+    Raises ValueError with a client-facing message.
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = [fields]
+    if not isinstance(fields, list) or not fields:
+        raise ValueError("Fields must be a non-empty list of strings")
+    if len(fields) > max_fields:
+        raise ValueError(f"At most {max_fields} fields allowed")
+    for field in fields:
+        if not isinstance(field, str) or not field or len(field) > MAX_FIELD_LEN or not FIELD_RE.match(field):
+            raise ValueError(f"Invalid field: {field!r}")
+    return tuple(dict.fromkeys(fields))
+
+
+def jsonpath(field: str) -> str:
+    """`title` and `.title` become `$.title`; JSONPath expressions pass through."""
+    if field.startswith("$"):
+        return field
+    return "$" + (field if field.startswith((".", "[")) else "." + field)
+
+
+def json_get_args(key: str, path: ReadPath) -> tuple:
+    if path is None:
+        return ("JSON.GET", key)
+    if isinstance(path, tuple):
+        return ("JSON.GET", key, *dict.fromkeys(jsonpath(field) for field in path))
+    return ("JSON.GET", key, path)
+
+
+def _is_definite(path: str) -> bool:
+    return not any(token in path for token in INDEFINITE_TOKENS)
+
+
+def project(fields: Tuple[str, ...], raw: str) -> str:
+    """Reshape a multi-path JSON.GET reply into {field: value}.
+
+    RedisJSON returns every path's matches as a list (and a bare list when only
+    one path was sent). Definite paths such as `title` are unwrapped to their
+    single value or null; wildcard and filter paths keep the list of matches.
+    """
+    reply = orjson.loads(raw)
+    paths = [jsonpath(field) for field in fields]
+    if len(set(paths)) == 1:
+        reply = {paths[0]: reply}
+
+    projected = {}
+    for field, path in zip(fields, paths):
+        matches: List[Any] = reply.get(path) or []
+        projected[field] = (matches[0] if matches else None) if _is_definite(path) else matches
+    return orjson.dumps(projected).decode()
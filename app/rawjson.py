@@ -0,0 +1,81 @@
+import json
+import time
+from typing import Any, Optional
+
+import orjson
+from starlette.responses import Response
+
+from app.etags import etag_for
+from app.metrics import observe_stage
+
+
+class RawJson:
+    """A JSON.GET reply kept as the text RedisJSON sent.
+
+    It is spliced into responses as-is and only parsed, at most once, when a
+    caller needs the Python value.
+    """
+
+    __slots__ = ("text", "_value", "_parsed", "_encoded", "_etag")
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._value: Any = None
+        self._parsed = False
+        self._encoded: Optional[bytes] = None
+        self._etag: Optional[str] = None
+
+    @property
+    def value(self) -> Any:
+        if not self._parsed:
+            started = time.perf_counter_ns()
+            try:
+                self._value = orjson.loads(self.text)
+            except orjson.JSONDecodeError:
+                self._value = self.text
+            observe_stage("parse", started)
+            self._parsed = True
+        return self._value
+
+    @property
+    def encoded(self) -> bytes:
+        if self._encoded is None:
+            self._encoded = self.text.encode()
+        return self._encoded
+
+    @property
+    def etag(self) -> str:
+        """Strong ETag of the reply text, computed once per cached document."""
+        if self._etag is None:
+            self._etag = etag_for(self.encoded)
+        return self._etag
+
+    @property
+    def is_null(self) -> bool:
+        return self.text == "null"
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+
+class RawJSONResponse(Response):
+    """A response whose body is already serialized JSON."""
+
+    media_type = "application/json"
+
+
+def dumps(value: Any) -> bytes:
+    return orjson.dumps(value)
+
+
+def object_key(key: Any) -> bytes:
+    # Same coercion json.dumps applies to non-string dict keys
+    return orjson.dumps(key if isinstance(key, str) else json.dumps(key))
+
+
+def value_bytes(doc: Optional[RawJson], passthrough: bool) -> bytes:
+    if doc is None:
+        return b"null"
+    if passthrough:
+        return doc.encoded
+    return orjson.dumps(doc.value)
@@ -0,0 +1,321 @@
+import asyncio
+import os
+import time
+from typing import Any, List, Optional, Sequence
+
+import redis
+import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry as AsyncRetry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import TimeoutError as RedisTimeoutError
+from redis.retry import Retry
+from starlette.concurrency import run_in_threadpool
+
+from app.metrics import observe_stage
+
+
+REDIS_IO_MODES = ("async", "threadpool")
+# Failures that say nothing about the command, only about the connection or server
+TRANSIENT_ERRORS = (RedisConnectionError, RedisTimeoutError, asyncio.TimeoutError, OSError)
+
+
+def redis_io_mode() -> str:
+    mode = os.getenv("REDIS_IO_MODE", "async").lower()
+    if mode not in REDIS_IO_MODES:
+        raise RuntimeError(f"REDIS_IO_MODE must be one of: {', '.join(REDIS_IO_MODES)}")
+    return mode
+
+
+def redis_batch_size() -> int:
+    """Keys per pipelined read, from REDIS_BATCH_SIZE."""
+    try:
+        size = int(os.getenv("REDIS_BATCH_SIZE", "50"))
+    except ValueError:
+        size = 0
+    if size < 1:
+        raise RuntimeError("REDIS_BATCH_SIZE must be a whole number of at least 1")
+    return size
+
+
+def _connection_kwargs(use_tls: bool, host: Optional[str] = None, port: Optional[int] = None) -> dict:
+    """Connection settings from the environment; `host`/`port` override REDIS_HOST/REDIS_PORT (replicas)."""
+    host = host or os.getenv("REDIS_HOST")
+    port_str = os.getenv("REDIS_PORT", "6379")
+    password = os.getenv("REDIS_PASSWORD")
+
+    if not host or not password:
+        raise RuntimeError("Missing REDIS_HOST or REDIS_PASSWORD environment variables")
+
+    kwargs = {
+        "host": host,
+        "port": port or int(port_str),
+        "password": password,
+        "decode_responses": True,
+        "socket_timeout": 10,
+        "socket_connect_timeout": 10,
+        # Keep idle connections alive through NAT/load balancers and ping
+        # connections idle longer than the interval before reusing them
+        "socket_keepalive": True,
+        "health_check_interval": float(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30")),
+    }
+    if use_tls:
+        # SSL configuration for Redis Cloud - minimal verification
+        kwargs.update(
+            {
+                "ssl_cert_reqs": "none",
+                "ssl_check_hostname": False,
+            }
+        )
+    return kwargs
+
+
+def _pool_kwargs() -> dict:
+    return {
+        "max_connections": int(os.getenv("REDIS_MAX_CONNECTIONS", "64")),
+        # How long a request waits for a free connection before failing
+        "timeout": float(os.getenv("REDIS_POOL_TIMEOUT", "10")),
+    }
+
+
+def _retry_kwargs(retry_class: type) -> dict:
+    # A command that hits a dead connection reconnects and is retried
+    return {
+        "retry": retry_class(ExponentialBackoff(cap=1.0, base=0.05), int(os.getenv("REDIS_RETRIES", "2"))),
+        "retry_on_error": [RedisConnectionError, RedisTimeoutError],
+    }
+
+
+def _tls_enabled() -> bool:
+    return os.getenv("REDIS_TLS", "false").lower() in ("1", "true", "yes")
+
+
+def create_redis_client(use_tls: Optional[bool] = None, host: Optional[str] = None, port: Optional[int] = None) -> redis.Redis:
+    if use_tls is None:
+        use_tls = _tls_enabled()
+
+    pool = redis.BlockingConnectionPool(
+        connection_class=redis.SSLConnection if use_tls else redis.Connection,
+        **_pool_kwargs(),
+        **_connection_kwargs(use_tls, host, port),
+        **_retry_kwargs(Retry),
+    )
+    return redis.Redis(connection_pool=pool)
+
+
+def create_async_redis_client(use_tls: Optional[bool] = None, host: Optional[str] = None, port: Optional[int] = None) -> aioredis.Redis:
+    if use_tls is None:
+        use_tls = _tls_enabled()
+
+    pool = aioredis.BlockingConnectionPool(
+        connection_class=aioredis.SSLConnection if use_tls else aioredis.Connection,
+        **_pool_kwargs(),
+        **_connection_kwargs(use_tls, host, port),
+        **_retry_kwargs(AsyncRetry),
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+def create_pubsub_client(use_tls: bool) -> aioredis.Redis:
+    """Dedicated client for long-lived subscriptions, kept out of the request pool."""
+    kwargs = _connection_kwargs(use_tls)
+    # Subscriptions sit idle between messages; rely on keepalive and pings instead
+    kwargs.update({"socket_timeout": None, "health_check_interval": 30})
+    if use_tls:
+        kwargs["ssl"] = True
+    return aioredis.Redis(**kwargs)
+
+
+class RedisBackend:
+    """Awaitable facade over a Redis client, shared by all request handlers."""
+
+    mode: str
+    use_tls: bool = False
+
+    async def execute_command(self, *args: Any) -> Any:
+        raise NotImplementedError
+
+    async def execute_pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        """Send all commands in one non-transactional round trip.
+
+        Per-command failures are returned in place as exception instances.
+        """
+        raise NotImplementedError
+
+    async def ping(self) -> bool:
+        raise NotImplementedError
+
+    def pool_stats(self) -> dict:
+        """Connection pool usage: {"maxConnections", "inUse", "idle"}."""
+        raise NotImplementedError
+
+    async def warm(self, count: int) -> int:
+        """Open `count` pooled connections ahead of traffic. Returns how many opened."""
+        raise NotImplementedError
+
+    async def reset_pool(self) -> None:
+        """Close every pooled connection; new ones are opened on demand."""
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        raise NotImplementedError
+
+
+class AsyncRedisBackend(RedisBackend):
+    """Runs commands on the event loop through `redis.asyncio`."""
+
+    mode = "async"
+
+    def __init__(self, client: aioredis.Redis) -> None:
+        self.client = client
+
+    async def execute_command(self, *args: Any) -> Any:
+        started = time.perf_counter_ns()
+        try:
+            return await self.client.execute_command(*args)
+        finally:
+            observe_stage("redis", started)
+
+    async def execute_pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        started = time.perf_counter_ns()
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for args in commands:
+                    pipe.execute_command(*args)
+                return await pipe.execute(raise_on_error=False)
+        finally:
+            observe_stage("redis", started)
+
+    async def ping(self) -> bool:
+        return await self.client.ping()
+
+    def pool_stats(self) -> dict:
+        pool = self.client.connection_pool
+        return {
+            "maxConnections": pool.max_connections,
+            "inUse": len(getattr(pool, "_in_use_connections", ())),
+            "idle": len(getattr(pool, "_available_connections", ())),
+        }
+
+    async def warm(self, count: int) -> int:
+        pool = self.client.connection_pool
+        connections = await asyncio.gather(*(pool.get_connection() for _ in range(count)), return_exceptions=True)
+        opened = [connection for connection in connections if not isinstance(connection, BaseException)]
+        for connection in opened:
+            await pool.release(connection)
+        return len(opened)
+
+    async def reset_pool(self) -> None:
+        await self.client.connection_pool.disconnect()
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+
+class ThreadpoolRedisBackend(RedisBackend):
+    """Runs blocking `redis.Redis` calls on the Starlette threadpool."""
+
+    mode = "threadpool"
+
+    def __init__(self, client: redis.Redis) -> None:
+        self.client = client
+
+    async def execute_command(self, *args: Any) -> Any:
+        started = time.perf_counter_ns()
+        try:
+            return await run_in_threadpool(self.client.execute_command, *args)
+        finally:
+            observe_stage("redis", started)
+
+    async def execute_pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        def run() -> List[Any]:
+            with self.client.pipeline(transaction=False) as pipe:
+                for args in commands:
+                    pipe.execute_command(*args)
+                return pipe.execute(raise_on_error=False)
+
+        started = time.perf_counter_ns()
+        try:
+            return await run_in_threadpool(run)
+        finally:
+            observe_stage("redis", started)
+
+    async def ping(self) -> bool:
+        return await run_in_threadpool(self.client.ping)
+
+    def pool_stats(self) -> dict:
+        pool = self.client.connection_pool
+        created = len(getattr(pool, "_connections", ()))
+        # The blocking pool's queue holds idle connections plus None placeholders for unopened slots
+        idle = sum(1 for conn in list(pool.pool.queue) if conn is not None) if hasattr(pool, "pool") else 0
+        return {"maxConnections": pool.max_connections, "inUse": created - idle, "idle": idle}
+
+    async def warm(self, count: int) -> int:
+        def run() -> int:
+            pool = self.client.connection_pool
+            opened = []
+            try:
+                for _ in range(count):
+                    opened.append(pool.get_connection())
+            except redis.RedisError:
+                pass
+            for connection in opened:
+                pool.release(connection)
+            return len(opened)
+
+        return await run_in_threadpool(run)
+
+    async def reset_pool(self) -> None:
+        await run_in_threadpool(self.client.connection_pool.disconnect)
+
+    async def close(self) -> None:
+        await run_in_threadpool(self.client.close)
+
+
+def create_backend(use_tls: Optional[bool] = None, host: Optional[str] = None, port: Optional[int] = None) -> RedisBackend:
+    if use_tls is None:
+        use_tls = _tls_enabled()
+    backend: RedisBackend
+    if redis_io_mode() == "threadpool":
+        backend = ThreadpoolRedisBackend(create_redis_client(use_tls, host, port))
+    else:
+        backend = AsyncRedisBackend(create_async_redis_client(use_tls, host, port))
+    backend.use_tls = use_tls
+    return backend
+
+
+async def _close_quietly(backend: Optional[RedisBackend]) -> None:
+    if backend is None:
+        return
+    try:
+        await backend.close()
+    except Exception as exc:
+        print(f"⚠️ Closing failed Redis connection: {exc}")
+
+
+async def connect_backend() -> RedisBackend:
+    # Try TLS first, then fallback to non-TLS
+    backend: Optional[RedisBackend] = None
+    try:
+        backend = create_backend()
+        await backend.ping()
+        print(f"✅ Connected to Redis ({backend.mode} mode)")
+        return backend
+    except Exception as tls_exc:
+        print(f"⚠️ TLS connection failed: {tls_exc}")
+        print("🔄 Trying without TLS...")
+        # Its pool would otherwise be left open
+        await _close_quietly(backend)
+
+        backend = None
+        try:
+            backend = create_backend(use_tls=False)
+            await backend.ping()
+            print(f"✅ Connected to Redis without TLS ({backend.mode} mode)")
+            return backend
+        except Exception as no_tls_exc:
+            await _close_quietly(backend)
+            print(f"❌ Both TLS and non-TLS failed")
+            print(f"TLS error: {tls_exc}")
+            print(f"Non-TLS error: {no_tls_exc}")
+            raise RuntimeError(f"Failed to connect to Redis with TLS ({tls_exc}) and without TLS ({no_tls_exc})")
@@ -0,0 +1,366 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence
+
+from app.redis_client import TRANSIENT_ERRORS, RedisBackend, create_backend
+
+
+# Commands that may be served by any endpoint. SCAN is left out on purpose:
+# its cursor is only meaningful on the node that issued it.
+READ_ONLY_COMMANDS = frozenset(
+    {
+        "JSON.GET",
+        "JSON.MGET",
+        "JSON.TYPE",
+        "JSON.OBJKEYS",
+        "JSON.OBJLEN",
+        "JSON.ARRLEN",
+        "JSON.STRLEN",
+        "JSON.ARRINDEX",
+        "JSON.RESP",
+        "GET",
+        "MGET",
+        "EXISTS",
+        "TYPE",
+        "STRLEN",
+    }
+)
+# Command latencies needed before an endpoint's own p95 is trusted as hedge delay
+MIN_HEDGE_SAMPLES = 20
+# Keys to prune expired pins at
+MAX_PINNED_KEYS = 10000
+
+
+def _keys_of(args: Sequence[Any]) -> Sequence[Any]:
+    command = str(args[0]).upper()
+    if command == "JSON.MGET":
+        return args[1:-1]
+    if command in ("MGET", "EXISTS"):
+        return args[1:]
+    return args[1:2]
+
+
+class Endpoint:
+    """One Redis node the router can read from, with its latency statistics."""
+
+    def __init__(self, name: str, backend: RedisBackend, role: str, alpha: float = 0.3, window: int = 512) -> None:
+        self.name = name
+        self.backend = backend
+        self.role = role
+        self.alpha = alpha
+        # Moving average of PING round trips, used for routing
+        self.rtt_ms: Optional[float] = None
+        # Recent command latencies, used for the hedge delay
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.healthy = True
+        # Consecutive failed probes
+        self.failures = 0
+        self.in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+
+    def observe_rtt(self, ms: float) -> None:
+        self.rtt_ms = ms if self.rtt_ms is None else self.alpha * ms + (1 - self.alpha) * self.rtt_ms
+
+    def cost(self) -> float:
+        # Peak-EWMA style: a fast node that is already busy looks proportionally slower
+        return (self.rtt_ms or 0.0) * (self.in_flight + 1)
+
+    def p95(self) -> Optional[float]:
+        if len(self.latencies) < MIN_HEDGE_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    def stats(self) -> dict:
+        p95 = self.p95()
+        return {
+            "name": self.name,
+            "role": self.role,
+            "healthy": self.healthy,
+            "consecutiveFailures": self.failures,
+            "rttMs": round(self.rtt_ms, 3) if self.rtt_ms is not None else None,
+            "p95Ms": round(p95, 3) if p95 is not None else None,
+            "inFlight": self.in_flight,
+            "requests": self.requests,
+            "errors": self.errors,
+            "lastError": self.last_error,
+        }
+
+
+class ReplicaRouter(RedisBackend):
+    """Sends read-only commands to the fastest of the primary and its replicas.
+
+    Endpoints are ranked by a moving average of their PING round trip (probed
+    every `probe_interval` seconds) scaled by the requests they already have in
+    flight. A read goes to the best endpoint; if it has not answered within
+    that endpoint's recent p95 command latency, the same read is sent to the
+    second-best endpoint and whichever answers first wins. At most
+    `max_hedge_ratio` of reads are hedged, so a slow cluster is not handed
+    double the load. The losing request is left to finish rather than
+    cancelled, which would drop its pooled connection. A read that fails with
+    a connection error is retried on the next endpoint straight away and the
+    endpoint is skipped until it answers again; `max_failures` failed probes
+    in a row take it out of rotation too.
+
+    Everything else (writes, SCAN, RediSearch, pings) goes to the primary.
+    Replicas trail the primary by the replication lag, so a read right after a
+    write may still see the old value there. The router is a keyspace
+    subscriber: for `pin_seconds` after a key changes, reads of it go to the
+    primary only, so the read that refills the cache after an invalidation
+    cannot bring back the old value from a lagging replica.
+    """
+
+    def __init__(
+        self,
+        primary: RedisBackend,
+        replicas: Sequence[Endpoint],
+        read_from_primary: bool = True,
+        hedge_delay_ms: float = 20.0,
+        min_hedge_delay_ms: float = 1.0,
+        max_hedge_ratio: float = 0.1,
+        probe_interval: float = 1.0,
+        max_failures: int = 2,
+        pin_seconds: float = 2.0,
+    ) -> None:
+        self.primary = primary
+        self.mode = primary.mode
+        self.use_tls = primary.use_tls
+        self.primary_endpoint = Endpoint("primary", primary, "primary")
+        self.replicas = list(replicas)
+        self.endpoints = ([self.primary_endpoint] if read_from_primary else []) + self.replicas
+        self.hedge_delay_ms = hedge_delay_ms
+        self.min_hedge_delay_ms = min_hedge_delay_ms
+        self.max_hedge_ratio = max_hedge_ratio
+        self.probe_interval = probe_interval
+        self.max_failures = max_failures
+        self.pin_seconds = pin_seconds
+        # key -> monotonic time until which its reads go to the primary
+        self._pinned: Dict[Any, float] = {}
+        self._pin_all_until = 0.0
+        self.pinned_reads = 0
+        self.reads = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self._task: Optional[asyncio.Task] = None
+
+    # -- keyspace subscriber interface -------------------------------------
+
+    def key_changed(self, key: str) -> None:
+        now = time.monotonic()
+        if len(self._pinned) >= MAX_PINNED_KEYS:
+            self._pinned = {pinned: until for pinned, until in self._pinned.items() if until > now}
+        self._pinned[key] = now + self.pin_seconds
+
+    def resync(self) -> None:
+        # Notifications were missed: any key may have just changed
+        self._pin_all_until = time.monotonic() + self.pin_seconds
+
+    def _pinned_to_primary(self, commands: Sequence[Sequence[Any]]) -> bool:
+        now = time.monotonic()
+        if now < self._pin_all_until:
+            return True
+        if not self._pinned:
+            return False
+        return any(self._pinned.get(key, 0.0) > now for args in commands for key in _keys_of(args))
+
+    # -- routing ---------------------------------------------------------------
+
+    def _rank(self) -> List[Endpoint]:
+        healthy = [endpoint for endpoint in self.endpoints if endpoint.healthy] or [self.primary_endpoint]
+        # Endpoints not probed yet go last; ties keep configuration order (primary first)
+        return sorted(healthy, key=lambda endpoint: (endpoint.rtt_ms is None, endpoint.cost()))
+
+    def _hedge_delay(self, endpoint: Endpoint) -> float:
+        p95 = endpoint.p95()
+        return max(self.min_hedge_delay_ms, p95 if p95 is not None else self.hedge_delay_ms) / 1000
+
+    def _may_hedge(self) -> bool:
+        return self.hedged < self.max_hedge_ratio * self.reads
+
+    async def _timed(self, endpoint: Endpoint, run: Callable[[RedisBackend], Awaitable[Any]]) -> Any:
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+        started = time.perf_counter()
+        try:
+            result = await run(endpoint.backend)
+        except TRANSIENT_ERRORS as exc:
+            endpoint.errors += 1
+            endpoint.healthy = False
+            endpoint.last_error = str(exc) or type(exc).__name__
+            raise
+        finally:
+            endpoint.in_flight -= 1
+        endpoint.latencies.append((time.perf_counter() - started) * 1000)
+        endpoint.healthy = True
+        return result
+
+    def _launch(self, endpoint: Endpoint, run: Callable[[RedisBackend], Awaitable[Any]]) -> asyncio.Task:
+        task = asyncio.ensure_future(self._timed(endpoint, run))
+        # A hedging loser may fail after nobody awaits it any more
+        task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    @staticmethod
+    def _answered(task: asyncio.Task) -> bool:
+        """True when `task` holds an answer to return: a result or a non-transient error."""
+        return task.done() and not isinstance(task.exception(), TRANSIENT_ERRORS)
+
+    async def _read(self, run: Callable[[RedisBackend], Awaitable[Any]]) -> Any:
+        ranked = self._rank()
+        self.reads += 1
+        first = self._launch(ranked[0], run)
+        if len(ranked) == 1:
+            return await first
+
+        await asyncio.wait({first}, timeout=self._hedge_delay(ranked[0]))
+        if self._answered(first):
+            return first.result()
+        if first.done():
+            self.failovers += 1
+            return await self._launch(ranked[1], run)
+        if not self._may_hedge():
+            return await first
+
+        self.hedged += 1
+        second = self._launch(ranked[1], run)
+        pending = {first, second}
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in (first, second):
+                if task not in pending and self._answered(task):
+                    if task is second:
+                        self.hedge_wins += 1
+                    return task.result()
+        # Both endpoints failed
+        return first.result()
+
+    # -- RedisBackend ------------------------------------------------------------
+
+    async def execute_command(self, *args: Any) -> Any:
+        if args and str(args[0]).upper() in READ_ONLY_COMMANDS:
+            if self._pinned_to_primary([args]):
+                self.pinned_reads += 1
+            else:
+                return await self._read(lambda backend: backend.execute_command(*args))
+        return await self.primary.execute_command(*args)
+
+    async def execute_pipeline(self, commands: Sequence[Sequence[Any]]) -> List[Any]:
+        if commands and all(args and str(args[0]).upper() in READ_ONLY_COMMANDS for args in commands):
+            if self._pinned_to_primary(commands):
+                self.pinned_reads += 1
+            else:
+                return await self._read(lambda backend: backend.execute_pipeline(commands))
+        return await self.primary.execute_pipeline(commands)
+
+    async def ping(self) -> bool:
+        return await self.primary.ping()
+
+    def pool_stats(self) -> dict:
+        return self.primary.pool_stats()
+
+    async def warm(self, count: int) -> int:
+        opened = await asyncio.gather(*(endpoint.backend.warm(count) for endpoint in self.replicas), return_exceptions=True)
+        for endpoint, result in zip(self.replicas, opened):
+            if isinstance(result, BaseException):
+                print(f"⚠️ Redis replica {endpoint.name} warmup failed: {result}")
+        return await self.primary.warm(count)
+
+    async def reset_pool(self) -> None:
+        for endpoint in [self.primary_endpoint, *self.replicas]:
+            await endpoint.backend.reset_pool()
+
+    async def close(self) -> None:
+        await self.stop()
+        for endpoint in self.replicas:
+            await endpoint.backend.close()
+        await self.primary.close()
+
+    # -- probing -----------------------------------------------------------------
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.probe()
+            await asyncio.sleep(self.probe_interval)
+
+    async def probe(self) -> None:
+        """PING every endpoint once, updating its RTT average and health."""
+
+        async def ping(endpoint: Endpoint) -> None:
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(endpoint.backend.ping(), timeout=max(self.probe_interval, 1.0))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                endpoint.failures += 1
+                endpoint.last_error = str(exc) or type(exc).__name__
+                if endpoint.failures >= self.max_failures and endpoint.healthy:
+                    print(f"⚠️ Redis {endpoint.role} {endpoint.name} unreachable: {endpoint.last_error}")
+                    endpoint.healthy = False
+                return
+            endpoint.observe_rtt((time.perf_counter() - started) * 1000)
+            endpoint.failures = 0
+            if not endpoint.healthy:
+                print(f"✅ Redis {endpoint.role} {endpoint.name} reachable again")
+                endpoint.healthy = True
+
+        await asyncio.gather(*(ping(endpoint) for endpoint in [self.primary_endpoint, *self.replicas]))
+
+    def stats(self) -> dict:
+        return {
+            "reads": self.reads,
+            "hedged": self.hedged,
+            "hedgeWins": self.hedge_wins,
+            "failovers": self.failovers,
+            "pinnedReads": self.pinned_reads,
+            "endpoints": [endpoint.stats() for endpoint in [self.primary_endpoint, *self.replicas]],
+        }
+
+
+def parse_endpoints(value: str, default_port: int) -> List[tuple]:
+    """`host[:port],host[:port]` into [(host, port)]."""
+    endpoints = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        host, _, port = item.rpartition(":") if ":" in item else (item, "", "")
+        endpoints.append((host, int(port) if port else default_port))
+    return endpoints
+
+
+def create_replica_router(primary: RedisBackend) -> Optional[ReplicaRouter]:
+    """Router over the primary and REDIS_REPLICAS, or None when no replicas are configured."""
+    endpoints = parse_endpoints(os.getenv("REDIS_REPLICAS", ""), int(os.getenv("REDIS_PORT", "6379")))
+    if not endpoints:
+        return None
+    replicas = [Endpoint(f"{host}:{port}", create_backend(primary.use_tls, host, port), "replica") for host, port in endpoints]
+    return ReplicaRouter(
+        primary,
+        replicas,
+        read_from_primary=os.getenv("REDIS_READ_FROM_PRIMARY", "true").lower() in ("1", "true", "yes"),
+        hedge_delay_ms=float(os.getenv("REDIS_HEDGE_DELAY_MS", "20")),
+        min_hedge_delay_ms=float(os.getenv("REDIS_HEDGE_MIN_DELAY_MS", "1")),
+        max_hedge_ratio=float(os.getenv("REDIS_HEDGE_MAX_RATIO", "0.1")),
+        probe_interval=float(os.getenv("REDIS_REPLICA_PROBE_INTERVAL", "1")),
+        max_failures=int(os.getenv("REDIS_HEALTH_MAX_FAILURES", "2")),
+        pin_seconds=float(os.getenv("REDIS_REPLICA_PIN_SECONDS", "2")),
+    )
@@ -0,0 +1,164 @@
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Optional, TextIO
+
+import orjson
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+
+class LogSink:
+    """Bounded queue of log records, written to `stream` by a background thread.
+
+    `emit` never blocks the event loop: when the queue is full the record is
+    dropped and counted instead. Records are serialized and written in batches
+    off the request path, so a slow stdout only fills the queue.
+    """
+
+    def __init__(self, max_queue: int = 10000, stream: Optional[TextIO] = None, batch_size: int = 256) -> None:
+        self.stream = stream or sys.stdout
+        self.batch_size = batch_size
+        self.emitted = 0
+        self.dropped = 0
+        # Successful requests skipped by sampling
+        self.sampled_out = 0
+        self.written = 0
+        self._queue: "queue.Queue[Optional[dict]]" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+
+    def emit(self, record: dict) -> None:
+        try:
+            self._queue.put_nowait(record)
+            self.emitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._drain, name="log-sink", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush queued records and stop the writer."""
+        if self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _drain(self) -> None:
+        while True:
+            record = self._queue.get()
+            if record is None:
+                return
+            batch = [record]
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is None:
+                    stopping = True
+                    break
+                batch.append(record)
+            try:
+                self.stream.write("".join(orjson.dumps(item).decode() + "\n" for item in batch))
+                self.stream.flush()
+                self.written += len(batch)
+            except Exception:
+                self.dropped += len(batch)
+            if stopping:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "emitted": self.emitted,
+            "written": self.written,
+            "dropped": self.dropped,
+            "sampledOut": self.sampled_out,
+        }
+
+
+class RequestLoggingMiddleware:
+    """Logs one record per request and propagates `X-Request-ID`.
+
+    Successful requests (status < 400) are logged with probability
+    `sample_rate`; client and server errors are always logged.
+    """
+
+    def __init__(self, app: ASGIApp, sink: LogSink, sample_rate: float = 1.0) -> None:
+        self.app = app
+        self.sink = sink
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter_ns()
+        req_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                req_id = value.decode("latin-1")
+                break
+        req_id = req_id or str(uuid.uuid4())
+        status_code = 500
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = [(name, value) for name, value in message.get("headers", []) if name.lower() != b"x-request-id"]
+                headers.append((b"x-request-id", req_id.encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        except Exception as exc:
+            self.sink.emit(
+                {
+                    "event": "error",
+                    "requestId": req_id,
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "error": str(exc),
+                    "durationMs": (time.perf_counter_ns() - started) // 1_000_000,
+                }
+            )
+            raise
+
+        if status_code < 400 and self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.sink.sampled_out += 1
+            return
+        self.sink.emit(
+            {
+                "event": "request",
+                "requestId": req_id,
+                "method": scope["method"],
+                "path": scope["path"],
+                "status": status_code,
+                "durationMs": (time.perf_counter_ns() - started) // 1_000_000,
+            }
+        )
+
+
+def create_log_sink() -> LogSink:
+    return LogSink(max_queue=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+
+
+def log_sample_rate() -> float:
+    rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    if not 0.0 <= rate <= 1.0:
+        raise RuntimeError("LOG_SAMPLE_RATE must be between 0 and 1")
+    return rate
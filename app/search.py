@@ -0,0 +1,269 @@
+import bisect
+import heapq
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.index_builder import fetch_documents, scan_keys
+from app.redis_client import RedisBackend
+from app.views import MaintainedView
+
+
+SEARCH_PREFIXES = ("p:", "sp:", "ssp:", "chunk:")
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# A title match counts as this many body matches
+TITLE_WEIGHT = 2
+PREVIEW_CHARS = 160
+# Most terms a single prefix expands to
+MAX_PREFIX_TERMS = 64
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+
+def _text(doc: dict) -> str:
+    parts = [doc.get(field) for field in ("content", "text")]
+    return " ".join(part for part in parts if isinstance(part, str))
+
+
+class SearchIndex(MaintainedView):
+    """In-memory inverted index over `title`, `content` and `text` of content keys.
+
+    Loaded with the same SCAN plus pipelined JSON.MGET walk as the index
+    builder and kept current from keyspace notifications, like the hierarchy
+    index. Queries are ranked with BM25 (titles weighted up); a trailing `*`
+    on a term, or `prefix=True` for the last term, matches every indexed term
+    starting with it.
+    """
+
+    label = "Search index"
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        prefixes: Tuple[str, ...] = SEARCH_PREFIXES,
+        batch_size: int = 200,
+        scan_count: int = 1000,
+        refresh_interval: float = 300.0,
+        push_active: Callable[[], bool] = lambda: False,
+        ancestors: Optional[Callable[[str], List[str]]] = None,
+    ) -> None:
+        super().__init__(backend, prefixes, batch_size, scan_count, refresh_interval, push_active)
+        # Parent chain above the indexed levels (chapters, documents)
+        self.external_ancestors = ancestors
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.terms: List[str] = []
+        self.docs: Dict[str, dict] = {}
+        self.total_length = 0
+        self.queries = 0
+        self.updates = 0
+
+    # -- indexing --------------------------------------------------------------
+
+    def _add(self, key: str, doc: dict) -> List[str]:
+        """Index `doc` under `key`; returns the terms it added to the vocabulary (not yet in `terms`)."""
+        title = doc.get("title") if isinstance(doc.get("title"), str) else ""
+        body = _text(doc)
+        frequencies: Counter = Counter(tokenize(body))
+        for term in tokenize(title):
+            frequencies[term] += TITLE_WEIGHT
+        length = sum(frequencies.values())
+        self.docs[key] = {
+            "title": title or None,
+            "parent": doc.get("parent"),
+            "preview": body[:PREVIEW_CHARS],
+            "length": length,
+            "terms": tuple(frequencies),
+        }
+        self.total_length += length
+        new_terms: List[str] = []
+        for term, frequency in frequencies.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                new_terms.append(term)
+            postings[key] = frequency
+        return new_terms
+
+    def _remove(self, key: str) -> None:
+        old = self.docs.pop(key, None)
+        if old is None:
+            return
+        self.total_length -= old["length"]
+        for term in old["terms"]:
+            postings = self.postings[term]
+            postings.pop(key, None)
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect.bisect_left(self.terms, term)]
+
+    async def load(self) -> None:
+        started = time.perf_counter()
+        keys = await scan_keys(self.backend, self.prefixes, self.scan_count)
+        docs = await fetch_documents(self.backend, keys, self.batch_size)
+        self.postings, self.docs, self.total_length = {}, {}, 0
+        for key, doc in docs.items():
+            if doc is not None:
+                self._add(key, doc)
+        # Sorted once: inserting each new term in order would be quadratic in the vocabulary
+        self.terms = sorted(self.postings)
+        self.version += 1
+        self.ready = True
+        self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Search index loaded: {len(self.docs)} documents, {len(self.terms)} terms in {self.load_ms}ms")
+
+    async def apply(self, keys: List[str]) -> None:
+        docs = await fetch_documents(self.backend, keys, self.batch_size)
+        for key, doc in docs.items():
+            self._remove(key)
+            if doc is not None:
+                for term in self._add(key, doc):
+                    bisect.insort(self.terms, term)
+        self.version += 1
+        self.updates += len(keys)
+
+    # -- queries ---------------------------------------------------------------
+
+    def expand(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self.terms, prefix)
+        matches: List[str] = []
+        for term in self.terms[start:]:
+            if not term.startswith(prefix) or len(matches) >= MAX_PREFIX_TERMS:
+                break
+            matches.append(term)
+        return matches
+
+    def ancestors(self, key: str) -> List[str]:
+        """Parent chain of `key`, nearest first."""
+        chain: List[str] = []
+        parent = self.docs[key]["parent"] if key in self.docs else None
+        while parent and parent not in chain:
+            chain.append(parent)
+            if parent not in self.docs:
+                if self.external_ancestors is not None:
+                    chain.extend(ancestor for ancestor in self.external_ancestors(parent) if ancestor not in chain)
+                break
+            parent = self.docs[parent]["parent"]
+        return chain
+
+    def search(self, query: str, limit: int = 10, under: Optional[str] = None, prefix: bool = False) -> List[dict]:
+        """Top `limit` keys for `query` by BM25, optionally only descendants of `under`."""
+        self.queries += 1
+        groups: List[List[str]] = []
+        words = query.split()
+        for position, word in enumerate(words):
+            expand = word.endswith("*") or (prefix and position == len(words) - 1)
+            for token in tokenize(word):
+                groups.append(self.expand(token) if expand else [token])
+        if not groups or not self.docs:
+            return []
+
+        count = len(self.docs)
+        average_length = self.total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for group in groups:
+            # Best expansion per document, so a broad prefix does not outweigh an exact term
+            best: Dict[str, float] = {}
+            for term in group:
+                postings = self.postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.docs[key]["length"] / average_length)
+                    score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    if score > best.get(key, 0.0):
+                        best[key] = score
+            for key, score in best.items():
+                scores[key] = scores.get(key, 0.0) + score
+
+        candidates = scores.items()
+        if under is not None:
+            candidates = [(key, score) for key, score in candidates if under in self.ancestors(key)]
+        results = []
+        for key, score in heapq.nlargest(limit, candidates, key=lambda item: item[1]):
+            doc = self.docs[key]
+            results.append({"key": key, "score": round(score, 4), "title": doc["title"], "parent": doc["parent"], "preview": doc["preview"]})
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self.docs),
+            "terms": len(self.terms),
+            "version": self.version,
+            "loadMs": self.load_ms,
+            "queries": self.queries,
+            "updates": self.updates,
+            "pendingUpdates": len(self._dirty),
+            "lastError": self.last_error,
+        }
+
+
+_QUERY_SPECIAL_RE = re.compile(r"([,.<>{}\[\]\"':;!@#$%^&()\-+=~|/\\ ])")
+
+
+class RediSearchBackend:
+    """Runs queries with `FT.SEARCH` against an existing RediSearch index.
+
+    The index must cover the same JSON documents (e.g. `FT.CREATE idx:content
+    ON JSON PREFIX 4 p: sp: ssp: chunk: SCHEMA $.title AS title TEXT WEIGHT 2
+    $.content AS content TEXT $.text AS text TEXT`). Ancestor filters need the
+    in-memory parent chain and are not supported here.
+    """
+
+    def __init__(self, backend: RedisBackend, index: str) -> None:
+        self.backend = backend
+        self.index = index
+        self.available = False
+
+    async def detect(self) -> bool:
+        try:
+            await self.backend.execute_command("FT.INFO", self.index)
+            self.available = True
+        except Exception:
+            self.available = False
+        return self.available
+
+    async def search(self, query: str, limit: int = 10, prefix: bool = False) -> List[dict]:
+        words = query.split()
+        terms = []
+        for position, word in enumerate(words):
+            expand = word.endswith("*") or (prefix and position == len(words) - 1)
+            for token in tokenize(word):
+                escaped = _QUERY_SPECIAL_RE.sub(r"\\\1", token)
+                terms.append(escaped + "*" if expand else escaped)
+        if not terms:
+            return []
+        reply = await self.backend.execute_command(
+            "FT.SEARCH", self.index, " ".join(terms), "WITHSCORES", "NOCONTENT", "SCORER", "BM25", "LIMIT", 0, limit
+        )
+        # [total, key1, score1, key2, score2, ...]
+        return [{"key": key, "score": round(float(score), 4)} for key, score in zip(reply[1::2], reply[2::2])]
+
+
+def create_search(
+    backend: RedisBackend,
+    push_active: Callable[[], bool],
+    ancestors: Optional[Callable[[str], List[str]]] = None,
+) -> Tuple[Optional[SearchIndex], Optional[RediSearchBackend]]:
+    """In-memory index (SEARCH_ENABLED) and optional RediSearch backing (SEARCH_REDISEARCH_INDEX)."""
+    index: Optional[SearchIndex] = None
+    if os.getenv("SEARCH_ENABLED", "true").lower() in ("1", "true", "yes"):
+        index = SearchIndex(
+            backend,
+            batch_size=int(os.getenv("INDEX_BATCH_SIZE", "200")),
+            scan_count=int(os.getenv("HIERARCHY_SCAN_COUNT", "1000")),
+            refresh_interval=float(os.getenv("HIERARCHY_REFRESH_INTERVAL", "300")),
+            push_active=push_active,
+            ancestors=ancestors,
+        )
+    redisearch_index = os.getenv("SEARCH_REDISEARCH_INDEX")
+    redisearch = RediSearchBackend(backend, redisearch_index) if redisearch_index else None
+    return index, redisearch
@@ -0,0 +1,37 @@
+"""
+Run the proxy with uvicorn, in WEB_CONCURRENCY worker processes.
+
+    python -m app.serve
+
+One worker unless WEB_CONCURRENCY says otherwise. Every worker imports the
+app on its own and opens its Redis pool in the lifespan hook, i.e. after the
+worker process has started, so no sockets are shared between processes.
+Everything else is per worker too: the REDIS_MAX_CONNECTIONS pool, the
+startup loads of the in-memory views, and the admission and rate limits, so
+N workers multiply each of them by N. With more than one worker the shared
+cache tier is enabled unless SHARED_CACHE_ENABLED says otherwise.
+"""
+import os
+
+import uvicorn
+
+
+def worker_count() -> int:
+    return max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+
+
+def main() -> None:
+    workers = worker_count()
+    if workers > 1:
+        os.environ.setdefault("SHARED_CACHE_ENABLED", "true")
+    print(f"🚀 Starting {workers} worker(s)")
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8080")),
+        workers=workers,
+    )
+
+
+if __name__ == "__main__":
+    main()
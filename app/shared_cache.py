@@ -0,0 +1,166 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from typing import Hashable, Iterable, Optional
+
+
+class SharedCacheTier:
+    """Cache tier shared by all worker processes on one host.
+
+    Entries are files in a shared-memory directory (tmpfs such as /dev/shm),
+    one subdirectory per Redis key, so reading a hot document like
+    `index:database_schema` costs a page-cache copy instead of a Redis round
+    trip per worker. Each file holds a one-line header with the key, path,
+    expiry and the time the Redis read started, followed by the raw reply.
+    Writes go to a temp file and are renamed into place, so readers never see
+    a partial entry.
+
+    Only keys under `prefixes` are shared. Every worker runs its own keyspace
+    invalidator; an invalidation removes the key's entries and records its
+    time in a marker file next to them (`clear()` in one for all keys). A
+    worker whose read started before the latest invalidation may still be
+    about to store the old value after the entries were removed, so entries
+    read before the marker are neither written nor served.
+    """
+
+    def __init__(self, directory: str, prefixes: Iterable[str], max_entry_bytes: int = 8 * 1024 * 1024) -> None:
+        self.directory = directory
+        self.prefixes = tuple(prefixes)
+        self.max_entry_bytes = max_entry_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.rejected = 0
+        self.errors = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def shares(self, key: str) -> bool:
+        return key.startswith(self.prefixes)
+
+    def _key_dir(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def _entry_file(self, key: str, path: Optional[Hashable]) -> str:
+        return os.path.join(self._key_dir(key), hashlib.sha1(repr(path).encode()).hexdigest()[:16])
+
+    def _marker_file(self, key: Optional[str]) -> str:
+        # Beside the key's directory, which invalidation removes; None for the marker of `clear()`
+        return self._key_dir(key) + ".invalidated" if key is not None else os.path.join(self.directory, ".cleared")
+
+    def _invalidated_at(self, key: str) -> float:
+        """Time of the latest invalidation of `key` in any worker, or 0."""
+        latest = 0.0
+        for marker in (self._marker_file(key), self._marker_file(None)):
+            try:
+                with open(marker, "rb") as handle:
+                    latest = max(latest, float(handle.read()))
+            except (OSError, ValueError):
+                pass
+        return latest
+
+    def _write(self, target: str, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as handle:
+                handle.write(data)
+            os.replace(tmp, target)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def _mark(self, key: Optional[str]) -> None:
+        try:
+            self._write(self._marker_file(key), repr(time.time()).encode())
+        except OSError:
+            self.errors += 1
+
+    def get(self, key: str, path: Optional[Hashable], ttl_cap: Optional[float] = None) -> Optional[str]:
+        """Raw reply for (key, path), or None if missing, expired or older than `ttl_cap` seconds."""
+        try:
+            with open(self._entry_file(key, path), "rb") as handle:
+                data = handle.read()
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except OSError:
+            self.errors += 1
+            return None
+
+        header, _, body = data.partition(b"\n")
+        try:
+            stored_at, expires_at, read_at, entry_key, entry_path = header.decode().split("\t", 4)
+            now = time.time()
+            fresh = float(expires_at) > now and (ttl_cap is None or float(stored_at) + ttl_cap > now)
+            # Stored by a read that raced an invalidation
+            fresh = fresh and float(read_at) > self._invalidated_at(key)
+        except ValueError:
+            fresh = False
+            entry_key = entry_path = None
+        if not fresh or entry_key != key or entry_path != repr(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return body.decode()
+
+    def set(self, key: str, path: Optional[Hashable], raw: str, ttl: float, read_at: float) -> None:
+        """Store the reply of a Redis read that started at `read_at` (wall clock)."""
+        body = raw.encode()
+        if ttl <= 0 or len(body) > self.max_entry_bytes or "\t" in key or "\n" in key:
+            return
+        if read_at <= self._invalidated_at(key):
+            self.rejected += 1
+            return
+        now = time.time()
+        header = f"{now}\t{now + ttl}\t{read_at!r}\t{key}\t{path!r}\n".encode()
+        target = self._entry_file(key, path)
+        try:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            self._write(target, header + body)
+            self.writes += 1
+        except OSError:
+            self.errors += 1
+
+    def invalidate(self, key: str) -> None:
+        # Marked first, so a write racing the removal is refused or ignored
+        self._mark(key)
+        shutil.rmtree(self._key_dir(key), ignore_errors=True)
+
+    def clear(self) -> None:
+        self._mark(None)
+        for name in os.listdir(self.directory):
+            if name.startswith(".tmp-") or name == ".cleared":
+                continue
+            path = os.path.join(self.directory, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "directory": self.directory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRatio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+def _default_directory() -> str:
+    base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(base, f"redis-proxy-{os.getenv('PORT', '8080')}")
+
+
+def create_shared_tier() -> Optional[SharedCacheTier]:
+    if os.getenv("SHARED_CACHE_ENABLED", "false").lower() not in ("1", "true", "yes"):
+        return None
+    prefixes = [prefix.strip() for prefix in os.getenv("SHARED_CACHE_PREFIXES", "index:").split(",") if prefix.strip()]
+    return SharedCacheTier(os.getenv("SHARED_CACHE_DIR") or _default_directory(), prefixes)
@@ -0,0 +1,90 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Sequence
+
+
+class SingleFlight:
+    """Collapses identical in-flight reads into one Redis call.
+
+    The first caller for a key starts the call as a separate task; callers that
+    arrive while it is running await the same result. The task is shielded, so a
+    disconnecting client does not cancel the read for the others.
+    """
+
+    def __init__(self) -> None:
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            return await asyncio.shield(future)
+
+        self.calls += 1
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        task = asyncio.ensure_future(fn())
+
+        def resolve(done: asyncio.Future) -> None:
+            self._calls.pop(key, None)
+            if done.cancelled():
+                future.cancel()
+            elif done.exception() is not None:
+                future.set_exception(done.exception())
+            else:
+                future.set_result(done.result())
+
+        task.add_done_callback(resolve)
+        return await asyncio.shield(future)
+
+    async def do_many(self, keys: Sequence[Hashable], fn: Callable[[List[Hashable]], Awaitable[List[Any]]]) -> List[Any]:
+        """Like `do` for a batch: keys already in flight are joined, the rest go to one `fn(keys)` call.
+
+        Failures are returned in place as exception instances, so `fn` may also
+        report per-key errors that way.
+        """
+        loop = asyncio.get_running_loop()
+        futures: List[asyncio.Future] = []
+        own: List[Hashable] = []
+        own_futures: List[asyncio.Future] = []
+        for key in keys:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+            else:
+                future = loop.create_future()
+                self._calls[key] = future
+                own.append(key)
+                own_futures.append(future)
+            futures.append(future)
+
+        if own:
+            self.calls += len(own)
+            task = asyncio.ensure_future(fn(own))
+
+            def resolve(done: asyncio.Future) -> None:
+                for key in own:
+                    self._calls.pop(key, None)
+                if done.cancelled():
+                    for future in own_futures:
+                        future.cancel()
+                elif done.exception() is not None:
+                    for future in own_futures:
+                        future.set_exception(done.exception())
+                else:
+                    for future, value in zip(own_futures, done.result()):
+                        future.set_result(value)
+
+            task.add_done_callback(resolve)
+
+        return list(await asyncio.shield(asyncio.gather(*futures, return_exceptions=True)))
+
+    def stats(self) -> dict:
+        requests = self.calls + self.coalesced
+        return {
+            "inFlight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalescingRatio": round(self.coalesced / requests, 4) if requests else 0.0,
+        }
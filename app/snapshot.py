@@ -0,0 +1,332 @@
+import asyncio
+import mmap
+import os
+import struct
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import orjson
+from starlette.concurrency import run_in_threadpool
+
+from app.etags import etag_for
+from app.index_builder import INDEX_KEY
+from app.projection import json_get_args
+from app.rawjson import RawJson
+from app.redis_client import RedisBackend, redis_batch_size
+
+
+MAGIC = b"RPSNAP01"
+_LENGTH = struct.Struct("<I")
+# key offset, key length, value offset, value length; offsets are into the blob
+_RECORD = struct.Struct("<IIII")
+
+# Returns what to write: hot documents as (key, reply), most valuable first, and the hierarchy nodes
+Collector = Callable[[], Tuple[List[Tuple[str, RawJson]], List[dict]]]
+
+
+def encode_snapshot(content_version: Optional[str], documents: List[Tuple[str, RawJson]], nodes: List[dict]) -> bytes:
+    """The snapshot file: magic, meta, hierarchy nodes, record table, blob of keys and replies.
+
+    Replies are stored as the exact text RedisJSON returned, so they can be
+    served straight from the mapped file.
+    """
+    blob = bytearray()
+    table = bytearray()
+    for key, doc in documents:
+        key_bytes = key.encode()
+        key_offset = len(blob)
+        blob += key_bytes
+        value_offset = len(blob)
+        blob += doc.encoded
+        table += _RECORD.pack(key_offset, len(key_bytes), value_offset, len(doc.encoded))
+    node_bytes = orjson.dumps([[node["key"], node["parent"], node["title"], node["position"]] for node in nodes])
+    meta = orjson.dumps(
+        {"contentVersion": content_version, "createdAt": time.time(), "documents": len(documents), "nodes": len(nodes)}
+    )
+    return b"".join(
+        (MAGIC, _LENGTH.pack(len(meta)), meta, _LENGTH.pack(len(node_bytes)), node_bytes, _LENGTH.pack(len(table)), bytes(table), blob)
+    )
+
+
+class CorpusSnapshot:
+    """Hot documents and the hierarchy, kept in a memory-mapped file across restarts.
+
+    Every `interval` seconds (and at shutdown) the most recently used cached
+    documents, up to `max_bytes` of replies, and the hierarchy nodes are
+    written to `path`, tagged with the content version: a hash of the
+    `version_key` document, which the index rebuild rewrites whenever content
+    changes. At startup the file is mapped and documents are served from it
+    straight away while a background check compares the tag against Redis; on
+    a mismatch (or without a `version_key`) each mapped document is re-read
+    and those that changed are dropped. Keyspace notifications drop changed
+    keys as they arrive.
+
+    Snapshots are only written while push invalidation is active, since in
+    TTL-only mode cached documents may be older than the version they would
+    be tagged with.
+    """
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        path: str,
+        max_bytes: int = 16 * 1024 * 1024,
+        interval: float = 300.0,
+        version_key: str = INDEX_KEY,
+        batch_size: int = 50,
+        push_active: Callable[[], bool] = lambda: False,
+    ) -> None:
+        self.backend = backend
+        self.path = path
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.version_key = version_key
+        self.batch_size = batch_size
+        self.push_active = push_active
+        self.content_version: Optional[str] = None
+        self.created_at: Optional[float] = None
+        self.nodes: List[dict] = []
+        # key -> (value offset, value length) into the mapped blob
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._map: Optional[mmap.mmap] = None
+        self.mapped = False
+        self.verified: Optional[bool] = None
+        self.served = 0
+        self.dropped = 0
+        self.writes = 0
+        self.write_ms: Optional[float] = None
+        self.written_documents = 0
+        self.last_error: Optional[str] = None
+        self._collect: Optional[Collector] = None
+        self._task: Optional[asyncio.Task] = None
+
+    # -- keyspace subscriber interface -------------------------------------
+
+    def key_changed(self, key: str) -> None:
+        if self._index.pop(key, None) is not None:
+            self.dropped += 1
+
+    def resync(self) -> None:
+        # Notifications may have been missed: nothing mapped can be trusted any more
+        self.dropped += len(self._index)
+        self._index = {}
+
+    # -- reading -------------------------------------------------------------
+
+    def map_from_disk(self) -> bool:
+        """Map a previously written snapshot; returns whether one was found."""
+        if not os.path.exists(self.path):
+            return False
+        started = time.perf_counter()
+        try:
+            with open(self.path, "rb") as handle:
+                mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            if mapped[: len(MAGIC)] != MAGIC:
+                raise ValueError("not a snapshot file")
+            offset = len(MAGIC)
+            sections = []
+            for _ in range(3):
+                (length,) = _LENGTH.unpack_from(mapped, offset)
+                offset += _LENGTH.size
+                sections.append((offset, length))
+                offset += length
+            (meta_at, meta_len), (nodes_at, nodes_len), (table_at, table_len) = sections
+            meta = orjson.loads(mapped[meta_at : meta_at + meta_len])
+            nodes = orjson.loads(mapped[nodes_at : nodes_at + nodes_len])
+            blob_start = offset
+            index: Dict[str, Tuple[int, int]] = {}
+            for key_offset, key_len, value_offset, value_len in _RECORD.iter_unpack(mapped[table_at : table_at + table_len]):
+                key = mapped[blob_start + key_offset : blob_start + key_offset + key_len].decode()
+                index[key] = (blob_start + value_offset, value_len)
+            if index and max(start + length for start, length in index.values()) > len(mapped):
+                raise ValueError("truncated file")
+        except (OSError, ValueError, struct.error) as exc:
+            print(f"⚠️ Ignoring snapshot {self.path}: {exc}")
+            return False
+
+        self._map = mapped
+        self._index = index
+        self.nodes = [{"key": key, "parent": parent, "title": title, "position": position} for key, parent, title, position in nodes]
+        self.content_version = meta.get("contentVersion")
+        self.created_at = meta.get("createdAt")
+        self.mapped = True
+        self.verified = None
+        ms = round((time.perf_counter() - started) * 1000, 1)
+        print(f"✅ Mapped snapshot: {len(index)} documents, {len(self.nodes)} hierarchy nodes in {ms}ms")
+        return True
+
+    def _read(self, key: str) -> Optional[RawJson]:
+        location = self._index.get(key)
+        if location is None or self._map is None:
+            return None
+        start, length = location
+        return RawJson(self._map[start : start + length].decode())
+
+    def get(self, key: str) -> Optional[RawJson]:
+        """The mapped reply for `key` (root path), or None.
+
+        Once verified, documents are only served while push invalidation is
+        active: without keyspace notifications a change would go unnoticed.
+        """
+        if self.verified and not self.push_active():
+            return None
+        doc = self._read(key)
+        if doc is not None:
+            self.served += 1
+        return doc
+
+    # -- verification --------------------------------------------------------
+
+    async def read_version(self) -> Optional[str]:
+        if not self.version_key:
+            return None
+        raw = await self.backend.execute_command(*json_get_args(self.version_key, None))
+        return etag_for(raw.encode()) if raw is not None else None
+
+    async def verify(self) -> None:
+        """Compare the snapshot's content version with Redis; re-check every document on a mismatch."""
+        if not self._index:
+            self.verified = True
+            return
+        started = time.perf_counter()
+        version = await self.read_version()
+        if version is not None and version == self.content_version:
+            self.verified = True
+            print(f"✅ Snapshot matches content version {version} (checked in {round((time.perf_counter() - started) * 1000, 1)}ms)")
+            return
+
+        keys = list(self._index)
+        stale = 0
+        for i in range(0, len(keys), self.batch_size):
+            chunk = keys[i : i + self.batch_size]
+            replies = await self.backend.execute_pipeline([json_get_args(key, None) for key in chunk])
+            for key, raw in zip(chunk, replies):
+                current = self._read(key)
+                if current is None:
+                    continue
+                if isinstance(raw, Exception) or raw is None or raw != current.text:
+                    self.key_changed(key)
+                    stale += 1
+        self.verified = True
+        print(f"⚠️ Snapshot re-checked against Redis: dropped {stale}/{len(keys)} changed documents in {round((time.perf_counter() - started) * 1000, 1)}ms")
+
+    # -- writing -------------------------------------------------------------
+
+    async def write(self) -> bool:
+        """Write a new snapshot from the collector; returns whether one was written."""
+        if self._collect is None or not self.push_active():
+            return False
+        started = time.perf_counter()
+        # Read before collecting, so no document is older than the version it is tagged with
+        version = await self.read_version()
+        documents, nodes = self._collect()
+        if self.verified:
+            # Mapped documents nobody asked for since startup are still current; keep them after the hot ones
+            documents = [*documents, *((key, self._read(key)) for key in list(self._index))]
+        selected: List[Tuple[str, RawJson]] = []
+        seen = set()
+        size = 0
+        for key, doc in documents:
+            if key in seen or doc is None:
+                continue
+            if size + len(doc.encoded) > self.max_bytes:
+                break
+            seen.add(key)
+            selected.append((key, doc))
+            size += len(doc.encoded)
+
+        def store() -> None:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # Written under a temporary name of its own and renamed, so neither a crash nor another
+            # worker writing the same path leaves a torn file; the currently mapped file stays
+            # readable, its inode lives on until unmapped
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-" + os.path.basename(self.path))
+            try:
+                with os.fdopen(fd, "wb") as handle:
+                    handle.write(encode_snapshot(version, selected, nodes))
+                os.replace(tmp, self.path)
+            except BaseException:
+                os.unlink(tmp)
+                raise
+
+        await run_in_threadpool(store)
+        self.writes += 1
+        self.written_documents = len(selected)
+        self.write_ms = round((time.perf_counter() - started) * 1000, 1)
+        return True
+
+    # -- background maintenance ---------------------------------------------
+
+    def start(self, collect: Collector) -> None:
+        self._collect = collect
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background task and write a final snapshot."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        try:
+            await self.write()
+        except Exception as exc:
+            print(f"⚠️ Final snapshot failed: {exc}")
+
+    async def _run(self) -> None:
+        while not self.verified:
+            try:
+                await self.verify()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Keep serving the snapshot meanwhile; keyspace notifications still drop changed keys
+                self.last_error = str(exc)
+                print(f"⚠️ Snapshot verification failed: {exc}")
+                await asyncio.sleep(5)
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.write()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"⚠️ Snapshot write failed: {exc}")
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "mapped": self.mapped,
+            "documents": len(self._index),
+            "hierarchyNodes": len(self.nodes),
+            "contentVersion": self.content_version,
+            "createdAt": self.created_at,
+            "verified": self.verified,
+            "served": self.served,
+            "dropped": self.dropped,
+            "writes": self.writes,
+            "writeMs": self.write_ms,
+            "writtenDocuments": self.written_documents,
+            "lastError": self.last_error,
+        }
+
+
+def create_snapshot(backend: RedisBackend, push_active: Callable[[], bool]) -> Optional[CorpusSnapshot]:
+    path = os.getenv("SNAPSHOT_PATH")
+    if not path:
+        return None
+    return CorpusSnapshot(
+        backend,
+        path,
+        max_bytes=int(os.getenv("SNAPSHOT_MAX_BYTES", str(16 * 1024 * 1024))),
+        interval=float(os.getenv("SNAPSHOT_INTERVAL", "300")),
+        version_key=os.getenv("SNAPSHOT_VERSION_KEY", INDEX_KEY),
+        batch_size=redis_batch_size(),
+        push_active=push_active,
+    )
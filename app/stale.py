@@ -0,0 +1,74 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from app.cache import ROOT_PATHS
+
+
+class LastKnownGood:
+    """The most recent successful reply per (key, path), kept for when Redis cannot answer.
+
+    Unlike the read-through cache, entries are neither expired by TTL nor
+    evicted on keyspace notifications: they are only served, marked stale,
+    while Redis is failing, the circuit is open or a read is slower than
+    `serve_after` seconds. Entries older than `max_age` are never served, and
+    the least recently stored go once `max_bytes` is exceeded.
+    """
+
+    def __init__(self, max_bytes: int, max_age: float, serve_after: float) -> None:
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.serve_after = serve_after
+        self._entries: "OrderedDict[Tuple[str, Optional[Hashable]], Tuple[Any, int, float]]" = OrderedDict()
+        self.bytes = 0
+        self.served = 0
+        self.refreshed = 0
+
+    @staticmethod
+    def _key(key: str, path: Optional[Hashable]) -> Tuple[str, Optional[Hashable]]:
+        return key, None if path in ROOT_PATHS else path
+
+    def set(self, key: str, path: Optional[Hashable], value: Any, size: int) -> None:
+        if size > self.max_bytes:
+            return
+        entry_key = self._key(key, path)
+        old = self._entries.pop(entry_key, None)
+        if old is not None:
+            self.bytes -= old[1]
+            self.refreshed += 1
+        self._entries[entry_key] = (value, size, time.monotonic())
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+
+    def get(self, key: str, path: Optional[Hashable] = None) -> Optional[Tuple[Any, float]]:
+        """(value, age in seconds) of the last good reply, or None if there is none young enough."""
+        entry = self._entries.get(self._key(key, path))
+        if entry is None:
+            return None
+        age = time.monotonic() - entry[2]
+        if age > self.max_age:
+            return None
+        return entry[0], age
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "maxBytes": self.max_bytes,
+            "maxAge": self.max_age,
+            "served": self.served,
+            "refreshed": self.refreshed,
+        }
+
+
+def create_last_known_good() -> Optional[LastKnownGood]:
+    if os.getenv("STALE_ENABLED", "true").lower() not in ("1", "true", "yes"):
+        return None
+    return LastKnownGood(
+        max_bytes=int(os.getenv("STALE_MAX_BYTES", str(32 * 1024 * 1024))),
+        max_age=float(os.getenv("STALE_MAX_AGE", "900")),
+        serve_after=float(os.getenv("STALE_SERVE_AFTER", "1")),
+    )
@@ -0,0 +1,104 @@
+import asyncio
+from typing import Callable, Iterable, List, Optional, Set
+
+from app.redis_client import RedisBackend
+
+
+class MaintainedView:
+    """Base of the in-memory views kept current from keyspace notifications.
+
+    Subclasses implement `load()` (full read from Redis) and `apply(keys)`
+    (re-read only changed keys). This class registers as a keyspace
+    subscriber and runs the background task: changed keys under `prefixes`
+    are collected and applied in batches, a resubscribe triggers a full
+    reload, and without push notifications the view is reloaded every
+    `refresh_interval` seconds. A failed update is retried with the same keys.
+    """
+
+    # Names the view in log lines
+    label = "View"
+
+    def __init__(
+        self,
+        backend: RedisBackend,
+        prefixes: Iterable[str],
+        batch_size: int = 200,
+        scan_count: int = 1000,
+        refresh_interval: float = 300.0,
+        push_active: Callable[[], bool] = lambda: False,
+    ) -> None:
+        self.backend = backend
+        self.prefixes = tuple(prefixes)
+        self.batch_size = batch_size
+        self.scan_count = scan_count
+        self.refresh_interval = refresh_interval
+        self.push_active = push_active
+        self.ready = False
+        self.version = 0
+        self.load_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._dirty: Set[str] = set()
+        self._resync = False
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    # -- keyspace subscriber interface -------------------------------------
+
+    def key_changed(self, key: str) -> None:
+        if key.startswith(self.prefixes):
+            self._dirty.add(key)
+            self._wake.set()
+
+    def resync(self) -> None:
+        self._resync = True
+        self._wake.set()
+
+    # -- implemented by the views ----------------------------------------------
+
+    async def load(self) -> None:
+        raise NotImplementedError
+
+    async def apply(self, keys: List[str]) -> None:
+        raise NotImplementedError
+
+    # -- background maintenance ---------------------------------------------
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        self._resync = True
+        while True:
+            if not self._resync and not self._dirty:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.refresh_interval)
+                except asyncio.TimeoutError:
+                    if not self.push_active():
+                        self._resync = True
+            self._wake.clear()
+
+            resync, self._resync = self._resync, False
+            dirty, self._dirty = self._dirty, set()
+            try:
+                if resync:
+                    await self.load()
+                elif dirty:
+                    await self.apply(sorted(dirty))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                self.last_error = str(exc)
+                print(f"⚠️ {self.label} update failed: {exc}")
+                self._resync |= resync
+                self._dirty |= dirty
+                await asyncio.sleep(5)
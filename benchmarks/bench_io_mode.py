@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compare REDIS_IO_MODE=async against REDIS_IO_MODE=threadpool.
+
+Drives /redis/json-get in-process (no uvicorn) at a fixed concurrency against
+the Redis configured through REDIS_HOST / REDIS_PORT / REDIS_PASSWORD and
+prints throughput and latency percentiles for each mode as JSON.
+
+    python benchmarks/bench_io_mode.py --key index:database_schema --concurrency 100
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import httpx
+
+from harness import summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def run_mode(mode, key, concurrency, requests):
+    os.environ["REDIS_IO_MODE"] = mode
+    from app.main import app
+
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+            async def worker():
+                nonlocal errors
+                for _ in remaining:
+                    started = time.perf_counter()
+                    response = await client.post("/redis/json-get", json={"key": key}, headers=headers)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if response.status_code != 200:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - started
+
+    return {"mode": mode, "concurrency": concurrency, **summarize(latencies, elapsed, errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--key", default="index:database_schema")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--modes", default="threadpool,async")
+    args = parser.parse_args()
+
+    os.environ.setdefault("API_KEY", "bench")
+    results = [
+        asyncio.run(run_mode(mode, args.key, args.concurrency, args.requests))
+        for mode in args.modes.split(",")
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
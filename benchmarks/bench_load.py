@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Load-test the proxy endpoints against a local Redis.
+
+Starts a throwaway redis-server (or fakeredis stand-in, see harness.py), seeds
+a doc/ch/p/sp/chunk corpus, runs the app in-process and drives each scenario
+at each concurrency level:
+
+  json-get       POST /redis/json-get      {"key"}
+  command        POST /redis/command       JSON.GET key $.title
+  query-key      POST /redis/query         {"key", "path"}
+  query-command  POST /redis/query         {"command": "JSON.GET", "args"}
+  query-batch    POST /redis/query         {"keys": [--batch keys]}
+
+Prints p50/p95/p99 latency and throughput per scenario as JSON, so runs can be
+diffed between versions. Pass --redis env to use the Redis configured in the
+environment instead (its data is not modified unless --seed is given).
+
+    python benchmarks/bench_load.py --concurrency 1,10,50 --requests 2000
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from contextlib import nullcontext
+
+import httpx
+import redis
+
+from corpus import seed
+from harness import local_redis, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+SCENARIOS = ("json-get", "command", "query-key", "query-command", "query-batch")
+
+
+def request_for(scenario, rng, keys, batch):
+    key = rng.choice(keys)
+    if scenario == "json-get":
+        return "/redis/json-get", {"key": key}
+    if scenario == "command":
+        return "/redis/command", {"command": "JSON.GET", "args": [key, "$.title"]}
+    if scenario == "query-key":
+        return "/redis/query", {"key": key, "path": "."}
+    if scenario == "query-command":
+        return "/redis/query", {"command": "JSON.GET", "args": [key]}
+    return "/redis/query", {"keys": rng.sample(keys, min(batch, len(keys)))}
+
+
+async def run_scenario(client, scenario, keys, concurrency, requests, batch, headers):
+    rng = random.Random(scenario)
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            url, body = request_for(scenario, rng, keys, batch)
+            started = time.perf_counter()
+            response = await client.post(url, json=body, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"scenario": scenario, "concurrency": concurrency, **summarize(latencies, elapsed, errors)}
+
+
+async def run(args, keys):
+    from app.main import app
+
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for scenario in args.scenarios.split(","):
+                # Warm up connections (and the cache, when enabled) before measuring
+                await run_scenario(client, scenario, keys, 10, min(200, args.requests), args.batch, headers)
+                for concurrency in (int(c) for c in args.concurrency.split(",")):
+                    results.append(await run_scenario(client, scenario, keys, concurrency, args.requests, args.batch, headers))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis", choices=("local", "env"), default="local")
+    parser.add_argument("--seed", action="store_true", help="Seed the corpus into --redis env too")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", default="1,10,50")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=20, help="Keys per query-batch request")
+    parser.add_argument("--docs", type=int, default=2)
+    parser.add_argument("--no-cache", action="store_true", help="Measure every read against Redis")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios.split(",")) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    os.environ.setdefault("API_KEY", "bench")
+    if args.no_cache:
+        os.environ["CACHE_ENABLED"] = "false"
+
+    with local_redis() if args.redis == "local" else nullcontext({"kind": "env"}) as server:
+        if args.redis == "local" or args.seed:
+            client = redis.Redis(
+                host=os.environ["REDIS_HOST"],
+                port=int(os.getenv("REDIS_PORT", "6379")),
+                password=os.environ["REDIS_PASSWORD"],
+                ssl=os.getenv("REDIS_TLS", "false").lower() in ("1", "true", "yes"),
+                ssl_cert_reqs="none",
+                decode_responses=True,
+            )
+            corpus = seed(client, docs=args.docs)
+            client.close()
+            keys = corpus["p:"] + corpus["sp:"] + corpus["chunk:"]
+        else:
+            keys = ["index:database_schema"]
+
+        results = asyncio.run(run(args, keys))
+
+    report = {
+        "redis": server["kind"],
+        "ioMode": os.getenv("REDIS_IO_MODE", "async"),
+        "cache": not args.no_cache,
+        "python": platform.python_version(),
+        "keys": len(keys),
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Measure the CPU spent turning a JSON.GET reply into a response body.
+
+Compares, per document size:
+  parsed       json.loads + jsonable_encoder + JSONResponse (the FastAPI default)
+  orjson       orjson.loads + orjson.dumps (JSON_PASSTHROUGH=false)
+  passthrough  the reply spliced into {"result": ...} (JSON_PASSTHROUGH=true)
+
+Documents are synthetic index/chunk-shaped JSON, so no Redis is needed.
+Prints microseconds of process CPU time per response as JSON.
+
+    python benchmarks/bench_passthrough.py --sizes 2,32,256 --iterations 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.rawjson import RawJson, RawJSONResponse, value_bytes  # noqa: E402
+
+
+def make_document(kib):
+    """A chunk-like document of roughly `kib` KiB."""
+    text = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    entries = []
+    while len(json.dumps(entries)) < kib * 1024:
+        n = len(entries)
+        entries.append(
+            {
+                "key": f"chunk:{n}",
+                "parent": f"sp:{n // 8}",
+                "title": f"Section {n}",
+                "position": n,
+                "text": text * 4,
+                "tags": ["alpha", "beta", "gamma"],
+            }
+        )
+    return json.dumps({"type": "index", "version": 3, "entries": entries})
+
+
+def parsed(raw):
+    return JSONResponse(jsonable_encoder({"result": json.loads(raw)})).body
+
+
+def orjson_mode(raw):
+    return RawJSONResponse(b'{"result":' + value_bytes(RawJson(raw), False) + b"}").body
+
+
+def passthrough(raw):
+    return RawJSONResponse(b'{"result":' + value_bytes(RawJson(raw), True) + b"}").body
+
+
+def cpu_us(fn, raw, iterations):
+    fn(raw)
+    started = time.process_time()
+    for _ in range(iterations):
+        fn(raw)
+    return (time.process_time() - started) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="2,32,256", help="Document sizes in KiB")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    results = []
+    for kib in (int(size) for size in args.sizes.split(",")):
+        raw = make_document(kib)
+        iterations = max(50, args.iterations * 2 // max(kib, 2))
+        timings = {name: cpu_us(fn, raw, iterations) for name, fn in (("parsed", parsed), ("orjson", orjson_mode), ("passthrough", passthrough))}
+        results.append(
+            {
+                "documentBytes": len(raw),
+                "iterations": iterations,
+                **{f"{name}CpuUs": round(us, 1) for name, us in timings.items()},
+                "passthroughSpeedup": round(timings["parsed"] / timings["passthrough"], 1),
+            }
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
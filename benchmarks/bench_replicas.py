@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Measure what replica routing and hedged reads do to tail latency.
+
+Starts two local Redis servers (redis-server, or the fakeredis stand-in, see
+harness.py) standing in for a primary and a replica, seeds both with the same
+corpus and puts a TCP proxy in front of each that stalls a random
+`--stall-rate` of replies by `--stall-ms`, the way a busy or distant node
+occasionally does. Then issues JSON.GET reads at a fixed concurrency through:
+
+  primary   a single backend on the primary (no REDIS_REPLICAS)
+  routed    ReplicaRouter over both, hedging disabled
+  hedged    ReplicaRouter over both, hedging after the endpoint's p95
+
+Prints p50/p95/p99 latency per setup, plus the router's hedge counts, as JSON.
+
+    python benchmarks/bench_replicas.py --requests 5000 --concurrency 8 --stall-rate 0.02 --stall-ms 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import ExitStack
+
+import redis
+
+from corpus import seed
+from harness import PASSWORD, local_redis, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.redis_client import create_backend  # noqa: E402
+from app.replicas import Endpoint, ReplicaRouter  # noqa: E402
+
+
+class StallingProxy:
+    """Forwards TCP to a Redis server, holding back some replies for `stall_ms`."""
+
+    def __init__(self, target_port: int, stall_rate: float, stall_ms: float, rng: random.Random) -> None:
+        self.target_port = target_port
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.rng = rng
+        self.server = None
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def _handle(self, client_reader, client_writer) -> None:
+        async def pipe(reader, writer, stall: bool) -> None:
+            try:
+                while True:
+                    data = await reader.read(65536)
+                    if not data:
+                        break
+                    if stall and self.rng.random() < self.stall_rate:
+                        await asyncio.sleep(self.stall_ms / 1000)
+                    writer.write(data)
+                    await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                pass
+            finally:
+                writer.close()
+
+        try:
+            server_reader, server_writer = await asyncio.open_connection("127.0.0.1", self.target_port)
+            await asyncio.gather(pipe(client_reader, server_writer, False), pipe(server_reader, client_writer, True))
+        except asyncio.CancelledError:
+            # Connections still open (or opening) when the event loop shuts down
+            pass
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+
+async def drive(backend, keys, concurrency, requests, rng):
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            key = rng.choice(keys)
+            started = time.perf_counter()
+            try:
+                await backend.execute_command("JSON.GET", key)
+            except Exception:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, time.perf_counter() - started, errors)
+
+
+async def run(args, primary_port, replica_port, keys):
+    rng = random.Random(args.seed)
+    proxies = [StallingProxy(port, args.stall_rate, args.stall_ms, rng) for port in (primary_port, replica_port)]
+    primary_proxy, replica_proxy = [await proxy.start() for proxy in proxies]
+    results = []
+    try:
+        for setup in ("primary", "routed", "hedged"):
+            primary = create_backend(False, "127.0.0.1", primary_proxy)
+            backend = primary
+            router = None
+            if setup != "primary":
+                replica = Endpoint(f"127.0.0.1:{replica_proxy}", create_backend(False, "127.0.0.1", replica_proxy), "replica")
+                backend = router = ReplicaRouter(primary, [replica], max_hedge_ratio=args.max_hedge_ratio if setup == "hedged" else 0.0)
+                await router.probe()
+                router.start()
+            # Warm the pools and, for the router, the latency statistics
+            await drive(backend, keys, args.concurrency, min(500, args.requests), rng)
+            result = {"setup": setup, **await drive(backend, keys, args.concurrency, args.requests, rng)}
+            if router is not None:
+                stats = router.stats()
+                result.update(hedged=stats["hedged"], hedgeWins=stats["hedgeWins"], failovers=stats["failovers"])
+            results.append(result)
+            await backend.close()
+    finally:
+        for proxy in proxies:
+            await proxy.stop()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--stall-rate", type=float, default=0.02, help="Fraction of replies each proxy delays")
+    parser.add_argument("--stall-ms", type=float, default=50.0)
+    parser.add_argument("--max-hedge-ratio", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        primary = stack.enter_context(local_redis())
+        replica = stack.enter_context(local_redis())
+        for server in (primary, replica):
+            client = redis.Redis(host=server["host"], port=server["port"], password=PASSWORD)
+            groups = seed(client, docs=1)
+            client.close()
+        keys = groups["sp:"] + groups["chunk:"]
+        report = {
+            "redis": primary["kind"],
+            "stallRate": args.stall_rate,
+            "stallMs": args.stall_ms,
+            "concurrency": args.concurrency,
+            "results": asyncio.run(run(args, primary["port"], replica["port"], keys)),
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
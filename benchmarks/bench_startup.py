@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Measure how fast a restarted proxy serves its first agent run, cold and warm.
+
+Starts a local Redis (redis-server, or the fakeredis stand-in, see
+harness.py), seeds the corpus and puts a TCP proxy in front of it that delays
+every reply by `--rtt-ms`, the round trip to a distant Redis Cloud database.
+The app is then started in-process three times with SNAPSHOT_PATH set:
+
+  cold           no snapshot file: the hierarchy loads and every document is read from Redis
+  warm           the snapshot written when the cold run shut down is mapped at startup
+  warm-changed   as warm, but the content version and one hot document changed in between,
+                 so the background check re-reads the mapped documents
+
+Each run times the lifespan startup, the first /tree/{key} answer and an
+"agent run": `--agents` concurrent readers fetching the `--hot` documents
+with /redis/json-get. Prints the timings per run as JSON.
+
+    python benchmarks/bench_startup.py --rtt-ms 20 --hot 200 --agents 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import httpx
+import redis
+
+from bench_replicas import StallingProxy
+from corpus import seed
+from harness import PASSWORD, local_redis, summarize
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+
+async def wait_for(condition, timeout: float = 30.0, interval: float = 0.005) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not await condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(interval)
+    return True
+
+
+async def start_once(phase, args, redis_port, hot_keys, tree_key):
+    from app import main
+
+    proxy = StallingProxy(redis_port, 1.0, args.rtt_ms, random.Random(args.seed))
+    os.environ["REDIS_PORT"] = str(await proxy.start())
+    headers = {"X-API-Key": os.environ["API_KEY"]}
+    latencies = []
+    errors = 0
+    try:
+        started = time.perf_counter()
+        async with main.app.router.lifespan_context(main.app):
+            startup_ms = (time.perf_counter() - started) * 1000
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+                async def tree_ready():
+                    return (await client.get(f"/tree/{tree_key}", params={"depth": 1}, headers=headers)).status_code == 200
+
+                await wait_for(tree_ready)
+                tree_ms = (time.perf_counter() - started) * 1000
+
+                remaining = iter(hot_keys)
+
+                async def agent():
+                    nonlocal errors
+                    for key in remaining:
+                        sent = time.perf_counter()
+                        response = await client.post("/redis/json-get", json={"key": key}, headers=headers)
+                        latencies.append((time.perf_counter() - sent) * 1000)
+                        if response.status_code != 200:
+                            errors += 1
+
+                run_started = time.perf_counter()
+                await asyncio.gather(*(agent() for _ in range(args.agents)))
+                run_elapsed = time.perf_counter() - run_started
+                agent_done_ms = (time.perf_counter() - started) * 1000
+
+                # The snapshot is only written with push invalidation active; give it the chance to subscribe
+                async def subscribed():
+                    return main.invalidator is None or main.invalidator.subscribed
+
+                # ... and let the warm runs finish checking the snapshot against Redis
+                async def verified():
+                    return main.snapshot is None or bool(main.snapshot.verified)
+
+                await wait_for(subscribed, timeout=5.0)
+                await wait_for(verified)
+                stats = (await client.get("/cache/stats", headers=headers)).json()["snapshot"] or {}
+    finally:
+        await proxy.stop()
+
+    return {
+        "run": phase,
+        "startupMs": round(startup_ms, 1),
+        "treeReadyMs": round(tree_ms, 1),
+        "agentRunDoneMs": round(agent_done_ms, 1),
+        "agentRun": summarize(latencies, run_elapsed, errors),
+        "snapshot": {name: stats.get(name) for name in ("mapped", "documents", "hierarchyNodes", "verified", "served", "dropped")},
+    }
+
+
+async def run(args, redis_port, hot_keys, tree_key):
+    results = [await start_once("cold", args, redis_port, hot_keys, tree_key)]
+    results.append(await start_once("warm", args, redis_port, hot_keys, tree_key))
+
+    client = redis.Redis(port=redis_port, password=PASSWORD)
+    client.execute_command("JSON.SET", "index:database_schema", "$.version", json.dumps("bench-changed"))
+    client.execute_command("JSON.SET", hot_keys[0], "$.title", json.dumps("Changed while the proxy was down"))
+    client.close()
+    results.append(await start_once("warm-changed", args, redis_port, hot_keys, tree_key))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="Delay added to every Redis reply")
+    parser.add_argument("--docs", type=int, default=2, help="Corpus size, in top-level documents")
+    parser.add_argument("--hot", type=int, default=200, help="Documents read by the agent run")
+    parser.add_argument("--agents", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("API_KEY", "bench")
+    # The readiness polling would flood stdout with request logs
+    os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+    # Measure the snapshot alone, not the last known good store
+    os.environ["STALE_ENABLED"] = "false"
+    with tempfile.TemporaryDirectory() as directory, local_redis() as server:
+        os.environ.update(SNAPSHOT_PATH=os.path.join(directory, "corpus.snap"), SNAPSHOT_INTERVAL="3600")
+        client = redis.Redis(host=server["host"], port=server["port"], password=PASSWORD)
+        groups = seed(client, docs=args.docs)
+        try:
+            client.config_set("notify-keyspace-events", "KEA")
+        except redis.ResponseError:
+            pass
+        client.close()
+        rng = random.Random(args.seed)
+        candidates = groups["p:"] + groups["sp:"] + groups["chunk:"]
+        hot_keys = rng.sample(candidates, min(args.hot, len(candidates)))
+        report = {
+            "redis": server["kind"],
+            "rttMs": args.rtt_ms,
+            "hotDocuments": len(hot_keys),
+            "agents": args.agents,
+            "results": asyncio.run(run(args, server["port"], hot_keys, groups["doc:"][0])),
+        }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Measure throughput scaling with the number of uvicorn workers.
+
+For each worker count, starts `python -m app.serve` with WEB_CONCURRENCY set,
+against a throwaway local Redis (see harness.py) seeded with the benchmark
+corpus, and drives POST /redis/json-get over real HTTP from several client
+processes for a fixed duration. Prints throughput and latency percentiles per
+worker count as JSON.
+
+    python benchmarks/bench_workers.py --workers 1,2,4 --concurrency 64 --duration 10
+
+Scaling flattens once the client processes or the local Redis saturate the
+machine's cores; run the clients on another host for larger worker counts.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import time
+
+import httpx
+import redis
+
+from corpus import seed
+from harness import free_port, local_redis, summarize
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def client_process(base_url, api_key, keys, concurrency, duration):
+    async def run():
+        latencies = []
+        errors = 0
+        deadline = time.perf_counter() + duration
+        rng = random.Random(os.getpid())
+        limits = httpx.Limits(max_connections=concurrency)
+        async with httpx.AsyncClient(base_url=base_url, headers={"X-API-Key": api_key}, limits=limits, timeout=30) as client:
+
+            async def worker():
+                nonlocal errors
+                while time.perf_counter() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        response = await client.post("/redis/json-get", json={"key": rng.choice(keys)})
+                        ok = response.status_code == 200
+                    except httpx.HTTPError:
+                        ok = False
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    errors += not ok
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors
+
+    return asyncio.run(run())
+
+
+def wait_healthy(base_url, process, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).json().get("status") == "ok":
+                return
+        except (httpx.HTTPError, ValueError):
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Server did not become healthy in time")
+
+
+def run_workers(workers, keys, args):
+    port = free_port()
+    env = {**os.environ, "WEB_CONCURRENCY": str(workers), "PORT": str(port), "HOST": "127.0.0.1", "LOG_SAMPLE_RATE": "0"}
+    if args.no_shared_cache:
+        env["SHARED_CACHE_ENABLED"] = "false"
+    server = subprocess.Popen([sys.executable, "-m", "app.serve"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_healthy(base_url, server)
+        # Warm every worker's pool and cache before measuring
+        client_process(base_url, env["API_KEY"], keys, 8, 1.0)
+
+        per_client = max(1, args.concurrency // args.clients)
+        with multiprocessing.Pool(args.clients) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(client_process, [(base_url, env["API_KEY"], keys, per_client, args.duration)] * args.clients)
+            elapsed = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait(timeout=15)
+
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    errors = sum(client_errors for _, client_errors in results)
+    return {"workers": workers, "concurrency": per_client * args.clients, **summarize(latencies, elapsed, errors)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=2, help="Load-generating processes")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per worker count")
+    parser.add_argument("--keys", default="index", choices=("index", "corpus"), help="Read index:database_schema or random corpus keys")
+    parser.add_argument("--no-shared-cache", action="store_true")
+    parser.add_argument("--output", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    os.environ.setdefault("API_KEY", "bench")
+    with local_redis() as server:
+        client = redis.Redis(host=os.environ["REDIS_HOST"], port=int(os.environ["REDIS_PORT"]), password=os.environ["REDIS_PASSWORD"], decode_responses=True)
+        corpus = seed(client)
+        client.close()
+        keys = ["index:database_schema"] if args.keys == "index" else corpus["p:"] + corpus["sp:"] + corpus["chunk:"]
+        results = [run_workers(int(workers), keys, args) for workers in args.workers.split(",")]
+
+    baseline = results[0]["throughputRps"] or 1
+    for result in results:
+        result["speedup"] = round(result["throughputRps"] / baseline, 2)
+    report = {"redis": server["kind"], "cpus": os.cpu_count(), "keys": args.keys, "results": results}
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as handle:
+            handle.write(text + "\n")
+    print(text)
+
+
+if __name__ == "__main__":
+    main()
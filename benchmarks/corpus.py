@@ -0,0 +1,69 @@
+"""
+Seed Redis with a synthetic corpus shaped like the production hierarchy:
+
+    doc → ch → p → sp → chunk
+
+Every node is a JSON document with `title`, `parent`, `position` and a
+`content`/`text` body, and an `index:database_schema` document lists the docs.
+"""
+import json
+import random
+from typing import Dict, List
+
+import redis
+
+
+LOREM = (
+    "Brand voice is straightforward, decisive and empowering. Messaging focuses on "
+    "outcomes for the customer, backs every claim with a concrete example and avoids jargon. "
+)
+
+
+def _body(rng: random.Random, sentences: int) -> str:
+    words = LOREM.split()
+    return " ".join(" ".join(rng.sample(words, 12)) + "." for _ in range(sentences))
+
+
+def seed(
+    client: redis.Redis,
+    docs: int = 2,
+    chapters: int = 5,
+    paragraphs: int = 5,
+    subparagraphs: int = 3,
+    chunks: int = 4,
+    seed_value: int = 7,
+) -> Dict[str, List[str]]:
+    """Write the corpus and return its keys grouped by prefix."""
+    rng = random.Random(seed_value)
+    keys: Dict[str, List[str]] = {"doc:": [], "ch:": [], "p:": [], "sp:": [], "chunk:": []}
+    pipe = client.pipeline(transaction=False)
+
+    def put(prefix: str, key: str, value: dict) -> None:
+        keys[prefix].append(key)
+        pipe.execute_command("JSON.SET", key, "$", json.dumps(value))
+        if len(pipe) >= 500:
+            pipe.execute()
+
+    for d in range(1, docs + 1):
+        doc_key = f"doc:bench_{d}:{d:03d}"
+        put("doc:", doc_key, {"title": f"Document {d}", "metadata": {"author": "bench", "version": 1}})
+        for c in range(1, chapters + 1):
+            ch_key = f"ch:bench_{d}_{c}:{c:03d}"
+            put("ch:", ch_key, {"title": f"Chapter {c}", "parent": doc_key, "position": c})
+            for p in range(1, paragraphs + 1):
+                p_key = f"p:bench_{d}_{c}_{p}:{p:03d}"
+                put("p:", p_key, {"title": f"Paragraph {p}", "parent": ch_key, "position": p, "content": _body(rng, 3)})
+                for s in range(1, subparagraphs + 1):
+                    sp_key = f"sp:bench_{d}_{c}_{p}_{s}:{s:03d}"
+                    put("sp:", sp_key, {"title": f"Subparagraph {s}", "parent": p_key, "position": s, "content": _body(rng, 4)})
+                    for k in range(1, chunks + 1):
+                        put("chunk:", f"chunk:bench_{d}_{c}_{p}_{s}_{k}:{k:03d}", {"parent": sp_key, "position": k, "text": _body(rng, 6)})
+
+    pipe.execute_command(
+        "JSON.SET",
+        "index:database_schema",
+        "$",
+        json.dumps({"version": "bench", "documents": [{"key": key} for key in keys["doc:"]]}),
+    )
+    pipe.execute()
+    return keys
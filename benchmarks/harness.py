@@ -0,0 +1,116 @@
+"""
+Shared pieces of the benchmark scripts: a local Redis to run against and
+latency statistics.
+
+`local_redis()` starts `redis-server` (loading RedisJSON from
+REDISJSON_MODULE when set) on a free port, or, when no redis-server binary is
+available, a fakeredis TCP server in a child process (`pip install fakeredis
+lupa jsonpath-ng`). Either way the app is pointed at it through REDIS_HOST /
+REDIS_PORT / REDIS_PASSWORD.
+"""
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+import redis
+
+
+PASSWORD = "bench"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(latencies_ms: List[float], elapsed: float, errors: int) -> dict:
+    return {
+        "requests": len(latencies_ms),
+        "errors": errors,
+        "throughputRps": round(len(latencies_ms) / elapsed, 1),
+        "p50Ms": round(percentile(latencies_ms, 50), 2),
+        "p95Ms": round(percentile(latencies_ms, 95), 2),
+        "p99Ms": round(percentile(latencies_ms, 99), 2),
+        "meanMs": round(statistics.fmean(latencies_ms), 2),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_ready(port: int, process: subprocess.Popen, timeout: float = 15.0) -> None:
+    client = redis.Redis(port=port, password=PASSWORD, socket_connect_timeout=1)
+    deadline = time.monotonic() + timeout
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"Local Redis exited with code {process.returncode}")
+        try:
+            client.ping()
+            return
+        except redis.ConnectionError:
+            if time.monotonic() > deadline:
+                raise RuntimeError("Local Redis did not start in time")
+            time.sleep(0.1)
+        finally:
+            client.close()
+
+
+@contextmanager
+def local_redis(module: Optional[str] = None) -> Iterator[dict]:
+    """Run a throwaway Redis and export its address for the app.
+
+    Yields {"kind", "host", "port"}; the server is stopped on exit.
+    """
+    port = free_port()
+    module = module or os.getenv("REDISJSON_MODULE")
+    server = shutil.which("redis-server")
+    if server:
+        command = [server, "--port", str(port), "--bind", "127.0.0.1", "--save", "", "--appendonly", "no", "--requirepass", PASSWORD]
+        if module:
+            command += ["--loadmodule", module]
+        kind = "redis-server"
+    else:
+        command = [sys.executable, __file__, "serve-fakeredis", str(port)]
+        kind = "fakeredis"
+
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        _wait_ready(port, process)
+        os.environ.update(REDIS_HOST="127.0.0.1", REDIS_PORT=str(port), REDIS_PASSWORD=PASSWORD, REDIS_TLS="false")
+        yield {"kind": kind, "host": "127.0.0.1", "port": port}
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def _serve_fakeredis(port: int) -> None:
+    from fakeredis import TcpFakeServer
+    from fakeredis.stack import _json_mixin
+
+    # fakeredis answers `JSON.GET key` without a path with "{}"; RedisJSON returns the root
+    json_get = _json_mixin.JSONCommandsMixin.json_get
+
+    def json_get_root(self, key, *args):
+        return json_get(self, key, *(args or (b".",)))
+
+    json_get_root.__dict__.update(json_get.__dict__)
+    _json_mixin.JSONCommandsMixin.json_get = json_get_root
+
+    TcpFakeServer(("127.0.0.1", port), server_type="redis").serve_forever()
+
+
+if __name__ == "__main__" and sys.argv[1:2] == ["serve-fakeredis"]:
+    _serve_fakeredis(int(sys.argv[2]))
@@ -0,0 +1,44 @@
+import time
+from typing import Any, Optional
+
+import pytest
+
+from app.redis_client import RedisBackend
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Freezes `time.monotonic`; advance it with `clock.now += seconds`."""
+    clock = FakeClock()
+    monkeypatch.setattr(time, "monotonic", clock)
+    return clock
+
+
+class FlakyBackend(RedisBackend):
+    """Test backend: JSON.GET replies from `documents` (others answer "OK"), or raises `error` while it is set."""
+
+    mode = "test"
+
+    def __init__(self, documents: Optional[dict] = None) -> None:
+        self.documents = documents
+        self.error: Any = None
+        self.calls = 0
+
+    async def execute_command(self, *args: Any) -> Any:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        if self.documents is None:
+            return "OK"
+        return self.documents.get(args[1])
+
+    async def ping(self) -> bool:
+        return True
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.admission import AdmissionController, RateLimiter, TokenBucket
+
+
+def test_token_bucket_allows_a_burst_then_asks_to_wait(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() == pytest.approx(0.5)
+
+
+def test_token_bucket_refills_at_its_rate(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    for _ in range(3):
+        bucket.take()
+    clock.now += 0.25
+    assert bucket.take() == pytest.approx(0.25)
+    clock.now += 0.25
+    assert bucket.take() == 0.0
+    assert bucket.take() > 0
+
+
+def test_token_bucket_refill_is_capped_at_the_burst(clock):
+    bucket = TokenBucket(rate=2.0, burst=3.0)
+    bucket.take()
+    clock.now += 60
+    assert [bucket.take() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert bucket.take() > 0
+
+
+def test_rate_limiter_keeps_a_bucket_per_known_key(clock):
+    limiter = RateLimiter(rate=1.0, burst=1.0, known=lambda key: key in ("a", "b"))
+    assert limiter.check("a") == 0.0
+    assert limiter.check("b") == 0.0
+    assert limiter.check("a") > 0
+    assert limiter.stats()["keys"] == 2
+    assert limiter.limited == 1
+
+
+def test_rate_limiter_shares_one_bucket_between_unknown_keys(clock):
+    limiter = RateLimiter(rate=1.0, burst=1.0, known=lambda key: key == "a")
+    assert limiter.check("made-up-1") == 0.0
+    assert limiter.check("made-up-2") > 0
+    assert limiter.check("") > 0
+    assert limiter.check("a") == 0.0
+    assert limiter.stats()["keys"] == 2
+
+
+def test_admission_queues_requests_over_the_limit_until_a_slot_frees():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1.0)
+        assert await controller.acquire() is None
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        assert controller.queued == 1 and not queued.done()
+        controller.release()
+        assert await queued is None
+        return controller
+
+    controller = asyncio.run(scenario())
+    assert controller.in_flight == 1
+    assert controller.queued == 0
+    assert controller.admitted == 2
+
+
+def test_admission_sheds_when_the_queue_is_full():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1.0)
+        await controller.acquire()
+        queued = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        reason = await controller.acquire()
+        controller.release()
+        await queued
+        return controller, reason
+
+    controller, reason = asyncio.run(scenario())
+    assert reason == "queue_full"
+    assert controller.shed == {"queue_full": 1, "queue_timeout": 0}
+
+
+def test_admission_sheds_when_the_queue_wait_times_out():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.01)
+        await controller.acquire()
+        return controller, await controller.acquire()
+
+    controller, reason = asyncio.run(scenario())
+    assert reason == "queue_timeout"
+    assert controller.shed == {"queue_full": 0, "queue_timeout": 1}
+    assert controller.queued == 0
+    assert controller.in_flight == 1
+
+
+def test_admission_hands_slots_to_waiters_in_arrival_order():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=1.0)
+        await controller.acquire()
+        order = []
+
+        async def wait(name):
+            await controller.acquire()
+            order.append(name)
+
+        waiters = [asyncio.ensure_future(wait(name)) for name in ("first", "second")]
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.gather(*waiters)
+        return order
+
+    assert asyncio.run(scenario()) == ["first", "second"]
@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, List
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+from redis.exceptions import ResponseError
+
+from app.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+from tests.conftest import FlakyBackend
+
+
+def run(circuit: CircuitBreaker, times: int = 1) -> List[Any]:
+    async def calls():
+        results = []
+        for _ in range(times):
+            try:
+                results.append(await circuit.execute_command("JSON.GET", "doc:a:001"))
+            except Exception as exc:
+                results.append(exc)
+        return results
+
+    return asyncio.run(calls())
+
+
+def test_closed_to_open_to_half_open_to_closed(clock):
+    backend = FlakyBackend()
+    circuit = CircuitBreaker(backend, failure_ratio=0.5, min_calls=4, window=10.0, open_seconds=5.0, half_open_probes=2)
+    assert circuit.state == CLOSED
+
+    backend.error = RedisConnectionError("down")
+    run(circuit, 4)
+    assert circuit.state == OPEN
+    assert circuit.opens == 1
+
+    # Open: calls fail fast without reaching Redis
+    [rejected] = run(circuit)
+    assert isinstance(rejected, CircuitOpenError)
+    assert rejected.retry_after == pytest.approx(5.0)
+    assert backend.calls == 4
+    assert circuit.rejected == 1
+
+    clock.now += 5.0
+    backend.error = None
+    assert run(circuit) == ["OK"]
+    assert circuit.state == HALF_OPEN
+    assert run(circuit) == ["OK"]
+    assert circuit.state == CLOSED
+
+
+def test_a_failed_probe_opens_the_circuit_again(clock):
+    backend = FlakyBackend()
+    circuit = CircuitBreaker(backend, min_calls=2, open_seconds=5.0, half_open_probes=2)
+    backend.error = RedisConnectionError("down")
+    run(circuit, 2)
+    assert circuit.state == OPEN
+
+    clock.now += 5.0
+    [error] = run(circuit)
+    assert isinstance(error, RedisConnectionError) and not isinstance(error, CircuitOpenError)
+    assert circuit.state == OPEN
+    assert circuit.opens == 2
+    assert circuit.retry_after() == pytest.approx(5.0)
+
+
+def test_stays_closed_below_the_minimum_number_of_calls(clock):
+    backend = FlakyBackend()
+    circuit = CircuitBreaker(backend, min_calls=5)
+    backend.error = RedisConnectionError("down")
+    run(circuit, 4)
+    assert circuit.state == CLOSED
+
+
+def test_failures_outside_the_window_are_forgotten(clock):
+    backend = FlakyBackend()
+    circuit = CircuitBreaker(backend, failure_ratio=0.5, min_calls=4, window=10.0)
+    backend.error = RedisConnectionError("down")
+    run(circuit, 3)
+    clock.now += 11.0
+    backend.error = None
+    run(circuit, 1)
+    assert circuit.state == CLOSED
+    assert circuit.stats()["windowCalls"] == 1
+
+
+def test_redis_error_replies_count_as_successes(clock):
+    backend = FlakyBackend()
+    circuit = CircuitBreaker(backend, min_calls=2)
+    backend.error = ResponseError("WRONGTYPE")
+    errors = run(circuit, 4)
+    assert all(isinstance(error, ResponseError) for error in errors)
+    assert circuit.state == CLOSED
+    assert circuit.stats()["windowFailures"] == 0
+
+
+def test_ping_bypasses_an_open_circuit(clock):
+    backend = FlakyBackend()
+    circuit = CircuitBreaker(backend, min_calls=1)
+    backend.error = RedisConnectionError("down")
+    run(circuit)
+    assert circuit.state == OPEN
+    assert asyncio.run(circuit.ping()) is True
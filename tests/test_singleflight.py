@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from app.singleflight import SingleFlight
+
+
+def test_concurrent_calls_for_one_key_share_a_single_call():
+    async def scenario():
+        flights = SingleFlight()
+        started = asyncio.Event()
+        release = asyncio.Event()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            started.set()
+            await release.wait()
+            return "value"
+
+        first = asyncio.ensure_future(flights.do("key", fetch))
+        await started.wait()
+        others = [asyncio.ensure_future(flights.do("key", fetch)) for _ in range(4)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(first, *others)
+        return flights, calls, results
+
+    flights, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["value"] * 5
+    assert flights.stats() == {"inFlight": 0, "calls": 1, "coalesced": 4, "coalescingRatio": 0.8}
+
+
+def test_different_keys_are_not_coalesced():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fetch(value):
+            await asyncio.sleep(0)
+            return value
+
+        return flights, await asyncio.gather(flights.do("a", lambda: fetch(1)), flights.do("b", lambda: fetch(2)))
+
+    flights, results = asyncio.run(scenario())
+    assert results == [1, 2]
+    assert flights.calls == 2 and flights.coalesced == 0
+
+
+def test_a_failure_reaches_every_waiter():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise ConnectionError("redis down")
+
+        waiters = [asyncio.ensure_future(flights.do("key", fetch)) for _ in range(3)]
+        await asyncio.sleep(0)
+        release.set()
+        return flights, await asyncio.gather(*waiters, return_exceptions=True)
+
+    flights, results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(result, ConnectionError) and str(result) == "redis down" for result in results)
+    assert flights.calls == 1 and flights.coalesced == 2
+
+
+def test_the_next_call_after_a_failure_runs_again():
+    async def scenario():
+        flights = SingleFlight()
+        replies = iter([ConnectionError("redis down"), "value"])
+
+        async def fetch():
+            reply = next(replies)
+            if isinstance(reply, Exception):
+                raise reply
+            return reply
+
+        with pytest.raises(ConnectionError):
+            await flights.do("key", fetch)
+        return await flights.do("key", fetch)
+
+    assert asyncio.run(scenario()) == "value"
+
+
+def test_do_many_joins_keys_in_flight_and_reads_the_rest_together():
+    async def scenario():
+        flights = SingleFlight()
+        release = asyncio.Event()
+        batches = []
+
+        async def fetch_one():
+            await release.wait()
+            return "a-single"
+
+        async def fetch_many(keys):
+            batches.append(list(keys))
+            await release.wait()
+            return [f"{key}-batch" for key in keys]
+
+        single = asyncio.ensure_future(flights.do("a", fetch_one))
+        await asyncio.sleep(0)
+        many = asyncio.ensure_future(flights.do_many(["a", "b", "c"], fetch_many))
+        await asyncio.sleep(0)
+        release.set()
+        return batches, await single, await many
+
+    batches, single, many = asyncio.run(scenario())
+    assert batches == [["b", "c"]]
+    assert single == "a-single"
+    assert many == ["a-single", "b-batch", "c-batch"]
+
+
+def test_do_many_returns_a_failed_batch_as_an_error_per_key():
+    async def scenario():
+        flights = SingleFlight()
+
+        async def fetch_many(keys):
+            raise ConnectionError("redis down")
+
+        return await flights.do_many(["a", "b"], fetch_many)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ConnectionError, ConnectionError]
@@ -0,0 +1,100 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app import main
+from app.breaker import CircuitBreaker
+from app.singleflight import SingleFlight
+from app.stale import LastKnownGood
+from tests.conftest import FlakyBackend
+
+
+def test_entries_are_served_until_max_age(clock):
+    store = LastKnownGood(max_bytes=1024, max_age=60.0, serve_after=1.0)
+    store.set("doc:a:001", None, "value", 5)
+    clock.now += 30.0
+    assert store.get("doc:a:001") == ("value", 30.0)
+    # The root path and no path are the same entry
+    assert store.get("doc:a:001", ".") == ("value", 30.0)
+    clock.now += 31.0
+    assert store.get("doc:a:001") is None
+
+
+def test_least_recently_stored_entries_go_past_max_bytes():
+    store = LastKnownGood(max_bytes=10, max_age=60.0, serve_after=1.0)
+    store.set("doc:a:001", None, "a", 4)
+    store.set("doc:b:001", None, "b", 4)
+    store.set("doc:a:001", None, "a2", 4)
+    store.set("doc:c:001", None, "c", 4)
+    assert store.get("doc:b:001") is None
+    assert store.get("doc:a:001")[0] == "a2"
+    assert store.get("doc:c:001")[0] == "c"
+    assert store.bytes == 8
+    assert store.refreshed == 1
+
+
+@pytest.fixture
+def proxy(monkeypatch):
+    """The app wired to a backend that can be taken down, without the lifespan."""
+    backend = FlakyBackend({"doc:a:001": '{"title":"A"}'})
+    circuit = CircuitBreaker(backend, min_calls=2, open_seconds=60.0)
+    store = LastKnownGood(max_bytes=1024 * 1024, max_age=900.0, serve_after=0.5)
+    monkeypatch.setenv("API_KEY", "test")
+    monkeypatch.setattr(main, "redis_client", circuit)
+    monkeypatch.setattr(main, "circuit_breaker", circuit)
+    monkeypatch.setattr(main, "last_known_good", store)
+    monkeypatch.setattr(main, "flights", SingleFlight())
+    monkeypatch.setattr(main, "json_cache", None)
+    monkeypatch.setattr(main, "snapshot", None)
+    return backend, circuit, store
+
+
+def test_last_known_good_is_served_while_redis_is_down(proxy):
+    backend, _circuit, store = proxy
+    doc, hit, stale_age = asyncio.run(main._cached_json_get("doc:a:001"))
+    assert (doc.text, hit, stale_age) == ('{"title":"A"}', False, None)
+
+    backend.error = RedisConnectionError("down")
+    doc, hit, stale_age = asyncio.run(main._cached_json_get("doc:a:001"))
+    assert doc.text == '{"title":"A"}'
+    assert not hit
+    assert stale_age is not None and stale_age >= 0
+    assert store.served == 1
+
+
+def test_last_known_good_is_served_while_the_circuit_is_open(proxy):
+    backend, circuit, store = proxy
+    asyncio.run(main._cached_json_get("doc:a:001"))
+    backend.error = RedisConnectionError("down")
+    for _ in range(2):
+        asyncio.run(main._cached_json_get("doc:a:001"))
+    assert circuit.state == "open"
+
+    doc, _hit, stale_age = asyncio.run(main._cached_json_get("doc:a:001"))
+    assert doc.text == '{"title":"A"}'
+    assert stale_age is not None
+    assert store.served == 3
+
+
+def test_reads_without_a_last_known_good_reply_still_fail(proxy):
+    backend, _circuit, _store = proxy
+    backend.error = RedisConnectionError("down")
+    with pytest.raises(RedisConnectionError):
+        asyncio.run(main._cached_json_get("doc:a:001"))
+
+
+def test_json_get_answers_with_the_stale_reply(proxy):
+    backend, _circuit, _store = proxy
+    client = TestClient(main.app)
+    headers = {"X-API-Key": "test"}
+    fresh = client.post("/redis/json-get", json={"key": "doc:a:001"}, headers=headers)
+    assert fresh.status_code == 200
+
+    backend.error = RedisConnectionError("down")
+    served = client.post("/redis/json-get", json={"key": "doc:a:001"}, headers=headers)
+    assert served.status_code == 200
+    assert served.json() == {"result": {"title": "A"}}
+    assert "x-stale" not in fresh.headers
+    assert served.headers["x-stale"] == "true"
+    assert int(served.headers["age"]) >= 0